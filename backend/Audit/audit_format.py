@@ -0,0 +1,159 @@
+"""
+Audit line formats.
+'text' is the original '%(asctime)s - ...' layout; 'json' writes one JSON object per
+line with a fixed set of keys so tools can read fields directly instead of regexing.
+parse_line() turns either layout back into the same dict shape.
+"""
+import json
+import logging
+import re
+from datetime import datetime, timezone
+
+SCHEMA_VERSION = 1
+
+# Every JSON line carries all of these keys (null when not applicable)
+AUDIT_FIELDS = (
+    'v', 'ts', 'level', 'env', 'event', 'action', 'status', 'user',
+    'endpoint', 'method', 'latency_ms', 'ip', 'ids', 'data', 'message'
+)
+
+TEXT_FORMATS = {
+    'audit': '%(asctime)s - %(levelname)s - %(message)s',
+    'enhanced': '%(asctime)s - %(message)s'
+}
+
+def audit_fields(event, **fields):
+    """Build the `extra` payload that carries structured fields on a LogRecord"""
+    fields['event'] = event
+    return {'audit': fields}
+
+def format_timestamp(created):
+    """UTC ISO-8601 with milliseconds, e.g. 2025-01-31T14:03:22.123Z"""
+    dt = datetime.fromtimestamp(created, tz=timezone.utc)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.') + f'{dt.microsecond // 1000:03d}Z'
+
+def parse_timestamp(value):
+    """Parse a 'ts' value written by format_timestamp into an aware datetime"""
+    # fromisoformat is several times faster than strptime and accepts the trailing 'Z' (3.11+)
+    return datetime.fromisoformat(value)
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, keys in AUDIT_FIELDS order"""
+
+    def __init__(self, environment=None):
+        super().__init__()
+        self.environment = environment
+
+    def format(self, record):
+        fields = getattr(record, 'audit', None) or {}
+        entry = {key: fields.get(key) for key in AUDIT_FIELDS}
+        entry['v'] = SCHEMA_VERSION
+        entry['ts'] = format_timestamp(record.created)
+        entry['level'] = record.levelname
+        entry['env'] = fields.get('env', self.environment)
+        entry['message'] = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['data'] = dict(entry['data'] or {}, exception=record.exc_text)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+def create_formatter(log_format, text_format, environment=None):
+    """Formatter for the configured audit format ('text' or 'json')"""
+    if log_format == 'json':
+        return JsonLinesFormatter(environment)
+    return logging.Formatter(text_format)
+
+# Text-format parsing (legacy lines)
+_TEXT_LINE_RE = re.compile(
+    r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - '
+    r'(?:(DEBUG|INFO|WARNING|ERROR|CRITICAL) - )?'
+    r'([A-Z_]+):\s*(.*)$'
+)
+_TEXT_FIELD_RES = {
+    'user': re.compile(r'(?:USER|User): ([^\s|]+)'),
+    'endpoint': re.compile(r'(?:ENDPOINT|Endpoint): ([^\s|]+)'),
+    'env': re.compile(r'ENV: ([^\s|]+)'),
+    'ip': re.compile(r'IP: ([^\s|]+)'),
+    'latency_ms': re.compile(r'TIME: ([\d.]+)ms')
+}
+_TEXT_ID_RES = {
+    'submission_id': re.compile(r'SUBMISSION_ID: ([^\s|]+)'),
+    'document_id': re.compile(r'DOC_ID: ([^\s|]+)'),
+    'ein': re.compile(r'EIN: ([^\s|]+)')
+}
+_TEXT_API_RE = re.compile(r'^(GET|POST|PUT|PATCH|DELETE) ([^\s|]+)')
+_TEXT_STATUS_RE = re.compile(r'STATUS: (\d+)')
+_TEXT_LEAD_RE = re.compile(r'^([^\s|]+)')
+
+def parse_text_timestamp(line):
+    """Timestamp of a text-format line (local time) as an aware datetime, or None"""
+    try:
+        return datetime.fromisoformat(line[:23]).astimezone(timezone.utc)
+    except ValueError:
+        return None
+
+def line_timestamp(line):
+    """Timestamp of a line in either format, or None"""
+    if line.startswith('{'):
+        try:
+            return parse_timestamp(json.loads(line)['ts'])
+        except (ValueError, KeyError, TypeError):
+            return None
+    return parse_text_timestamp(line)
+
+def _parse_text_line(line):
+    match = _TEXT_LINE_RE.match(line)
+    if not match:
+        return None
+    entry = dict.fromkeys(AUDIT_FIELDS)
+    entry['ts'] = parse_text_timestamp(line)
+    entry['level'] = match.group(3)  # enhanced text lines don't record the level
+    entry['event'] = match.group(4)
+    rest = match.group(5)
+    entry['message'] = f'{match.group(4)}: {rest}'
+
+    for key, pattern in _TEXT_FIELD_RES.items():
+        found = pattern.search(rest)
+        if found:
+            entry[key] = found.group(1)
+    if entry['latency_ms'] is not None:
+        entry['latency_ms'] = float(entry['latency_ms'])
+    ids = {}
+    for key, pattern in _TEXT_ID_RES.items():
+        found = pattern.search(rest)
+        if found:
+            ids[key] = found.group(1)
+    entry['ids'] = ids or None
+
+    if entry['event'] == 'API_USAGE':
+        found = _TEXT_API_RE.match(rest)
+        if found:
+            entry['method'], entry['endpoint'] = found.group(1), found.group(2)
+        status = _TEXT_STATUS_RE.search(rest)
+        entry['status'] = int(status.group(1)) if status else None
+    elif entry['event'] == 'LOGIN_ATTEMPT':
+        lead = _TEXT_LEAD_RE.match(rest)
+        entry['status'] = lead.group(1) if lead else None
+    else:
+        lead = _TEXT_LEAD_RE.match(rest)
+        if lead and not rest.startswith(('USER:', 'User:')):
+            entry['action'] = lead.group(1)
+    return entry
+
+def parse_line(line):
+    """
+    Parse one audit line (either format) into a dict keyed by AUDIT_FIELDS, with
+    'ts' as an aware UTC datetime. Returns None for lines that aren't audit entries.
+    """
+    line = line.rstrip('\r\n')
+    if not line:
+        return None
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            entry['ts'] = parse_timestamp(entry['ts'])
+            return entry
+        except (ValueError, KeyError, TypeError):
+            return None
+    return _parse_text_line(line)
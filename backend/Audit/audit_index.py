@@ -0,0 +1,225 @@
+"""
+Sidecar offset index for the live audit log.
+A small SQLite file next to the log ('<log>.idx') holds a sparse timestamp -> byte
+offset map plus per-user posting lists. The writer thread calls catch_up() after each
+batch, which indexes only the bytes appended since the last call, so a query can seek
+straight to the part of the file it needs instead of scanning all of it.
+Archived segments are picked by the manifest's time ranges and scanned.
+"""
+import os
+import sqlite3
+import threading
+import time
+from Audit.audit_format import parse_line
+from Audit.audit_rotation import iter_segments, open_segment, file_identity
+from config import Config
+
+SPARSE_EVERY = 256      # one timestamp checkpoint per this many lines
+TIME_SLACK = 5.0        # workers' batches interleave, so lines are only roughly time-ordered
+READ_CHUNK = 1024 * 1024
+WRITER_CATCH_UP_BYTES = 8 * 1024 * 1024  # per writer call, so indexing an old log never stalls logging
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS time_index (ts REAL NOT NULL, offset INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS user_postings (user TEXT NOT NULL, ts REAL NOT NULL, offset INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_time_index_ts ON time_index (ts)",
+    "CREATE INDEX IF NOT EXISTS ix_user_postings_user_ts ON user_postings (user, ts)"
+)
+
+class AuditIndex:
+    """Offset index for one log file; safe to share between threads and processes"""
+
+    def __init__(self, log_path, min_interval=1.0):
+        self.log_path = log_path
+        self.index_path = f'{log_path}.idx'
+        self.min_interval = min_interval
+        self._last_catch_up = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    def maybe_catch_up(self):
+        """Called by the writer after each batch; rate-limited to min_interval"""
+        if time.monotonic() - self._last_catch_up >= self.min_interval:
+            try:
+                self.catch_up(max_bytes=WRITER_CATCH_UP_BYTES)
+            except Exception as e:
+                print(f"Warning: audit index update failed: {e}")
+
+    def catch_up(self, max_bytes=None):
+        """Index complete lines appended since the last call (up to max_bytes); returns the indexed offset"""
+        with self._lock:
+            self._last_catch_up = time.monotonic()
+            if not os.path.exists(self.log_path):
+                return 0
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                stat = os.stat(self.log_path)
+                identity = file_identity(self.log_path, stat)
+                offset = int(meta.get('offset', 0))
+                lines = int(meta.get('lines', 0))
+                if meta.get('identity') != identity or stat.st_size < offset:
+                    # The log was rotated (or replaced): start a fresh index
+                    conn.execute("DELETE FROM time_index")
+                    conn.execute("DELETE FROM user_postings")
+                    offset, lines = 0, 0
+
+                stop = stat.st_size if max_bytes is None else min(stat.st_size, offset + max_bytes)
+                checkpoints, postings = [], []
+                with open(self.log_path, 'rb') as f:
+                    f.seek(offset)
+                    while offset < stop:
+                        chunk = f.read(min(READ_CHUNK, stop - offset))
+                        end = chunk.rfind(b'\n')
+                        if end < 0:
+                            break  # only a partial line so far
+                        chunk = chunk[:end + 1]
+                        position = offset
+                        for raw in chunk.splitlines(keepends=True):
+                            entry = parse_line(raw.decode('utf-8', errors='replace'))
+                            if entry and entry['ts'] is not None:
+                                ts = entry['ts'].timestamp()
+                                if lines % SPARSE_EVERY == 0:
+                                    checkpoints.append((ts, position))
+                                if entry.get('user'):
+                                    postings.append((str(entry['user']), ts, position))
+                            lines += 1
+                            position += len(raw)
+                        offset = position
+                        f.seek(offset)
+
+                conn.executemany("INSERT INTO time_index (ts, offset) VALUES (?, ?)", checkpoints)
+                conn.executemany("INSERT INTO user_postings (user, ts, offset) VALUES (?, ?, ?)", postings)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [('identity', identity), ('offset', str(offset)), ('lines', str(lines))]
+                )
+                conn.execute("COMMIT")
+                return offset
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def query(self, start=None, end=None, user=None, event=None, limit=500):
+        """Matching entries from the live file (oldest first), reading only indexed spans"""
+        indexed_offset = self.catch_up()
+        start_ts = start.timestamp() if start else None
+        end_ts = end.timestamp() if end else None
+
+        conn = self._connect()
+        try:
+            if user:
+                sql = "SELECT offset FROM user_postings WHERE user = ?"
+                params = [user]
+                if start_ts is not None:
+                    sql += " AND ts >= ?"
+                    params.append(start_ts - TIME_SLACK)
+                if end_ts is not None:
+                    sql += " AND ts <= ?"
+                    params.append(end_ts + TIME_SLACK)
+                offsets = [row[0] for row in conn.execute(sql + " ORDER BY offset", params)]
+                spans = None
+            else:
+                offsets = None
+                first = 0
+                if start_ts is not None:
+                    row = conn.execute("SELECT MAX(offset) FROM time_index WHERE ts <= ?",
+                                       (start_ts - TIME_SLACK,)).fetchone()
+                    first = row[0] or 0
+                last = indexed_offset
+                if end_ts is not None:
+                    row = conn.execute("SELECT MIN(offset) FROM time_index WHERE ts > ?",
+                                       (end_ts + TIME_SLACK,)).fetchone()
+                    if row[0] is not None:
+                        last = row[0]
+                spans = (first, last)
+        finally:
+            conn.close()
+
+        results = []
+        with open(self.log_path, 'rb') as f:
+            if offsets is not None:
+                for offset in offsets:
+                    f.seek(offset)
+                    if _collect(f.readline(), start, end, user, event, results, limit):
+                        break
+            else:
+                f.seek(spans[0])
+                position = spans[0]
+                for raw in f:
+                    if position >= spans[1]:
+                        break
+                    position += len(raw)
+                    if _collect(raw, start, end, user, event, results, limit):
+                        break
+        return results
+
+def _matches(entry, start, end, user, event):
+    if not entry or entry['ts'] is None:
+        return False
+    if start and entry['ts'] < start:
+        return False
+    if end and entry['ts'] > end:
+        return False
+    if user and str(entry.get('user')) != user:
+        return False
+    if event and (entry.get('event') or '').upper() != event:
+        return False
+    return True
+
+def _collect(raw, start, end, user, event, results, limit):
+    """Append raw's entry if it matches; returns True once limit is reached"""
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8', errors='replace')
+    entry = parse_line(raw)
+    if _matches(entry, start, end, user, event):
+        results.append(entry)
+    return len(results) >= limit
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_audit_index(log_path):
+    """Process-wide AuditIndex for a log path"""
+    log_path = os.path.abspath(log_path)
+    index = _indexes.get(log_path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(log_path)
+            if index is None:
+                index = _indexes[log_path] = AuditIndex(log_path, Config.AUDIT_INDEX_INTERVAL)
+    return index
+
+def query_audit_log(log_path, start=None, end=None, user=None, event=None, limit=500):
+    """
+    Entries between start and end (aware datetimes) matching user/event, oldest first.
+    Returns (entries, segments_read, truncated).
+    """
+    event = event.upper() if event else None
+    results = []
+    segments_read = []
+    for segment_path, info in iter_segments(log_path, start, end):
+        remaining = limit - len(results)
+        if info is None:
+            results.extend(get_audit_index(log_path).query(start, end, user, event, remaining))
+        else:
+            with open_segment(segment_path) as f:
+                for line in f:
+                    if _collect(line, start, end, user, event, results, limit):
+                        break
+        segments_read.append(os.path.basename(segment_path))
+        if len(results) >= limit:
+            return results, segments_read, True
+    return results, segments_read, False
@@ -0,0 +1,210 @@
+"""
+Non-blocking audit log pipeline.
+Request threads only drop the LogRecord onto a bounded queue; a single writer thread
+formats records and writes them to the real handler in batches, flushing when a batch
+fills up or the flush interval passes. Everything still queued is written at shutdown.
+A forked child (a gunicorn worker under preload_app) gets its own queue and writer.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+_queue_handlers = weakref.WeakSet()
+
+def _restart_writers_after_fork():
+    # Threads don't survive fork: without this, records in a worker would queue up
+    # behind a writer that only exists in the master
+    for handler in list(_queue_handlers):
+        handler._reset_after_fork()
+
+os.register_at_fork(after_in_child=_restart_writers_after_fork)
+
+class BatchFileHandler(logging.FileHandler):
+    """FileHandler that can write a whole batch of records with a single write/flush"""
+
+    index = None  # optional AuditIndex, caught up after each batch
+
+    def emit_batch(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+        if self.index is not None:
+            self.index.maybe_catch_up()
+
+class BatchingQueueHandler(logging.Handler):
+    """Queues records for a background writer instead of writing on the calling thread"""
+
+    def __init__(self, target, max_queue_size=10000, batch_size=200,
+                 flush_interval=0.5, overflow_policy='drop_newest', block_timeout=0.05):
+        super().__init__()
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.target = target
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'errors': 0
+        }
+        self._stop = threading.Event()
+        self._flush_requested = threading.Event()
+        self._start_writer()
+        _queue_handlers.add(self)
+        atexit.register(self.close)
+
+    def _start_writer(self):
+        self._writer = threading.Thread(
+            target=self._run, name=f'audit-writer-{self.target.name or id(self.target)}', daemon=True
+        )
+        self._writer.start()
+
+    def _reset_after_fork(self):
+        """Fresh queue, events and writer in a forked child; the parent writes what it had queued"""
+        if self._stop.is_set():
+            return
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.stats = dict.fromkeys(self.stats, 0)
+        self._stop = threading.Event()
+        self._flush_requested = threading.Event()
+        self._start_writer()
+
+    def emit(self, record):
+        # Keep the hot path to a queue put; formatting happens on the writer thread.
+        # exc_info is rendered now because traceback objects don't outlive the frame.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        try:
+            self.queue.put_nowait(record)
+            self.stats['enqueued'] += 1
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow_policy == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+                self.stats['dropped'] += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                self.stats['enqueued'] += 1
+                return
+            except queue.Full:
+                pass
+        elif self.overflow_policy == 'block':
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+                self.stats['enqueued'] += 1
+                return
+            except queue.Full:
+                pass
+        self.stats['dropped'] += 1
+
+    def _drain(self, first=None):
+        """Pull up to batch_size records off the queue without waiting"""
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            if hasattr(self.target, 'emit_batch'):
+                self.target.emit_batch(batch)
+            else:
+                for record in batch:
+                    self.target.handle(record)
+                self.target.flush()
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception:
+            self.stats['errors'] += 1
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                record = self.queue.get(timeout=timeout)
+                pending.extend(self._drain(record))
+            except queue.Empty:
+                pass
+
+            if (len(pending) >= self.batch_size or time.monotonic() >= deadline
+                    or self._flush_requested.is_set()):
+                self._write(pending)
+                pending = []
+                self._flush_requested.clear()
+                deadline = time.monotonic() + self.flush_interval
+
+        # Shutdown: write whatever is still pending or queued
+        self._write(pending)
+        while True:
+            batch = self._drain()
+            if not batch:
+                break
+            self._write(batch)
+
+    def flush(self, timeout=2.0):
+        """Ask the writer to write now and wait (briefly) until the queue is empty"""
+        self._flush_requested.set()
+        deadline = time.monotonic() + timeout
+        while self._writer.is_alive() and time.monotonic() < deadline:
+            if self.queue.empty() and not self._flush_requested.is_set():
+                break
+            time.sleep(0.005)
+
+    def close(self):
+        """Stop the writer after it has written everything queued"""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._writer.join(timeout=5.0)
+            self.target.close()
+        super().close()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queued'] = self.queue.qsize()
+        stats['capacity'] = self.queue.maxsize
+        stats['overflow_policy'] = self.overflow_policy
+        return stats
+
+def attach_queued_handler(logger, target, **options):
+    """Route logger through a BatchingQueueHandler wrapping target; returns the queue handler"""
+    handler = BatchingQueueHandler(target, **options)
+    logger.addHandler(handler)
+    return handler
+
+def get_pipeline_stats(logger):
+    """Counters for any queued handlers attached to logger"""
+    return [h.get_stats() for h in logger.handlers if isinstance(h, BatchingQueueHandler)]
@@ -0,0 +1,84 @@
+"""
+Cheap reads of large, append-only audit logs.
+tail_lines() seeks backwards from the end in fixed-size blocks, so returning the last
+N lines costs O(N) no matter how big the file is; LineCounter only scans bytes appended
+since the previous call; iter_file_chunks() streams a file without loading it.
+"""
+import os
+import threading
+from Audit.audit_rotation import load_manifest, file_identity
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+def tail_lines(path, count, block_size=TAIL_BLOCK_SIZE):
+    """Return the last `count` lines of a file (without line endings), oldest first"""
+    if count <= 0:
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        blocks = []
+        newlines = 0
+        # One extra newline is needed because the file normally ends with one
+        while position > 0 and newlines <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            blocks.append(block)
+            newlines += block.count(b'\n')
+    data = b''.join(reversed(blocks))
+    lines = data.splitlines()
+    return [line.decode('utf-8', errors='replace') for line in lines[-count:]]
+
+def iter_file_chunks(path, chunk_size=64 * 1024, length=None):
+    """Yield a file in chunks; stops at `length` bytes so a growing log streams a stable snapshot"""
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+class LineCounter:
+    """
+    Per-file line counts kept up to date by scanning only newly appended bytes.
+    A different file (rotation) or a shrunken one starts the count over.
+    """
+
+    def __init__(self, chunk_size=1024 * 1024):
+        self.chunk_size = chunk_size
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def count(self, path):
+        stat = os.stat(path)
+        identity = file_identity(path, stat)
+        with self._lock:
+            state = self._state.get(path)
+            if state is None or state['identity'] != identity or stat.st_size < state['offset']:
+                state = {'identity': identity, 'offset': 0, 'lines': 0}
+            if stat.st_size > state['offset']:
+                with open(path, 'rb') as f:
+                    f.seek(state['offset'])
+                    remaining = stat.st_size - state['offset']
+                    while remaining > 0:
+                        chunk = f.read(min(self.chunk_size, remaining))
+                        if not chunk:
+                            break
+                        state['lines'] += chunk.count(b'\n')
+                        remaining -= len(chunk)
+                    state['offset'] = stat.st_size - remaining
+            self._state[path] = state
+            return state['lines']
+
+line_counter = LineCounter()
+
+def count_log_lines(path):
+    """Lines in the live file plus every archived segment in its manifest"""
+    archived = sum(segment.get('lines', 0) for segment in load_manifest(path).get('segments', []))
+    live = line_counter.count(path) if os.path.exists(path) else 0
+    return live, archived
@@ -0,0 +1,302 @@
+"""
+Time/size-partitioned audit log segments.
+The live file keeps its usual name (e.g. Audit/productionaudit.log). When the day
+changes or it passes the size limit it is moved into the archive directory, gzipped,
+and recorded in a manifest with its time range, so readers can pick only the
+segments that overlap the window they care about.
+"""
+import gzip
+import json
+import os
+import shutil
+import time
+import weakref
+import zlib
+from datetime import datetime, timezone
+from Audit.audit_format import line_timestamp, create_formatter, format_timestamp, parse_timestamp
+from Audit.audit_queue import BatchFileHandler
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines - rotation is then only safe with one process
+    fcntl = None
+
+MANIFEST_VERSION = 1
+
+_rotating_handlers = weakref.WeakSet()
+
+def _reopen_files_after_fork():
+    # flock locks belong to the open file description, which a forked child shares with
+    # its parent: a worker that kept the inherited lock file would never be excluded by
+    # the master or by its sibling workers
+    for handler in list(_rotating_handlers):
+        handler._reopen_after_fork()
+
+os.register_at_fork(after_in_child=_reopen_files_after_fork)
+
+def archive_dir_for(log_path):
+    return Config.AUDIT_ARCHIVE_DIR or os.path.join(os.path.dirname(os.path.abspath(log_path)), 'archive')
+
+def manifest_path_for(log_path):
+    name = os.path.splitext(os.path.basename(log_path))[0]
+    return os.path.join(archive_dir_for(log_path), f'{name}.manifest.json')
+
+def load_manifest(log_path):
+    """Manifest for a log file ({'segments': [...]}, empty if nothing has been archived)"""
+    try:
+        with open(manifest_path_for(log_path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'log': os.path.basename(log_path), 'segments': []}
+
+def _write_manifest(log_path, manifest):
+    path = manifest_path_for(log_path)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _iso(dt):
+    return format_timestamp(dt.timestamp()) if dt else None
+
+def _parse_iso(value):
+    return parse_timestamp(value) if value else None
+
+def iter_segments(log_path, start=None, end=None):
+    """
+    Yield (path, segment_info) for every segment that may hold entries between start
+    and end (aware datetimes, either may be None), oldest first. Archived segments
+    come from the manifest; the live file is always last with info None.
+    """
+    archive_dir = archive_dir_for(log_path)
+    for segment in load_manifest(log_path).get('segments', []):
+        seg_start, seg_end = _parse_iso(segment.get('start')), _parse_iso(segment.get('end'))
+        if start and seg_end and seg_end < start:
+            continue
+        if end and seg_start and seg_start > end:
+            continue
+        path = os.path.join(archive_dir, segment['file'])
+        if os.path.exists(path):
+            yield path, segment
+    if os.path.exists(log_path):
+        yield log_path, None
+
+def open_segment(path):
+    """Open a live or archived (gzipped) segment for text reading"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def file_identity(path, stat=None):
+    """
+    Identity of a log file that survives renames: device, inode and a CRC of its first
+    line (inodes are reused once rotated segments are deleted, so inode alone isn't enough)
+    """
+    stat = stat or os.stat(path)
+    with open(path, 'rb') as f:
+        first = f.readline(4096)
+    if not first.endswith(b'\n'):
+        first = b''  # still being written
+    return f'{stat.st_dev}:{stat.st_ino}:{zlib.crc32(first):08x}'
+
+def _first_line(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.readline()
+    except OSError:
+        return ''
+
+class RotatingAuditFileHandler(BatchFileHandler):
+    """
+    BatchFileHandler that rolls the file over at local midnight and/or after max_bytes.
+    Several gunicorn workers can share one file: each batch is written under a shared
+    flock on '<file>.lock' and the move happens under an exclusive one, so the file is
+    rotated once and nobody appends to a segment that has already been moved away.
+    Each process needs its own open lock file for that, so forked children reopen it.
+    """
+
+    def __init__(self, filename, max_bytes=0, daily=True, compress=True, encoding='utf-8'):
+        super().__init__(filename, encoding=encoding)
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.compress = compress
+        self.archive_dir = archive_dir_for(self.baseFilename)
+        self._lock_file = open(f'{self.baseFilename}.lock', 'a')
+        first = _first_line(self.baseFilename)
+        ts = line_timestamp(first) if first else None
+        self._segment_day = ts.astimezone().date() if ts else None
+        _rotating_handlers.add(self)
+
+    def _reopen_after_fork(self):
+        """Own lock file and stream in a forked child; the stream is reopened on the next batch"""
+        if self._lock_file.closed:
+            return
+        self._lock_file.close()
+        self._lock_file = open(f'{self.baseFilename}.lock', 'a')
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def _flock(self, operation):
+        if fcntl:
+            fcntl.flock(self._lock_file, getattr(fcntl, operation))
+
+    def emit(self, record):
+        # Unqueued path: route single records through the same rotation checks
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        rotated = []
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            self._flock('LOCK_SH')
+            try:
+                self._reopen_if_rotated()
+                size = os.fstat(self.stream.fileno()).st_size
+                chunk = []
+                for record in records:
+                    try:
+                        line = self.format(record) + self.terminator
+                    except Exception:
+                        self.handleError(record)
+                        continue
+                    day = datetime.fromtimestamp(record.created).date()
+                    if self._segment_day is None:
+                        self._segment_day = day
+                    line_size = len(line.encode(self.encoding or 'utf-8', errors='replace'))
+                    if size > 0 and ((self.daily and day != self._segment_day)
+                                     or (self.max_bytes and size + line_size > self.max_bytes)):
+                        self._write(chunk)
+                        chunk = []
+                        pending_path = self._rotate()
+                        if pending_path:
+                            rotated.append(pending_path)
+                        size = os.fstat(self.stream.fileno()).st_size
+                        self._segment_day = day
+                    chunk.append(line)
+                    size += line_size
+                self._write(chunk)
+            finally:
+                self._flock('LOCK_UN')
+        # Nobody writes to a moved segment, so compressing it needs no lock
+        for pending_path in rotated:
+            try:
+                self._archive(pending_path)
+            except Exception as e:
+                print(f"Warning: failed to archive audit segment {pending_path}: {e}")
+        if self.index is not None:
+            self.index.maybe_catch_up()
+
+    def _write(self, lines):
+        if lines:
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+
+    def _is_current_file(self):
+        try:
+            current = os.stat(self.baseFilename)
+        except OSError:
+            return False
+        ours = os.fstat(self.stream.fileno())
+        return (current.st_ino, current.st_dev) == (ours.st_ino, ours.st_dev)
+
+    def _reopen_if_rotated(self):
+        """Another process may have moved the file away; start writing to the new one"""
+        if not self._is_current_file():
+            self.stream.close()
+            self.stream = self._open()
+            self._segment_day = None
+
+    def _rotate(self):
+        """Move the live file aside (caller holds the shared lock); returns the moved path or None"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        pending_path = None
+        self._flock('LOCK_EX')
+        try:
+            # Another worker may have rotated between our shared and exclusive lock
+            if self._is_current_file():
+                pending_path = os.path.join(
+                    self.archive_dir, f'.{os.path.basename(self.baseFilename)}.{os.getpid()}.{time.time_ns()}'
+                )
+                os.replace(self.baseFilename, pending_path)
+            self.stream.close()
+            self.stream = self._open()
+        finally:
+            self._flock('LOCK_SH')
+        return pending_path
+
+    def _archive(self, pending_path):
+        """Compress a rotated-out segment and add it to the manifest"""
+        first_ts = last_ts = None
+        lines = 0
+        raw_bytes = os.path.getsize(pending_path)
+        # Identity of the file while it was live, so incremental readers can resume into the archive
+        source = file_identity(pending_path)
+        last_line = ''
+        with open(pending_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if first_ts is None:
+                    first_ts = line_timestamp(line)
+                lines += 1
+                last_line = line
+        if last_line:
+            last_ts = line_timestamp(last_line)
+
+        name, ext = os.path.splitext(os.path.basename(self.baseFilename))
+        stamp = (first_ts or datetime.now(timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+        suffix = '.gz' if self.compress else ''
+
+        # Naming and the manifest update are serialized across workers
+        with open(f'{manifest_path_for(self.baseFilename)}.lock', 'a') as manifest_lock:
+            if fcntl:
+                fcntl.flock(manifest_lock, fcntl.LOCK_EX)
+            segment_name = f'{name}-{stamp}{ext}{suffix}'
+            counter = 1
+            while os.path.exists(os.path.join(self.archive_dir, segment_name)):
+                segment_name = f'{name}-{stamp}.{counter}{ext}{suffix}'
+                counter += 1
+            segment_path = os.path.join(self.archive_dir, segment_name)
+
+            if self.compress:
+                with open(pending_path, 'rb') as src, gzip.open(segment_path, 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.remove(pending_path)
+            else:
+                os.replace(pending_path, segment_path)
+
+            manifest = load_manifest(self.baseFilename)
+            manifest['version'] = MANIFEST_VERSION
+            manifest['log'] = os.path.basename(self.baseFilename)
+            segments = manifest.setdefault('segments', [])
+            segments.append({
+                'file': segment_name,
+                'start': _iso(first_ts),
+                'end': _iso(last_ts),
+                'lines': lines,
+                'bytes': raw_bytes,
+                'stored_bytes': os.path.getsize(segment_path),
+                'source': source,
+                'format': 'json' if last_line.startswith('{') else 'text'
+            })
+            segments.sort(key=lambda segment: segment['start'] or '')
+            _write_manifest(self.baseFilename, manifest)
+
+    def close(self):
+        super().close()
+        self._lock_file.close()
+
+def create_audit_file_handler(filename, text_format, environment=None):
+    """File handler for an audit log, configured from the AUDIT_* settings"""
+    if Config.AUDIT_ROTATE_DAILY or Config.AUDIT_ROTATE_MAX_BYTES:
+        handler = RotatingAuditFileHandler(
+            filename,
+            max_bytes=Config.AUDIT_ROTATE_MAX_BYTES,
+            daily=Config.AUDIT_ROTATE_DAILY,
+            compress=Config.AUDIT_ARCHIVE_COMPRESS
+        )
+    else:
+        handler = BatchFileHandler(filename)
+    handler.setFormatter(create_formatter(Config.AUDIT_LOG_FORMAT, text_format, environment))
+    return handler
@@ -3,6 +3,18 @@ import hashlib
 import os
 from datetime import datetime
 from flask import request
+from config import Config
+from Audit.audit_queue import attach_queued_handler
+from Audit.audit_format import TEXT_FORMATS, audit_fields
+from Audit.audit_rotation import create_audit_file_handler
+from Audit.audit_index import get_audit_index
+
+AUDIT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def audit_log_path(environment):
+    """Absolute path of the enhanced audit log for 'production' or 'local'"""
+    filename = 'productionaudit.log' if environment == 'production' else 'localaudit.log'
+    return os.path.join(AUDIT_DIR, filename)
 
 class IRS2290AuditLogger:
     def __init__(self, environment='local'):
@@ -13,21 +25,21 @@ class IRS2290AuditLogger:
         self.environment = environment
         
         # Simple file naming with absolute paths
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Get backend directory
-        if environment == 'production':
-            log_filename = os.path.join(base_dir, 'Audit', 'productionaudit.log')
-            logger_name = 'PRODUCTION_AUDIT'
-        else:
-            log_filename = os.path.join(base_dir, 'Audit', 'localaudit.log')
-            logger_name = 'LOCAL_AUDIT'
+        log_filename = audit_log_path(environment)
+        logger_name = 'PRODUCTION_AUDIT' if environment == 'production' else 'LOCAL_AUDIT'
             
         self.logger = logging.getLogger(logger_name)
         
         # Avoid duplicate handlers
         if not self.logger.handlers:
-            handler = logging.FileHandler(log_filename)
-            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-            self.logger.addHandler(handler)
+            handler = create_audit_file_handler(log_filename, TEXT_FORMATS['enhanced'], environment)
+            if Config.AUDIT_INDEX_ENABLED:
+                handler.index = get_audit_index(log_filename)
+            if Config.AUDIT_ASYNC:
+                # Writes happen on a background thread; request threads only enqueue
+                attach_queued_handler(self.logger, handler, **Config.get_audit_queue_options())
+            else:
+                self.logger.addHandler(handler)
             self.logger.setLevel(logging.INFO)
         
     def get_client_ip(self):
@@ -36,6 +48,9 @@ class IRS2290AuditLogger:
         except:
             return 'Unknown'
     
+    # All messages below pass %-style args so the string is built on the writer thread;
+    # `extra` carries the same values as structured fields for the JSON-lines format
+    
     def log_user_action(self, user_id, action, form_data=None, ein=None, tax_year=None):
         """Log user actions (form submissions, etc.)"""
         details = {
@@ -52,150 +67,136 @@ class IRS2290AuditLogger:
             # Only hash if we have actual form data
             details['data_hash'] = hashlib.sha256(str(form_data).encode()).hexdigest()[:16]
             
-        self.logger.info(f"USER_ACTION: {action} | DETAILS: {details}")
+        self.logger.info("USER_ACTION: %s | DETAILS: %s", action, details,
+                         extra=audit_fields('USER_ACTION', action=action, user=user_id, ip=details['ip_address'],
+                                            ids={'ein': ein, 'tax_year': tax_year},
+                                            data={'data_hash': details.get('data_hash')}))
     
     def log_admin_action(self, user_email, action, details):
         """Log admin actions"""
-        log_entry = f"ADMIN_ACTION: {action} | USER: {user_email} | ENV: {self.environment} | DETAILS: {details}"
-        self.logger.info(log_entry)
+        self.logger.info("ADMIN_ACTION: %s | USER: %s | ENV: %s | DETAILS: %s",
+                         action, user_email, self.environment, details,
+                         extra=audit_fields('ADMIN_ACTION', action=action, user=user_email, data={'details': details}))
     
     def log_login_attempt(self, email, success=True, failure_reason=None):
         """Log user login attempts"""
         status = "SUCCESS" if success else "FAILED"
-        details = {
-            'email': email,
-            'ip_address': self.get_client_ip(),
-            'user_agent': self.get_user_agent(),
-            'environment': self.environment
-        }
-        
-        if not success and failure_reason:
-            details['failure_reason'] = failure_reason
-            
-        log_entry = f"LOGIN_ATTEMPT: {status} | USER: {email} | ENV: {self.environment} | IP: {self.get_client_ip()}"
+        ip = self.get_client_ip()
+        extra = audit_fields('LOGIN_ATTEMPT', status=status, user=email, ip=ip,
+                             data={'reason': failure_reason} if failure_reason else None)
         if failure_reason:
-            log_entry += f" | REASON: {failure_reason}"
-            
-        self.logger.info(log_entry)
+            self.logger.info("LOGIN_ATTEMPT: %s | USER: %s | ENV: %s | IP: %s | REASON: %s",
+                             status, email, self.environment, ip, failure_reason, extra=extra)
+        else:
+            self.logger.info("LOGIN_ATTEMPT: %s | USER: %s | ENV: %s | IP: %s",
+                             status, email, self.environment, ip, extra=extra)
     
     def log_logout(self, email):
         """Log user logout"""
-        log_entry = f"LOGOUT: USER: {email} | ENV: {self.environment} | IP: {self.get_client_ip()}"
-        self.logger.info(log_entry)
+        ip = self.get_client_ip()
+        self.logger.info("LOGOUT: USER: %s | ENV: %s | IP: %s", email, self.environment, ip,
+                         extra=audit_fields('LOGOUT', user=email, ip=ip))
     
     def log_form_submission(self, user_email, ein, tax_year, month, vehicle_count, submission_id=None):
         """Log Form 2290 submissions"""
-        details = {
-            'ein': ein,
-            'tax_year': tax_year,
-            'month': month,
-            'vehicle_count': vehicle_count,
-            'ip_address': self.get_client_ip(),
-            'submission_id': submission_id
-        }
-        
-        log_entry = f"FORM_SUBMISSION: USER: {user_email} | EIN: {ein} | MONTH: {month} | VEHICLES: {vehicle_count} | ENV: {self.environment}"
+        extra = audit_fields('FORM_SUBMISSION', user=user_email,
+                             ids={'ein': ein, 'tax_year': tax_year, 'month': month, 'submission_id': submission_id},
+                             data={'vehicle_count': vehicle_count})
         if submission_id:
-            log_entry += f" | SUBMISSION_ID: {submission_id}"
-            
-        self.logger.info(log_entry)
+            self.logger.info("FORM_SUBMISSION: USER: %s | EIN: %s | MONTH: %s | VEHICLES: %s | ENV: %s | SUBMISSION_ID: %s",
+                             user_email, ein, month, vehicle_count, self.environment, submission_id, extra=extra)
+        else:
+            self.logger.info("FORM_SUBMISSION: USER: %s | EIN: %s | MONTH: %s | VEHICLES: %s | ENV: %s",
+                             user_email, ein, month, vehicle_count, self.environment, extra=extra)
     
     def log_document_access(self, user_email, action, document_type, document_id=None, ein=None):
         """Log document downloads, views, or deletions"""
-        details = {
-            'action': action,  # DOWNLOAD, VIEW, DELETE
-            'document_type': document_type,  # XML, PDF
-            'document_id': document_id,
-            'ein': ein,
-            'ip_address': self.get_client_ip()
-        }
-        
-        log_entry = f"DOCUMENT_ACCESS: {action} | USER: {user_email} | TYPE: {document_type} | ENV: {self.environment}"
+        log_format = "DOCUMENT_ACCESS: %s | USER: %s | TYPE: %s | ENV: %s"
+        args = [action, user_email, document_type, self.environment]
         if document_id:
-            log_entry += f" | DOC_ID: {document_id}"
+            log_format += " | DOC_ID: %s"
+            args.append(document_id)
         if ein:
-            log_entry += f" | EIN: {ein}"
+            log_format += " | EIN: %s"
+            args.append(ein)
             
-        self.logger.info(log_entry)
+        self.logger.info(log_format, *args,
+                         extra=audit_fields('DOCUMENT_ACCESS', action=action, user=user_email,
+                                            ids={'document_id': document_id, 'ein': ein},
+                                            data={'document_type': document_type}))
     
     def log_account_settings_change(self, user_email, setting_changed, old_value=None, new_value=None):
-        """Log account settings changes"""
-        details = {
-            'setting': setting_changed,
-            'ip_address': self.get_client_ip(),
-            'user_agent': self.get_user_agent()
-        }
-        
-        # Don't log sensitive values in plain text
-        if old_value and setting_changed.lower() not in ['password', 'token', 'secret']:
-            details['old_value'] = old_value
-        if new_value and setting_changed.lower() not in ['password', 'token', 'secret']:
-            details['new_value'] = new_value
-            
-        log_entry = f"SETTINGS_CHANGE: {setting_changed} | USER: {user_email} | ENV: {self.environment} | IP: {self.get_client_ip()}"
-        self.logger.info(log_entry)
+        """Log account settings changes (values are never written - they may be sensitive)"""
+        ip = self.get_client_ip()
+        self.logger.info("SETTINGS_CHANGE: %s | USER: %s | ENV: %s | IP: %s",
+                         setting_changed, user_email, self.environment, ip,
+                         extra=audit_fields('SETTINGS_CHANGE', action=setting_changed, user=user_email, ip=ip))
     
     def log_data_access(self, user_email, action, data_type, record_count=None, filters=None):
         """Log data access operations (viewing lists, searching, etc.)"""
-        details = {
-            'action': action,  # VIEW_LIST, SEARCH, FILTER
-            'data_type': data_type,  # SUBMISSIONS, DOCUMENTS, USERS
-            'record_count': record_count,
-            'ip_address': self.get_client_ip()
-        }
-        
-        if filters:
-            details['filters'] = str(filters)
-            
-        log_entry = f"DATA_ACCESS: {action} | USER: {user_email} | TYPE: {data_type} | ENV: {self.environment}"
+        extra = audit_fields('DATA_ACCESS', action=action, user=user_email,
+                             data={'data_type': data_type, 'record_count': record_count, 'filters': filters})
         if record_count:
-            log_entry += f" | RECORDS: {record_count}"
-            
-        self.logger.info(log_entry)
+            self.logger.info("DATA_ACCESS: %s | USER: %s | TYPE: %s | ENV: %s | RECORDS: %s",
+                             action, user_email, data_type, self.environment, record_count, extra=extra)
+        else:
+            self.logger.info("DATA_ACCESS: %s | USER: %s | TYPE: %s | ENV: %s",
+                             action, user_email, data_type, self.environment, extra=extra)
     
     def log_error_event(self, user_email, error_type, error_message, endpoint=None):
         """Log application errors and exceptions"""
-        details = {
-            'error_type': error_type,
-            'endpoint': endpoint or request.endpoint if request else 'Unknown',
-            'ip_address': self.get_client_ip(),
-            'user_agent': self.get_user_agent()
-        }
-        
-        log_entry = f"ERROR_EVENT: {error_type} | USER: {user_email} | ENV: {self.environment} | MSG: {error_message}"
+        extra = audit_fields('ERROR_EVENT', action=error_type, user=user_email, endpoint=endpoint,
+                             data={'error': str(error_message)})
         if endpoint:
-            log_entry += f" | ENDPOINT: {endpoint}"
-            
-        self.logger.error(log_entry)
+            self.logger.error("ERROR_EVENT: %s | USER: %s | ENV: %s | MSG: %s | ENDPOINT: %s",
+                              error_type, user_email, self.environment, error_message, endpoint, extra=extra)
+        else:
+            self.logger.error("ERROR_EVENT: %s | USER: %s | ENV: %s | MSG: %s",
+                              error_type, user_email, self.environment, error_message, extra=extra)
     
     def log_security_event(self, event_type, user_email=None, details=None):
         """Log security-related events"""
-        log_entry = f"SECURITY_EVENT: {event_type} | ENV: {self.environment} | IP: {self.get_client_ip()}"
+        ip = self.get_client_ip()
+        log_format = "SECURITY_EVENT: %s | ENV: %s | IP: %s"
+        args = [event_type, self.environment, ip]
         if user_email:
-            log_entry += f" | USER: {user_email}"
+            log_format += " | USER: %s"
+            args.append(user_email)
         if details:
-            log_entry += f" | DETAILS: {details}"
+            log_format += " | DETAILS: %s"
+            args.append(details)
             
-        self.logger.warning(log_entry)
+        self.logger.warning(log_format, *args,
+                            extra=audit_fields('SECURITY_EVENT', action=event_type, user=user_email, ip=ip,
+                                               data={'details': details} if details else None))
     
-    def log_api_usage(self, user_email, endpoint, method, response_status, response_time_ms=None):
-        """Log API endpoint usage for monitoring"""
-        details = {
-            'endpoint': endpoint,
-            'method': method,
-            'status': response_status,
-            'ip_address': self.get_client_ip(),
-            'user_agent': self.get_user_agent()
-        }
-        
-        if response_time_ms:
-            details['response_time_ms'] = response_time_ms
-            
-        log_entry = f"API_USAGE: {method} {endpoint} | USER: {user_email} | STATUS: {response_status} | ENV: {self.environment}"
-        if response_time_ms:
-            log_entry += f" | TIME: {response_time_ms}ms"
-            
-        self.logger.info(log_entry)
+    def log_api_usage(self, user_email, endpoint, method, response_status, response_time_ms=None, stages=None):
+        """Log API endpoint usage for monitoring (stages: traced {name: (seconds, calls)} breakdown)"""
+        stage_ms = {name: round(duration * 1000, 1) for name, (duration, _) in stages.items()} if stages else None
+        extra = audit_fields('API_USAGE', status=response_status, user=user_email, endpoint=endpoint,
+                             method=method, latency_ms=response_time_ms,
+                             data={'stages_ms': stage_ms} if stage_ms else None)
+        if stage_ms:
+            breakdown = ', '.join(f'{name}={ms}ms' for name, ms in stage_ms.items())
+            self.logger.info("API_USAGE: %s %s | USER: %s | STATUS: %s | ENV: %s | TIME: %sms | STAGES: %s",
+                             method, endpoint, user_email, response_status, self.environment, response_time_ms,
+                             breakdown, extra=extra)
+        elif response_time_ms:
+            self.logger.info("API_USAGE: %s %s | USER: %s | STATUS: %s | ENV: %s | TIME: %sms",
+                             method, endpoint, user_email, response_status, self.environment, response_time_ms,
+                             extra=extra)
+        else:
+            self.logger.info("API_USAGE: %s %s | USER: %s | STATUS: %s | ENV: %s",
+                             method, endpoint, user_email, response_status, self.environment, extra=extra)
+    
+    def log_performance_event(self, event_type, endpoint, method, user_email, duration_ms, details):
+        """Log slow statements and repeated-query (N+1) patterns with the route that caused them"""
+        details = str(details)[:500]
+        extra = audit_fields('PERFORMANCE', action=event_type, user=user_email, endpoint=endpoint,
+                             method=method, latency_ms=duration_ms, data={'details': details})
+        self.logger.warning("PERFORMANCE: %s | ENDPOINT: %s | METHOD: %s | USER: %s | ENV: %s | TIME: %sms | DETAILS: %s",
+                            event_type, endpoint, method, user_email, self.environment, duration_ms, details,
+                            extra=extra)
     
     def get_user_agent(self):
         """Get user agent from request"""
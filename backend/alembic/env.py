@@ -1,5 +1,4 @@
 from logging.config import fileConfig
-import os
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -10,19 +9,19 @@ from alembic import context
 # access to the values within the .ini file in use.
 config = context.config
 
-# Set sqlalchemy.url from environment variable if present
-database_url = os.getenv("DATABASE_URL")
-if database_url:
-    context.config.set_main_option("sqlalchemy.url", database_url)
+# Same database the app uses (DATABASE_URL, or the development SQLite file)
+from config import Config as AppConfig
+context.config.set_main_option("sqlalchemy.url", AppConfig.DATABASE_URL.replace("%", "%%"))
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. Skipped when the app runs migrations itself
+# (models.init_database), so the app's own logging setup is left alone.
+if config.config_file_name is not None and config.attributes.get('configure_logger', True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
-from app import Base
+from models import Base
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
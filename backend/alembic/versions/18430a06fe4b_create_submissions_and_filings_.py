@@ -20,6 +20,10 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
+    # Databases made by create_all at app startup already have the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('submissions')}
+    if 'form_data' in columns:
+        return
     # ### commands auto generated by Alembic - please adjust! ###
     op.add_column('submissions', sa.Column('form_data', sa.Text(), nullable=True))
     # ### end Alembic commands ###
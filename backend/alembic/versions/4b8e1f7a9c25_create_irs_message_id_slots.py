@@ -0,0 +1,37 @@
+"""create irs_message_id_slots table
+
+Revision ID: 4b8e1f7a9c25
+Revises: 9d3f6a2c4e81
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8e1f7a9c25'
+down_revision: Union[str, Sequence[str], None] = '9d3f6a2c4e81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'irs_message_id_slots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.String(), nullable=False),
+        sa.Column('slot', sa.Integer(), nullable=False),
+        sa.Column('owner', sa.String(), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'slot', name='uq_irs_message_id_slots_day_slot')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('irs_message_id_slots')
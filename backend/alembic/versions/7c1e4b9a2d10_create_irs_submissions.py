@@ -0,0 +1,61 @@
+"""create irs_submissions queue table
+
+Revision ID: 7c1e4b9a2d10
+Revises: 18430a06fe4b
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4b9a2d10'
+down_revision: Union[str, Sequence[str], None] = '18430a06fe4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'irs_submissions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.String(), nullable=True),
+        sa.Column('filing_id', sa.Integer(), nullable=True),
+        sa.Column('user_uid', sa.String(), nullable=True),
+        sa.Column('efin', sa.String(), nullable=True),
+        sa.Column('xml_s3_key', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('claimed_by', sa.String(), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('irs_submission_id', sa.String(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_irs_submissions_id'), 'irs_submissions', ['id'], unique=False)
+    op.create_index(op.f('ix_irs_submissions_message_id'), 'irs_submissions', ['message_id'], unique=True)
+    op.create_index(op.f('ix_irs_submissions_filing_id'), 'irs_submissions', ['filing_id'], unique=False)
+    op.create_index(op.f('ix_irs_submissions_user_uid'), 'irs_submissions', ['user_uid'], unique=False)
+    op.create_index(op.f('ix_irs_submissions_efin'), 'irs_submissions', ['efin'], unique=False)
+    op.create_index(op.f('ix_irs_submissions_irs_submission_id'), 'irs_submissions', ['irs_submission_id'], unique=False)
+    op.create_index('ix_irs_submissions_status_next_attempt', 'irs_submissions', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_irs_submissions_status_next_attempt', table_name='irs_submissions')
+    op.drop_index(op.f('ix_irs_submissions_irs_submission_id'), table_name='irs_submissions')
+    op.drop_index(op.f('ix_irs_submissions_efin'), table_name='irs_submissions')
+    op.drop_index(op.f('ix_irs_submissions_user_uid'), table_name='irs_submissions')
+    op.drop_index(op.f('ix_irs_submissions_filing_id'), table_name='irs_submissions')
+    op.drop_index(op.f('ix_irs_submissions_message_id'), table_name='irs_submissions')
+    op.drop_index(op.f('ix_irs_submissions_id'), table_name='irs_submissions')
+    op.drop_table('irs_submissions')
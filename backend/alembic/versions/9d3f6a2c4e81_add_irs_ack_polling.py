@@ -0,0 +1,40 @@
+"""add acknowledgement polling columns to irs_submissions
+
+Revision ID: 9d3f6a2c4e81
+Revises: 7c1e4b9a2d10
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6a2c4e81'
+down_revision: Union[str, Sequence[str], None] = '7c1e4b9a2d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('irs_submissions', sa.Column('next_poll_at', sa.DateTime(), nullable=True))
+    op.add_column('irs_submissions', sa.Column('poll_count', sa.Integer(), nullable=True))
+    op.add_column('irs_submissions', sa.Column('ack_status', sa.String(), nullable=True))
+    op.add_column('irs_submissions', sa.Column('ack_errors', sa.Text(), nullable=True))
+    op.add_column('irs_submissions', sa.Column('acknowledged_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_irs_submissions_status_next_poll', 'irs_submissions', ['status', 'next_poll_at'], unique=False)
+    # Returns submitted before this revision start polling right away
+    op.execute("UPDATE irs_submissions SET next_poll_at = submitted_at, poll_count = 0 WHERE status = 'submitted'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_irs_submissions_status_next_poll', table_name='irs_submissions')
+    op.drop_column('irs_submissions', 'acknowledged_at')
+    op.drop_column('irs_submissions', 'ack_errors')
+    op.drop_column('irs_submissions', 'ack_status')
+    op.drop_column('irs_submissions', 'poll_count')
+    op.drop_column('irs_submissions', 'next_poll_at')
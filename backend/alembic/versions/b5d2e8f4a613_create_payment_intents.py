@@ -0,0 +1,51 @@
+"""create payment_intents table
+
+Revision ID: b5d2e8f4a613
+Revises: e2a7c5d81b36
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d2e8f4a613'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c5d81b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Until now this table was only ever made by create_all at app startup, so
+    # existing databases already have it
+    if sa.inspect(op.get_bind()).has_table('payment_intents'):
+        return
+    op.create_table(
+        'payment_intents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('payment_intent_id', sa.String(), nullable=True),
+        sa.Column('user_uid', sa.String(), nullable=True),
+        sa.Column('amount_cents', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('used_for_preview', sa.String(), nullable=True),
+        sa.Column('used_for_submission', sa.String(), nullable=True),
+        sa.Column('submission_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_payment_intents_id'), 'payment_intents', ['id'], unique=False)
+    op.create_index(op.f('ix_payment_intents_payment_intent_id'), 'payment_intents', ['payment_intent_id'], unique=True)
+    op.create_index(op.f('ix_payment_intents_user_uid'), 'payment_intents', ['user_uid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_payment_intents_user_uid'), table_name='payment_intents')
+    op.drop_index(op.f('ix_payment_intents_payment_intent_id'), table_name='payment_intents')
+    op.drop_index(op.f('ix_payment_intents_id'), table_name='payment_intents')
+    op.drop_table('payment_intents')
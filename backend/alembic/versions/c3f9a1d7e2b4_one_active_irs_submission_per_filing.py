@@ -0,0 +1,34 @@
+"""one active irs_submissions row per filing
+
+Revision ID: c3f9a1d7e2b4
+Revises: b5d2e8f4a613
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f9a1d7e2b4'
+down_revision: Union[str, Sequence[str], None] = 'b5d2e8f4a613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# models.IRS_ACTIVE_STATUSES when this revision was written
+ACTIVE_WHERE = sa.text("status IN ('queued', 'sending', 'retry', 'submitted', 'accepted')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fails if a filing already has two active rows - those need a person to decide
+    # which transmission stands before the constraint can go in
+    op.create_index('uq_irs_submissions_active_filing', 'irs_submissions', ['filing_id'], unique=True,
+                    sqlite_where=ACTIVE_WHERE, postgresql_where=ACTIVE_WHERE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_irs_submissions_active_filing', table_name='irs_submissions')
@@ -0,0 +1,30 @@
+"""add manifest columns to irs_submissions
+
+Revision ID: e2a7c5d81b36
+Revises: 4b8e1f7a9c25
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c5d81b36'
+down_revision: Union[str, Sequence[str], None] = '4b8e1f7a9c25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('irs_submissions', sa.Column('ein', sa.String(), nullable=True))
+    op.add_column('irs_submissions', sa.Column('tax_year', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('irs_submissions', 'tax_year')
+    op.drop_column('irs_submissions', 'ein')
@@ -5,8 +5,6 @@ This is a simplified version that uses modular components.
 import os
 import datetime
 import json
-import firebase_admin
-from firebase_admin import credentials, auth
 from flask import Flask, request, jsonify, make_response, send_file, Response
 from flask_cors import CORS
 from sqlalchemy import text
@@ -17,9 +15,13 @@ from models import init_database, test_database_connection, SessionLocal, Submis
 from routes import register_routes
 from routes.position_tuner import init_form_positions
 from services.audit_service import init_audit_logging, log_admin_action
-from services.s3_service import get_s3_client
+from services.storage_service import get_storage
+from services.metrics_service import init_request_metrics
+from services.profiling_service import init_request_profiling
 from services.payment_tracking_service import PaymentTrackingService
+from services.stripe_service import STRIPE_AVAILABLE, PaymentLookupError, retrieve_payment_intent
 from utils.auth_decorators import verify_firebase_token, verify_admin_token
+from utils.tracing import span
 from utils.calculations import group_vehicles_by_month
 
 # Import the original functions that we haven't moved yet
@@ -38,14 +40,7 @@ def create_app():
     # Initialize CORS
     CORS(app, **Config.CORS_CONFIG)
     
-    # Initialize Firebase Admin
-    if not firebase_admin._apps:
-        if Config.FIREBASE_ADMIN_KEY_JSON:
-            firebase_cred_dict = json.loads(Config.FIREBASE_ADMIN_KEY_JSON)
-            cred = credentials.Certificate(firebase_cred_dict)
-            firebase_admin.initialize_app(cred)
-        else:
-            print("Warning: Firebase credentials not found")
+    # Firebase Admin is initialized on first use (utils.firebase_tokens.get_firebase_app)
     
     # Initialize database
     init_database()
@@ -62,6 +57,12 @@ def create_app():
     # Legacy routes that haven't been moved yet
     register_legacy_routes(app)
     
+    # Per-route latency/throughput metrics (served on /metrics)
+    init_request_metrics(app, enhanced_audit)
+    
+    # Admin-requested and 1-in-N sampled profiles (served on /admin/profiles)
+    init_request_profiling(app)
+    
     # Add CORS headers to every response (matches app.py behavior)
     @app.after_request
     def add_cors_headers(response):
@@ -69,7 +70,7 @@ def create_app():
         if origin:
             response.headers["Access-Control-Allow-Origin"] = origin
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, Range, If-None-Match, X-Profile"
         return response
     
     return app
@@ -99,7 +100,7 @@ def register_legacy_routes(app):
         db = SessionLocal()
         
         try:
-            s3 = get_s3_client()
+            storage = get_storage()
             
             for month, month_vehicles in vehicles_by_month.items():
                 # Build XML using the original XML builder
@@ -114,16 +115,11 @@ def register_legacy_routes(app):
                     )
                     return jsonify({"error": str(e)}), 400
                 
-                # Upload to S3
+                # Upload to storage
                 xml_key = f"{request.user['uid']}/form2290_{month}.xml"
                 
                 try:
-                    s3.put_object(
-                        Bucket=Config.get_bucket_name(),
-                        Key=xml_key,
-                        Body=xml_content.encode('utf-8'),
-                        ContentType='application/xml'
-                    )
+                    storage.put(xml_key, xml_content.encode('utf-8'), 'application/xml')
                 except Exception as e:
                     enhanced_audit.log_error_event(
                         user_email=request.user.get('email', 'unknown'),
@@ -185,14 +181,6 @@ def register_legacy_routes(app):
             return jsonify({}), 200
         
         try:
-            # Try to import Stripe, but handle gracefully if not available
-            try:
-                import stripe
-                STRIPE_AVAILABLE = True
-            except ImportError:
-                STRIPE_AVAILABLE = False
-                stripe = None
-                
             from services.pdf_service import PDFGenerationService
             
             data = request.get_json() or {}
@@ -248,13 +236,14 @@ def register_legacy_routes(app):
                     )
                 elif Config.STRIPE_SECRET_KEY and STRIPE_AVAILABLE:
                     try:
-                        stripe.api_key = Config.STRIPE_SECRET_KEY
-                        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+                        # The webhook hasn't marked this payment succeeded yet - ask Stripe directly
+                        with span('stripe.retrieve_intent'):
+                            intent = retrieve_payment_intent(payment_intent_id)
                         
                         if intent.status != 'succeeded':
                             return jsonify({"error": "Payment not completed"}), 402
                         
-                        if intent.metadata.get('user_uid') != request.user['uid']:
+                        if getattr(intent.metadata, 'user_uid', None) != request.user['uid']:
                             return jsonify({"error": "Payment verification failed"}), 402
                         
                         payment_verified = True
@@ -271,7 +260,7 @@ def register_legacy_routes(app):
                             endpoint="/build-pdf"
                         )
                             
-                    except stripe.error.StripeError as e:
+                    except PaymentLookupError as e:
                         return jsonify({"error": f"Payment verification failed: {str(e)}"}), 402
                 else:
                     # Stripe not configured - allow submission with audit log
@@ -296,6 +285,17 @@ def register_legacy_routes(app):
             pdf_service = PDFGenerationService()
             created_files = pdf_service.generate_pdf_for_submission(data, request.user['uid'])
             
+            # Uploads run in the background during generation - record any that failed
+            for file_info in created_files:
+                for upload in file_info.get('uploads', []):
+                    if not upload['success']:
+                        enhanced_audit.log_error_event(
+                            user_email=request.user.get('email', 'unknown'),
+                            error_type="S3_UPLOAD_ERROR",
+                            error_message=f"{upload['document_type'].upper()} upload failed for month {file_info['month']}: {upload['error']}",
+                            endpoint="/build-pdf"
+                        )
+            
             # Mark payment as used for submission after successful generation
             submission_ids = [file_info.get('filing_id') for file_info in created_files if file_info.get('filing_id')]
             if submission_ids:
@@ -329,6 +329,7 @@ def register_legacy_routes(app):
                         'month_display': month_display,
                         'filing_id': file_info['filing_id'],
                         'vehicle_count': file_info['vehicle_count'],
+                        'uploads_ok': all(upload['success'] for upload in file_info.get('uploads', [])),
                         'download_url': f"/download-pdf-by-month/{month}",
                         'filename': f"form2290_{month_display}_{file_info['vehicle_count']}vehicles.pdf"
                     })
@@ -400,14 +401,6 @@ def register_legacy_routes(app):
                         endpoint="/preview-pdf"
                     )
                 else:
-                    # Try to import Stripe, but handle gracefully if not available
-                    try:
-                        import stripe
-                        STRIPE_AVAILABLE = True
-                    except ImportError:
-                        STRIPE_AVAILABLE = False
-                        stripe = None
-                    
                     # Verify payment if provided - fallback to original logic for new payments
                     if Config.FLASK_ENV == 'development' and 'dev_mode' in payment_intent_id:
                         payment_verified = True
@@ -441,11 +434,12 @@ def register_legacy_routes(app):
                         )
                     elif Config.STRIPE_SECRET_KEY and STRIPE_AVAILABLE:
                         try:
-                            stripe.api_key = Config.STRIPE_SECRET_KEY
-                            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+                            # The webhook hasn't marked this payment succeeded yet - ask Stripe directly
+                            with span('stripe.retrieve_intent'):
+                                intent = retrieve_payment_intent(payment_intent_id)
                             
                             if intent.status == 'succeeded':
-                                if intent.metadata.get('user_uid') == request.user['uid']:
+                                if getattr(intent.metadata, 'user_uid', None) == request.user['uid']:
                                     payment_verified = True
                                     
                                     # Record/update the payment and mark as used for preview
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Audit rotation lock check across forked processes
+gunicorn forks its workers from a master that already opened the audit log
+(preload_app). flock locks belong to the open file description, so a worker that
+kept the master's '<file>.lock' would share its locks with every other worker and
+the rotation protocol in Audit/audit_rotation.py would exclude nobody. This forks
+children from a process holding a RotatingAuditFileHandler and checks that:
+
+  - the lock file and log stream a child uses are its own, not the parent's
+  - an exclusive lock taken in one child blocks the parent and a sibling child
+  - children writing and rotating one small file at once lose no records
+
+Exits 1 if any check fails.
+
+Usage: python benchmarks/audit_fork_lock_check.py [processes] [records_per_process]
+"""
+import fcntl
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Audit.audit_rotation import RotatingAuditFileHandler, iter_segments, open_segment
+
+def fork(child):
+    """Run child() in a forked process; returns its pid (exit status 0 means success)"""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            code = 0 if child() else 1
+        except BaseException:
+            code = 2
+        os._exit(code)
+    return pid
+
+def succeeded(pid):
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+
+def try_exclusive(lock_file):
+    """True if an exclusive lock could be taken right now (and releases it again)"""
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return True
+
+def same_description(a, b):
+    """Whether two fds share one open file description (the offset moves together)"""
+    before = os.lseek(b, 0, os.SEEK_CUR)
+    os.lseek(a, before + 1, os.SEEK_SET)
+    shared = os.lseek(b, 0, os.SEEK_CUR) == before + 1
+    os.lseek(a, before, os.SEEK_SET)
+    return shared
+
+def record(message):
+    return logging.LogRecord('audit', logging.INFO, __file__, 0, message, None, None)
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_process = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    directory = tempfile.mkdtemp(prefix='send2290-auditfork-')
+    log_path = os.path.join(directory, 'audit.log')
+    handler = RotatingAuditFileHandler(log_path, max_bytes=16 * 1024, daily=False)
+    handler.emit_batch([record('parent: before fork')])
+    failures = []
+
+    def check(label, ok, detail=''):
+        print(f"  {'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(label)
+
+    print(f"🔒 Audit rotation locks across fork: {processes} writers x {per_process} records")
+    print("=" * 70)
+
+    # The child's files must be reopened, not the descriptions inherited from the parent
+    parent_lock = os.dup(handler._lock_file.fileno())
+    check("child reopens the lock file", succeeded(fork(
+        lambda: not same_description(handler._lock_file.fileno(), parent_lock))))
+    check("child drops the inherited log stream", succeeded(fork(lambda: handler.stream is None)))
+    os.close(parent_lock)
+
+    # One child holds LOCK_EX; the parent and a second child must both be refused
+    locked_r, locked_w = os.pipe()
+    release_r, release_w = os.pipe()
+
+    def hold_exclusive():
+        handler._flock('LOCK_EX')
+        os.write(locked_w, b'x')
+        os.read(release_r, 1)
+        handler._flock('LOCK_UN')
+        return True
+
+    holder = fork(hold_exclusive)
+    os.read(locked_r, 1)
+    check("exclusive lock in a child blocks the parent", not try_exclusive(handler._lock_file))
+    check("exclusive lock in a child blocks a sibling child",
+          succeeded(fork(lambda: not try_exclusive(handler._lock_file))))
+    os.write(release_w, b'x')
+    check("lock holder exits cleanly", succeeded(holder))
+    check("lock is free once the holder releases it", try_exclusive(handler._lock_file))
+    for fd in (locked_r, locked_w, release_r, release_w):
+        os.close(fd)
+
+    # Concurrent writers rotating a 16 KB file: every record must land in exactly one segment
+    def write_records(worker):
+        def run():
+            for start in range(0, per_process, 50):
+                handler.emit_batch([record(f'worker {worker} record {n} ' + 'x' * 40)
+                                    for n in range(start, min(start + 50, per_process))])
+            return True
+        return run
+
+    writers = [fork(write_records(worker)) for worker in range(processes)]
+    check("all writers exit cleanly", all([succeeded(pid) for pid in writers]))
+    handler.close()
+    lines = []
+    segments = 0
+    for path, _ in iter_segments(log_path):
+        segments += 1
+        with open_segment(path) as f:
+            lines.extend(line for line in f if line.startswith('worker '))
+    expected = processes * per_process
+    check("no records lost or duplicated while rotating", len(lines) == expected == len(set(lines)),
+          f"{len(lines)} of {expected} in {segments} segments")
+
+    shutil.rmtree(directory, ignore_errors=True)
+    print("=" * 70)
+    print(f"  {'All checks passed' if not failures else f'{len(failures)} check(s) failed'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
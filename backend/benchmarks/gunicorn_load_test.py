@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Web server load test
+Starts gunicorn twice - the old single sync worker (plain `gunicorn app:app`) and
+gunicorn.conf.py - and drives each with a mixed workload at several concurrency
+levels, reporting requests per second and latency percentiles per level:
+
+  light  GET /health
+  io     GET /bench/slow-io, sleeps --io-ms like a Stripe or S3 call would
+  pdf    POST /api/positions/test-pdf, renders the full sample return
+
+The app is the real one (bench_app below adds only the slow-io route) on a throwaway
+SQLite database. Nothing leaves the machine.
+
+Usage: python benchmarks/gunicorn_load_test.py --levels 1,4,16,64 --duration 5 --io-ms 200
+"""
+import argparse
+import http.client
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+ROUTES = {
+    'light': ('GET', '/health'),
+    'io': ('GET', '/bench/slow-io'),
+    'pdf': ('POST', '/api/positions/test-pdf'),
+}
+
+def _bench_app():
+    """The real app plus a route that only waits, standing in for a slow upstream call"""
+    from app import app
+
+    def slow_io():
+        time.sleep(int(os.getenv('BENCH_IO_MS', '200')) / 1000)
+        return {'status': 'ok'}
+
+    app.add_url_rule('/bench/slow-io', 'bench_slow_io', slow_io)
+    return app
+
+if __name__ != '__main__':
+    bench_app = _bench_app()  # loaded by gunicorn as gunicorn_load_test:bench_app
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(extra_args, port, env):
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+               '--pythonpath', f'{BACKEND},{os.path.dirname(os.path.abspath(__file__))}',
+               *extra_args, 'gunicorn_load_test:bench_app']
+    # Run from the scratch directory so gunicorn doesn't pick up ./gunicorn.conf.py on its own
+    process = subprocess.Popen(command, cwd=env['BENCH_DIR'], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not come up: {' '.join(command)}")
+
+def stop_gunicorn(process):
+    process.terminate()
+    try:
+        process.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_level(port, concurrency, duration, mix):
+    """Each client thread keeps one connection and sends requests back to back"""
+    kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+    latencies = {kind: [] for kind in mix}
+    outcomes = Counter()
+    stop_at = time.monotonic() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        while time.monotonic() < stop_at:
+            kind = rng.choice(kinds)
+            method, path = ROUTES[kind]
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=b'{}' if method == 'POST' else None,
+                             headers={'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 500
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                ok = False
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+            outcomes['ok' if ok else 'errors'] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    everything = sorted(ms for values in latencies.values() for ms in values)
+    print(f"  {concurrency:3d} clients: {len(everything) / elapsed:8.1f} req/s   "
+          f"p50 {percentile(everything, 0.5):7.1f} ms   p99 {percentile(everything, 0.99):7.1f} ms   "
+          f"errors {outcomes['errors']}")
+    for kind, values in latencies.items():
+        values.sort()
+        print(f"      {kind:5s} {len(values):6d} req   p50 {percentile(values, 0.5):7.1f} ms   "
+              f"p99 {percentile(values, 0.99):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gunicorn configurations under mixed load")
+    parser.add_argument('--levels', default='1,4,16,64', help="Comma-separated client concurrency levels")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per level")
+    parser.add_argument('--io-ms', type=int, default=200, help="Latency of the simulated upstream call")
+    parser.add_argument('--mix', default='light=70,io=25,pdf=5', help="Relative weights of light/io/pdf requests")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    mix = {kind: int(weight) for kind, weight in (item.split('=') for item in args.mix.split(','))}
+    directory = tempfile.mkdtemp(prefix='send2290-gunicorn-bench-')
+    env = dict(os.environ, NODE_ENV='production', DATABASE_URL=f'sqlite:///{directory}/bench.db',
+               BENCH_IO_MS=str(args.io_ms), BENCH_DIR=directory, PYTHONDONTWRITEBYTECODE='1')
+
+    configurations = [
+        ("Before: gunicorn app:app (1 sync worker)", ['--workers', '1', '--worker-class', 'sync']),
+        ("After: gunicorn -c gunicorn.conf.py", ['--config', os.path.join(BACKEND, 'gunicorn.conf.py')]),
+    ]
+    print(f"🦄 gunicorn load test: mix {args.mix}, slow-io {args.io_ms} ms, {args.duration:g}s per level, "
+          f"{os.cpu_count()} CPU(s)")
+    try:
+        for label, extra_args in configurations:
+            print("=" * 70)
+            print(label)
+            port = free_port()
+            process = start_gunicorn(extra_args, port, env)
+            try:
+                for concurrency in levels:
+                    run_level(port, concurrency, args.duration, mix)
+            finally:
+                stop_gunicorn(process)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
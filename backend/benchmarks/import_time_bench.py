@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Cold-start import-time report
+Imports app.py in fresh interpreters (`python -X importtime`) against a throwaway
+SQLite database and reports: wall time to a ready app, the slowest modules by
+cumulative import time, and any heavy dependency that got imported at start-up even
+though it should load on first use. Exits 1 when the median goes over --budget-ms
+or a lazy module is imported eagerly, so it can guard cold start in CI.
+
+Usage: python benchmarks/import_time_bench.py --runs 5 --top 15 --budget-ms 1500
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Only needed by some requests; each is imported where it is used
+LAZY_MODULES = ('firebase_admin', 'google.auth.jwt', 'boto3', 'botocore', 'stripe',
+                'reportlab', 'PyPDF2', 'alembic')
+
+# "import time: self [us] | cumulative | imported package"
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def import_app(directory):
+    """One cold import of app.py; returns (wall seconds, {module: (self us, cumulative us, depth)})"""
+    env = dict(os.environ, NODE_ENV='production', DATABASE_URL=f'sqlite:///{directory}/bench.db',
+               PYTHONPATH=os.path.abspath(BACKEND), PYTHONDONTWRITEBYTECODE='1')
+    code = ("import time; start = time.perf_counter(); import app; "
+            "print(f'ready {time.perf_counter() - start}')")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=directory, env=env,
+                            capture_output=True, text=True, check=True)
+    wall = float(re.search(r'^ready (\S+)$', result.stdout, re.M).group(1))
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return wall, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Report app.py cold-start import time")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to time (after one warm-up)")
+    parser.add_argument('--top', type=int, default=15, help="Slowest modules to list")
+    parser.add_argument('--budget-ms', type=float, default=None, help="Fail if the median exceeds this")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='send2290-importtime-')
+    try:
+        import_app(directory)  # creates and stamps the database, warms the OS file cache
+        runs = [import_app(directory) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    walls = sorted(wall * 1000 for wall, _ in runs)
+    median = statistics.median(walls)
+    _, modules = runs[len(runs) // 2]
+    print(f"🚀 app.py cold start over {args.runs} runs: median {median:.0f} ms "
+          f"(min {walls[0]:.0f}, max {walls[-1]:.0f})")
+    print("=" * 70)
+    top_level = {name: data for name, data in modules.items() if data[2] <= 1}
+    print(f"  {'module':40s} {'self ms':>9s} {'total ms':>9s}")
+    for name, (own, cumulative, _) in sorted(top_level.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {name:40s} {own / 1000:9.1f} {cumulative / 1000:9.1f}")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    print("=" * 70)
+    if eager:
+        print(f"  ❌ Imported at start-up, should load on first use: {', '.join(eager)}")
+    else:
+        print(f"  ✅ None of {', '.join(LAZY_MODULES)} imported at start-up")
+    over_budget = args.budget_ms is not None and median > args.budget_ms
+    if over_budget:
+        print(f"  ❌ Median {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    sys.exit(1 if eager or over_budget else 0)
+
+if __name__ == "__main__":
+    main()
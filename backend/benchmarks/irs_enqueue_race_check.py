@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Concurrent enqueue check
+A double-clicked submit sends two POST /irs/submissions/<id> at once. Both requests
+can pass the "already queued?" lookup before either inserts, so only the database can
+keep the filing from being queued (and filed with the IRS) twice. This forces that
+interleaving - every thread waits at a barrier between the lookup and the insert -
+against a throwaway SQLite database and checks that exactly one row is created and
+every caller gets that row back.
+
+Exits 1 if any check fails.
+
+Usage: python benchmarks/irs_enqueue_race_check.py [concurrent_requests]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+_temp_dir = tempfile.mkdtemp(prefix='send2290-enqueue-')
+# Production mode so DATABASE_URL is honoured
+os.environ.setdefault('NODE_ENV', 'production')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_temp_dir, 'enqueue.db')}")
+os.environ.setdefault('IRS_ETIN', '12345')
+os.environ.setdefault('IRS_EFIN', '123456')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import init_database, SessionLocal, Submission, IRSSubmission
+import services.irs_queue_service as irs_queue_service
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    init_database()
+    db = SessionLocal()
+    filing = Submission(user_uid='race-user', month='202507', xml_s3_key='race/return.xml',
+                        form_data=json.dumps({'ein': '123456789', 'tax_year': 2025}))
+    db.add(filing)
+    db.commit()
+    db.refresh(filing)
+    db.close()
+
+    # Message IDs are taken after the lookup and before the insert: hold every caller there
+    barrier = threading.Barrier(concurrency, timeout=10)
+    generate_message_id = irs_queue_service.generate_message_id
+
+    def generate_after_everyone_looked(etin):
+        barrier.wait()
+        return generate_message_id(etin)
+
+    irs_queue_service.generate_message_id = generate_after_everyone_looked
+    results, errors = [], []
+
+    def enqueue():
+        try:
+            results.append(irs_queue_service.enqueue_irs_submission(filing))
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=enqueue) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    irs_queue_service.generate_message_id = generate_message_id
+
+    db = SessionLocal()
+    rows = db.query(IRSSubmission).filter(IRSSubmission.filing_id == filing.id).all()
+    db.close()
+    failures = []
+
+    def check(label, ok, detail=''):
+        print(f"  {'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(label)
+
+    print(f"🧾 Concurrent enqueue of one filing: {concurrency} requests")
+    print("=" * 70)
+    check("no request failed", not errors, '; '.join(errors))
+    check("exactly one irs_submissions row", len(rows) == 1, f"{len(rows)} rows")
+    check("exactly one request created it", sum(created for _, created in results) == 1,
+          f"{sum(created for _, created in results)} of {len(results)}")
+    check("every request got the same row back",
+          len({entry['message_id'] for entry, _ in results}) == 1 and len(results) == concurrency)
+
+    shutil.rmtree(_temp_dir, ignore_errors=True)
+    print("=" * 70)
+    print(f"  {'All checks passed' if not failures else f'{len(failures)} check(s) failed'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+IRS submission load test
+Drives the real IRSSOAPClient (pooled mutual-TLS session, envelope building, response
+parsing) against the local stand-in (irs_standin.py): submits returns from a thread
+pool - one per call, or --batch-size per SendSubmissions call - then collects every
+acknowledgement with batched GetAcks calls. Reports
+submissions per second, latency percentiles and outcome counts. Nothing is sent to
+the IRS and no database is needed.
+
+Usage: python benchmarks/irs_load_test.py --submissions 2000 --threads 8 \\
+           --latency-ms 50 --jitter-ms 15 --error-rate 0.02 --reject-rate 0.05
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import Config
+from irs_soap_client import IRSSOAPClient
+from irs_standin import start_server, add_standin_arguments
+from services.message_id_service import MessageIdGenerator
+from xml_builder import build_return_manifest
+
+ETIN = '000000000000'
+EFIN = '000000'
+
+def sample_return(vehicles):
+    """A Form 2290 return of roughly production size"""
+    rows = ''.join(
+        f"<VehicleReportTaxItem><VIN>1FUJGLDR0CLBP{index:04d}</VIN><VehicleCategoryCd>V</VehicleCategoryCd>"
+        f"<TaxAmt>550.00</TaxAmt></VehicleReportTaxItem>"
+        for index in range(vehicles)
+    )
+    return (f'<Return xmlns="http://www.irs.gov/efile" returnVersion="2025v1.0"><ReturnHeader>'
+            f'<Filer><EIN>123456789</EIN><BusinessName><BusinessNameLine1Txt>Load Test Trucking LLC'
+            f'</BusinessNameLine1Txt></BusinessName></Filer></ReturnHeader><ReturnData><IRS2290Schedule1>'
+            f'{rows}</IRS2290Schedule1></ReturnData></Return>')
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def report(label, latencies_ms, elapsed, unit):
+    ordered = sorted(latencies_ms)
+    print(f"  {label}: {len(ordered) / elapsed:8.1f} {unit}/s over {elapsed:.2f}s")
+    print(f"    p50 {percentile(ordered, 0.50):7.1f} ms   p90 {percentile(ordered, 0.90):7.1f} ms   "
+          f"p99 {percentile(ordered, 0.99):7.1f} ms   max {percentile(ordered, 1.0):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the IRS client against the local stand-in")
+    parser.add_argument('--submissions', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent submissions (cf. IRS_QUEUE_CONCURRENCY)")
+    parser.add_argument('--vehicles', type=int, default=5, help="Vehicles per sample return")
+    parser.add_argument('--retries', type=int, default=3, help="Attempts per return for retryable failures")
+    parser.add_argument('--batch-size', type=int, default=1, help="Returns per transmission (cf. IRS_BATCH_SIZE)")
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    # Per-call INFO/ERROR lines would swamp the report; failures are counted instead
+    logging.getLogger('irs_soap_client').setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        standin = start_server(directory, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate=args.error_rate, reject_rate=args.reject_rate,
+                               ack_delay=args.ack_delay)
+        client = IRSSOAPClient(ETIN, EFIN, standin.client_cert, standin.client_key,
+                               base_url=standin.base_url, ca_bundle=standin.ca_path)
+        message_ids = MessageIdGenerator(claim_slot=lambda day: 0)  # one process, so slot 0 is ours
+        form_xml = sample_return(args.vehicles).encode('utf-8')
+        manifest = build_return_manifest({'ein': '123456789', 'tax_year': 2025})
+        outcomes = Counter()
+        latencies_ms = []
+
+        def submit(_):
+            message_id = message_ids.next_id(ETIN)
+            for attempt in range(1, args.retries + 1):
+                started = time.perf_counter()
+                result = client.submit_form_2290(form_xml, message_id=message_id, manifest=manifest)
+                latencies_ms.append((time.perf_counter() - started) * 1000)
+                if result['success']:
+                    outcomes['submitted'] += 1
+                    return result['submission_id']
+                if not result.get('retryable') or attempt == args.retries:
+                    outcomes['failed'] += 1
+                    return None
+                outcomes['retried'] += 1
+
+        def submit_batch(_):
+            pending = [message_ids.next_id(ETIN) for _ in range(args.batch_size)]
+            submitted = []
+            for attempt in range(1, args.retries + 1):
+                started = time.perf_counter()
+                results = client.submit_batch([(message_id, form_xml, manifest) for message_id in pending])
+                latencies_ms.append((time.perf_counter() - started) * 1000)
+                retry = []
+                for message_id in pending:
+                    result = results[message_id]
+                    if result['success']:
+                        outcomes['submitted'] += 1
+                        submitted.append(result['submission_id'])
+                    elif result.get('retryable') and attempt < args.retries:
+                        outcomes['retried'] += 1
+                        retry.append(message_id)
+                    else:
+                        outcomes['failed'] += 1
+                if not retry:
+                    break
+                pending = retry
+            return submitted
+
+        print(f"🏛️  IRS load test: {args.submissions} returns, {args.threads} threads, "
+              f"{args.batch_size} per transmission, ~{len(form_xml) / 1024:.1f} KB each")
+        print(f"    stand-in: latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate}, "
+              f"reject rate {args.reject_rate}")
+        print("=" * 70)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            if args.batch_size > 1:
+                batches = -(-args.submissions // args.batch_size)
+                submission_ids = [submission_id for submitted in pool.map(submit_batch, range(batches))
+                                  for submission_id in submitted]
+            else:
+                submission_ids = [submission_id for submission_id in pool.map(submit, range(args.submissions))
+                                  if submission_id]
+        elapsed = time.perf_counter() - start
+        report("Submissions", latencies_ms, elapsed, 'calls')
+        print(f"    {outcomes['submitted'] / elapsed:.1f} returns/s: {outcomes['submitted']} submitted, "
+              f"{outcomes['failed']} failed, {outcomes['retried']} retried")
+
+        # Acknowledgements, a GetAcks call per batch as AckPoller does
+        time.sleep(args.ack_delay)
+        batch_size = Config.IRS_ACK_BATCH_SIZE
+        batches = [submission_ids[i:i + batch_size] for i in range(0, len(submission_ids), batch_size)]
+        ack_latencies_ms = []
+        acks = Counter()
+
+        def poll(batch):
+            started = time.perf_counter()
+            try:
+                result = client.get_acknowledgements(batch)
+            except Exception:
+                acks['poll errors'] += 1
+                return
+            finally:
+                ack_latencies_ms.append((time.perf_counter() - started) * 1000)
+            for status, _ in result.values():
+                acks[status] += 1
+            acks['pending'] += len(batch) - len(result)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(poll, batches))
+        report(f"GetAcks ({batch_size} per call)", ack_latencies_ms, time.perf_counter() - start, 'calls')
+        print("    " + ", ".join(f"{count} {status}" for status, count in sorted(acks.items())))
+        standin.stop()
+
+if __name__ == "__main__":
+    main()
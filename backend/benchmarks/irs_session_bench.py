@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+IRS transport benchmark
+Compares a new requests.Session per call (old _create_transport behaviour: fresh TCP
+and mutual-TLS handshake every time) against the shared pooled session, against a
+local HTTPS stand-in that requires a client certificate (irs_standin.py). Nothing is
+sent to the IRS.
+
+Usage: python benchmarks/irs_session_bench.py [calls] [threads]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import requests
+from irs_soap_client import IRSSOAPClient, close_irs_sessions
+from irs_standin import start_server
+
+ENVELOPE = """<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+    <soap:Body><GetSubmissionStatus><SubmissionId>00000020252000000001</SubmissionId></GetSubmissionStatus></soap:Body>
+</soap:Envelope>"""
+
+def run(fn, calls, threads):
+    """(calls per second, mean ms per call)"""
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(calls):
+            fn()
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda _: fn(), range(calls)))
+    elapsed = time.perf_counter() - start
+    return calls / elapsed, elapsed * 1000 / calls * threads
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    with tempfile.TemporaryDirectory() as directory:
+        standin = start_server(directory)
+        base_url, ca_path = standin.base_url, standin.ca_path
+        client_cert, client_key = standin.client_cert, standin.client_key
+        client = IRSSOAPClient('000000000000', '000000', client_cert, client_key,
+                               base_url=base_url, ca_bundle=ca_path)
+
+        def fresh_session_call():
+            """Old behaviour - a new session (and handshake) for every call"""
+            with requests.Session() as session:
+                session.cert = (client_cert, client_key)
+                response = session.post(f'{base_url}/submit', data=ENVELOPE.encode('utf-8'),
+                                        headers={'Content-Type': 'text/xml; charset=utf-8'},
+                                        timeout=30, verify=ca_path)
+                response.raise_for_status()
+
+        def pooled_call():
+            client._send_soap_request(ENVELOPE)
+
+        print(f"🔐 IRS transport benchmark ({calls} calls, local mTLS stand-in)")
+        print("=" * 60)
+        for label, thread_count in (('sequential', 1), (f'{threads} threads', threads)):
+            fresh_rate, fresh_ms = run(fresh_session_call, calls, thread_count)
+            close_irs_sessions()
+            pooled_rate, pooled_ms = run(pooled_call, calls, thread_count)
+            print(f"  {label}:")
+            print(f"    Session per call:  {fresh_rate:8.1f} calls/s  {fresh_ms:7.2f} ms/call")
+            print(f"    Pooled session:    {pooled_rate:8.1f} calls/s  {pooled_ms:7.2f} ms/call")
+            print(f"    Speedup:           {pooled_rate / fresh_rate:8.1f}x")
+        standin.stop()
+
+if __name__ == "__main__":
+    main()
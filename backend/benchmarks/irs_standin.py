@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Local IRS A2A stand-in
+An HTTPS server that requires a client certificate, like the IRS endpoint, and
+answers the calls IRSSOAPClient makes:
+
+    POST /submit            submission (echoes the manifest SubmissionId) or GetSubmissionStatus
+    POST /sendsubmissions   batch of submissions, a receipt or error per return
+    POST /getacks           GetAcks for a list of SubmissionIds
+
+Latency, error rate, rejection rate and how long acknowledgements take to appear are
+configurable. Resubmitting a SubmissionId returns the original receipt, as the queue's
+retry logic expects. In a batch, a return whose manifest TIN is all zeros is refused on
+receipt while the others go through. Certificates (CA, server, client) are generated
+on start.
+
+Run on its own and point the app at it:
+
+    python benchmarks/irs_standin.py --port 8443 --latency-ms 80 --error-rate 0.02 --reject-rate 0.1
+
+or use start_server() from a benchmark (see irs_load_test.py, irs_session_bench.py).
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import re
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+SUBMISSION_ID_RE = re.compile(rb'<(?:\w+:)?SubmissionId>\s*([0-9A-Za-z]+)\s*</(?:\w+:)?SubmissionId>')
+
+REJECTION_ERRORS = (
+    ('F2290-004-01', "EIN in the Return Header must match data in the e-File database"),
+    ('F2290-017-01', "Tax Computation amounts must equal the sum of the Schedule 1 vehicle amounts"),
+    ('R0000-904-03', "Software ID in the Return Header must have passed testing for the form family"),
+)
+
+ENVELOPE = """<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+    <soap:Body>{body}</soap:Body>
+</soap:Envelope>"""
+
+def write_cert(directory, name, subject, issuer_cert=None, issuer_key=None, is_ca=False):
+    """Self-signed (or CA-signed) EC certificate and key as PEM files"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject)]))
+        .issuer_name(issuer_cert.subject if issuer_cert else x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject)]))
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=is_ca, path_length=None), critical=True)
+    )
+    if subject == 'localhost':
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName('localhost')]), critical=False)
+    cert = builder.sign(issuer_key or key, hashes.SHA256())
+    cert_path = os.path.join(directory, f'{name}.crt')
+    key_path = os.path.join(directory, f'{name}.key')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert, key, cert_path, key_path
+
+def write_certs(directory):
+    """(ca_path, server_cert, server_key, client_cert, client_key) for a fresh test PKI"""
+    ca_cert, ca_key, ca_path, _ = write_cert(directory, 'ca', 'Stand-in CA', is_ca=True)
+    _, _, server_cert, server_key = write_cert(directory, 'server', 'localhost', ca_cert, ca_key)
+    _, _, client_cert, client_key = write_cert(directory, 'client', 'Stand-in Transmitter', ca_cert, ca_key)
+    return ca_path, server_cert, server_key, client_cert, client_key
+
+class StandinState:
+    """Receipts by SubmissionId, shared by the handler threads"""
+
+    def __init__(self, reject_rate, ack_delay):
+        self.reject_rate = reject_rate
+        self.ack_delay = ack_delay
+        self.receipts = {}  # submission id -> (received monotonic, rejection error or None)
+        self.lock = threading.Lock()
+
+    def receive(self, submission_id):
+        with self.lock:
+            if submission_id not in self.receipts:
+                error = random.choice(REJECTION_ERRORS) if random.random() < self.reject_rate else None
+                self.receipts[submission_id] = (time.monotonic(), error)
+
+    def outcome(self, submission_id):
+        """None while still processing, else ('Accepted' | 'Rejected', error or None)"""
+        with self.lock:
+            receipt = self.receipts.get(submission_id)
+        if receipt is None or time.monotonic() - receipt[0] < self.ack_delay:
+            return None
+        return ('Rejected', receipt[1]) if receipt[1] else ('Accepted', None)
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive unless the client asks to close
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, Nagle + delayed ACK add ~40ms
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        options = self.server.options
+        if options['latency_ms'] or options['jitter_ms']:
+            time.sleep(max(0.0, random.gauss(options['latency_ms'], options['jitter_ms'])) / 1000.0)
+        if random.random() < options['error_rate']:
+            return self._send(503, b'Service Unavailable')
+
+        if self.path == '/sendsubmissions':
+            return self._send(200, self._receive_batch(body))
+        ids = [match.decode('ascii') for match in SUBMISSION_ID_RE.findall(body)]
+        if self.path == '/getacks':
+            return self._send(200, self._acks(ids))
+        if self.path != '/submit':
+            return self._send(404, b'Not Found')
+        if not ids:
+            return self._send(400, b'No SubmissionId in request')
+        if b'GetSubmissionStatus' in body:
+            outcome = self.server.state.outcome(ids[0])
+            status = outcome[0] if outcome else ('Received' if ids[0] in self.server.state.receipts else 'NotFound')
+            return self._send(200, ENVELOPE.format(
+                body=f"<SubmissionStatus><SubmissionId>{ids[0]}</SubmissionId>"
+                     f"<SubmissionStatusTxt>{status}</SubmissionStatusTxt></SubmissionStatus>").encode('utf-8'))
+        self.server.state.receive(ids[0])
+        return self._send(200, ENVELOPE.format(
+            body=f"<SubmissionReceipt><SubmissionId>{ids[0]}</SubmissionId>"
+                 f"<SubmissionReceivedTs>{datetime.datetime.now().isoformat()}</SubmissionReceivedTs>"
+                 f"</SubmissionReceipt>").encode('utf-8'))
+
+    def _receive_batch(self, body):
+        receipts, errors = [], []
+        for submission in ET.fromstring(body).iter('{http://www.irs.gov/efile}Submission'):
+            submission_id = submission.findtext('.//{http://www.irs.gov/efile}SubmissionId', '').strip()
+            tin = submission.findtext('.//{http://www.irs.gov/efile}TIN', '').strip()
+            if tin.strip('0') == '':
+                errors.append(f"<SubmissionError><SubmissionId>{submission_id}</SubmissionId>"
+                              f"<ErrorMessageTxt>Manifest TIN is missing</ErrorMessageTxt></SubmissionError>")
+                continue
+            self.server.state.receive(submission_id)
+            receipts.append(f"<SubmissionReceiptGrp><SubmissionId>{submission_id}</SubmissionId>"
+                            f"<SubmissionReceivedTs>{datetime.datetime.now().isoformat()}</SubmissionReceivedTs>"
+                            f"</SubmissionReceiptGrp>")
+        return ENVELOPE.format(
+            body=f"<SendSubmissionsResponse><SubmissionReceiptList>{''.join(receipts)}</SubmissionReceiptList>"
+                 f"<SubmissionErrorList>{''.join(errors)}</SubmissionErrorList></SendSubmissionsResponse>"
+        ).encode('utf-8')
+
+    def _acks(self, ids):
+        parts = []
+        for submission_id in ids:
+            outcome = self.server.state.outcome(submission_id)
+            if outcome is None:
+                continue  # still processing - left out, as the IRS does
+            status, error = outcome
+            errors = ''
+            if error:
+                errors = (f"<ErrorList><Error><RuleNum>{error[0]}</RuleNum>"
+                          f"<ErrorMessageTxt>{error[1]}</ErrorMessageTxt></Error></ErrorList>")
+            parts.append(f"<Acknowledgement><SubmissionId>{submission_id}</SubmissionId>"
+                         f"<AcceptanceStatusTxt>{status}</AcceptanceStatusTxt>{errors}</Acknowledgement>")
+        return ENVELOPE.format(body=f"<AcknowledgementList>{''.join(parts)}</AcknowledgementList>").encode('utf-8')
+
+    def _send(self, status, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(server_cert, server_key, ca_path, options, port=0, port_queue=None):
+    """Run the stand-in in this process until it is killed"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(server_cert, server_key)
+    context.load_verify_locations(ca_path)
+    context.verify_mode = ssl.CERT_REQUIRED  # mutual TLS, like the IRS A2A endpoint
+
+    server = ThreadingHTTPServer(('localhost', port), StandinHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 128
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    server.options = options
+    server.state = StandinState(options['reject_rate'], options['ack_delay'])
+    if port_queue is not None:
+        port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+class Standin:
+    """A stand-in running in a child process (so it doesn't compete with the client for the GIL)"""
+
+    def __init__(self, process, base_url, ca_path, client_cert, client_key):
+        self.process = process
+        self.base_url = base_url
+        self.ca_path = ca_path
+        self.client_cert = client_cert
+        self.client_key = client_key
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+def start_server(directory, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, reject_rate=0.0, ack_delay=0.0):
+    """Generate certificates in `directory` and start a stand-in on a free port"""
+    ca_path, server_cert, server_key, client_cert, client_key = write_certs(directory)
+    options = {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'error_rate': error_rate,
+               'reject_rate': reject_rate, 'ack_delay': ack_delay}
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(server_cert, server_key, ca_path, options, 0, port_queue),
+                                      daemon=True)
+    process.start()
+    port = port_queue.get(timeout=10)
+    return Standin(process, f'https://localhost:{port}', ca_path, client_cert, client_key)
+
+def add_standin_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Mean response latency")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Standard deviation of the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls answered 503")
+    parser.add_argument('--reject-rate', type=float, default=0.0, help="Fraction of returns acknowledged as rejected")
+    parser.add_argument('--ack-delay', type=float, default=0.0, help="Seconds before a return's acknowledgement appears")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local IRS A2A stand-in (mutual TLS)")
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--cert-dir', help="Where to write the generated certificates (default: a temp dir)")
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    directory = args.cert_dir or tempfile.mkdtemp(prefix='irs-standin-')
+    os.makedirs(directory, exist_ok=True)
+    ca_path, server_cert, server_key, client_cert, client_key = write_certs(directory)
+    options = {'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate,
+               'reject_rate': args.reject_rate, 'ack_delay': args.ack_delay}
+
+    print(f"🏛️  IRS stand-in on https://localhost:{args.port} - point the app at it with:")
+    print(f"    IRS_BASE_URL=https://localhost:{args.port}")
+    print(f"    IRS_CA_BUNDLE={ca_path}")
+    print(f"    IRS_CERT_FILE={client_cert}")
+    print(f"    IRS_KEY_FILE={client_key}")
+    sys.stdout.flush()
+    try:
+        serve(server_cert, server_key, ca_path, options, port=args.port)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
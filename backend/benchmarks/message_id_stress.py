@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Message ID stress test
+Several processes, each with several threads, generate IRS message IDs at full speed
+against one (temporary SQLite) slot table; every ID is then checked for duplicates.
+The old HHMMSS + centisecond suffix is run the same way for comparison.
+
+Usage: python benchmarks/message_id_stress.py [processes] [threads] [ids_per_thread]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import Pool
+
+_temp_dir = tempfile.mkdtemp(prefix='send2290-msgid-')
+# Production mode so DATABASE_URL is honoured; every process shares this file
+os.environ.setdefault('NODE_ENV', 'production')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_temp_dir, 'slots.db')}")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+ETIN = '000000000000'
+
+def legacy_message_id(etin):
+    """The previous generator, kept here only to show its collision rate"""
+    now = datetime.now()
+    return f"{etin}{now.year}{now.timetuple().tm_yday:03d}{now.strftime('%H%M%S')}{now.microsecond//10000:02d}"
+
+def _as_int(message_id):
+    # ccyyddd and the base-36 suffix as one 64-bit key (the ETIN is the same for all)
+    return int(message_id[12:19]) * 36 ** 8 + int(message_id[19:], 36)
+
+def _generate(args):
+    legacy, threads, per_thread = args
+    if legacy:
+        generate = legacy_message_id
+    else:
+        from services.message_id_service import generate_message_id as generate
+
+    def work(_):
+        keys = array('Q')
+        for _ in range(per_thread):
+            message_id = generate(ETIN)
+            assert len(message_id) == 27, message_id
+            keys.append(_as_int(message_id))
+        return keys
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(work, range(threads)))
+    combined = array('Q')
+    for keys in results:
+        combined.extend(keys)
+    return combined.tobytes()
+
+def run(legacy, processes, threads, per_thread):
+    start = time.perf_counter()
+    with Pool(processes) as pool:
+        chunks = pool.map(_generate, [(legacy, threads, per_thread)] * processes)
+    elapsed = time.perf_counter() - start
+    keys = array('Q')
+    for chunk in chunks:
+        keys.frombytes(chunk)
+    ordered = sorted(keys)
+    duplicates = sum(1 for a, b in zip(ordered, ordered[1:]) if a == b)
+    return len(keys), duplicates, elapsed
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    per_thread = int(sys.argv[3]) if len(sys.argv) > 3 else 125000
+
+    from models import init_database
+    init_database()
+
+    print(f"🔢 Message ID stress test ({processes} processes x {threads} threads x {per_thread:,} IDs)")
+    print("=" * 60)
+    total, duplicates, elapsed = run(False, processes, threads, per_thread)
+    print(f"  Slot + counter:  {total:,} IDs in {elapsed:.1f}s ({total / elapsed:,.0f}/s), {duplicates} duplicates")
+    legacy_per_thread = min(per_thread, 20000)
+    total, legacy_duplicates, elapsed = run(True, processes, threads, legacy_per_thread)
+    print(f"  Old HHMMSScc:    {total:,} IDs in {elapsed:.1f}s, {legacy_duplicates:,} duplicates")
+    shutil.rmtree(_temp_dir, ignore_errors=True)
+    sys.exit(1 if duplicates else 0)
+
+if __name__ == "__main__":
+    main()
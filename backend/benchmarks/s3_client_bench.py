@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+S3 client microbenchmark
+Compares building a boto3 client per call (old get_s3_client behaviour)
+against the shared pooled client, using presigning so no network is needed.
+
+Usage: python benchmarks/s3_client_bench.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Presigning only needs credentials to be present, not valid
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'AKIABENCHMARK')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark-secret')
+os.environ.setdefault('BUCKET', 'benchmark-bucket')
+
+import boto3
+from config import Config
+from services.s3_service import get_s3_client, reset_s3_client, generate_presigned_url
+
+def presign_with_fresh_client(key):
+    """Old behaviour - a new client for every call"""
+    s3 = boto3.client(
+        's3',
+        aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+        region_name=Config.AWS_DEFAULT_REGION
+    )
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': Config.get_bucket_name(), 'Key': key},
+        ExpiresIn=900
+    )
+
+def time_calls(fn, iterations):
+    """Return per-call latency in milliseconds"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(f"bench-user/202507/form2290_{i}.pdf")
+    return (time.perf_counter() - start) * 1000 / iterations
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print(f"🪣 S3 client benchmark ({iterations} presigned URLs)")
+    print("=" * 50)
+
+    fresh_ms = time_calls(presign_with_fresh_client, iterations)
+
+    reset_s3_client()
+    start = time.perf_counter()
+    get_s3_client()
+    first_build_ms = (time.perf_counter() - start) * 1000
+    shared_ms = time_calls(lambda key: generate_presigned_url(key, expiration=900), iterations)
+
+    print(f"  Fresh client per call:  {fresh_ms:8.3f} ms/call")
+    print(f"  Shared pooled client:   {shared_ms:8.3f} ms/call")
+    print(f"  One-time client build:  {first_build_ms:8.3f} ms")
+    if shared_ms > 0:
+        print(f"  Speedup:                {fresh_ms / shared_ms:8.1f}x")
+
+if __name__ == "__main__":
+    main()
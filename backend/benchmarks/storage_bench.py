@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Storage backend throughput benchmark
+Runs the filing upload pattern (one XML + one PDF per month, queued on the
+shared upload pool) against the offline backends, so no AWS access is needed.
+
+Usage: python benchmarks/storage_bench.py [filings] [pdf_kb]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.storage_service import (
+    LocalStorageBackend, MemoryStorageBackend, set_storage, submit_upload
+)
+
+def run_filings(filings, pdf_bytes, xml_bytes):
+    """Queue uploads the way PDFGenerationService does and join them all"""
+    futures = []
+    for i in range(filings):
+        futures.append(submit_upload(xml_bytes, f"bench-user/{i:06d}/form2290.xml", 'application/xml'))
+        futures.append(submit_upload(pdf_bytes, f"bench-user/{i:06d}/form2290.pdf", 'application/pdf'))
+    return sum(1 for f in futures if f.result()['success'])
+
+def main():
+    filings = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    pdf_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    pdf_bytes = os.urandom(pdf_kb * 1024)
+    xml_bytes = b'<Return>' + b'x' * 8 * 1024 + b'</Return>'
+
+    print(f"💾 Storage benchmark ({filings} filings, {pdf_kb} KB PDF + 8 KB XML each)")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as root:
+        for backend in (MemoryStorageBackend(), LocalStorageBackend(root)):
+            set_storage(backend)
+            start = time.perf_counter()
+            ok = run_filings(filings, pdf_bytes, xml_bytes)
+            elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            listed = backend.list('bench-user/', limit=filings * 2)
+            list_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            failed = backend.delete_many([obj['key'] for obj in listed])
+            delete_ms = (time.perf_counter() - start) * 1000
+
+            print(f"  {backend.name:<7} {filings / elapsed:9.1f} filings/s  "
+                  f"{ok / elapsed:9.1f} objects/s  "
+                  f"list {list_ms:7.1f} ms  delete {delete_ms:7.1f} ms  ({len(failed)} failed)")
+
+if __name__ == "__main__":
+    main()
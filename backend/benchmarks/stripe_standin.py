@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Local Stripe stand-in
+A small HTTP server answering the one API call the PDF routes fall back to
+(GET /v1/payment_intents/<id>), plus helpers that build payment_intent.* events and
+sign them the way Stripe does (Stripe-Signature: t=<unix time>,v1=<HMAC-SHA256>), so
+the webhook can be exercised without a Stripe account or network access.
+
+Serve the API and point the app at it (STRIPE_API_BASE=http://127.0.0.1:12111):
+
+    python benchmarks/stripe_standin.py serve --port 12111 --latency-ms 150
+
+Send a signed event to a running app:
+
+    python benchmarks/stripe_standin.py send http://localhost:5000/payment/webhook \\
+        --secret whsec_... --intent pi_123 --user <firebase uid> --type payment_intent.succeeded
+
+or use StripeStandin from a script (see stripe_webhook_test.py).
+"""
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+INTENT_PATH_RE = re.compile(r'^/v1/payment_intents/([A-Za-z0-9_]+)$')
+
+def sign_payload(payload, secret, timestamp=None):
+    """Stripe-Signature header value for a raw webhook body"""
+    timestamp = int(time.time()) if timestamp is None else int(timestamp)
+    signed = f"{timestamp}.".encode('utf-8') + payload
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def payment_intent_event(event_type, intent):
+    """A payment_intent.* event as Stripe delivers it"""
+    return {
+        'id': f"evt_{uuid.uuid4().hex[:24]}",
+        'object': 'event',
+        'api_version': '2024-06-20',
+        'created': int(time.time()),
+        'type': event_type,
+        'livemode': False,
+        'pending_webhooks': 1,
+        'data': {'object': dict(intent)},
+    }
+
+def post_event(url, event, secret, timestamp=None, signature=None):
+    """POST a signed event to a webhook URL; returns (status, body)"""
+    payload = json.dumps(event).encode('utf-8')
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    try:
+        conn.request('POST', parts.path, body=payload, headers={
+            'Content-Type': 'application/json',
+            'Stripe-Signature': signature or sign_payload(payload, secret, timestamp),
+        })
+        response = conn.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        conn.close()
+
+class StripeStandin:
+    """Payment intents held in memory, served over HTTP like api.stripe.com"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = latency_ms
+        self.intents = {}
+        self.retrieve_calls = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def create_intent(self, user_uid, amount=4500, status='requires_payment_method'):
+        intent = {
+            'id': f"pi_{uuid.uuid4().hex[:24]}",
+            'object': 'payment_intent',
+            'amount': amount,
+            'currency': 'usd',
+            'status': status,
+            'metadata': {'user_uid': user_uid, 'form_type': '2290'},
+            'created': int(time.time()),
+            'livemode': False,
+        }
+        with self._lock:
+            self.intents[intent['id']] = intent
+        return dict(intent)
+
+    def transition(self, intent_id, status):
+        """Move an intent to a new status; returns the event Stripe would send for it"""
+        event_type = {
+            'succeeded': 'payment_intent.succeeded',
+            'processing': 'payment_intent.processing',
+            'requires_action': 'payment_intent.requires_action',
+            'requires_payment_method': 'payment_intent.payment_failed',
+            'canceled': 'payment_intent.canceled',
+        }[status]
+        with self._lock:
+            self.intents[intent_id]['status'] = status
+            intent = dict(self.intents[intent_id])
+        return payment_intent_event(event_type, intent)
+
+    def start(self, port=0):
+        """Serve on 127.0.0.1 in a background thread; returns the base URL"""
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up waiting (timeout checks)
+
+            def do_GET(self):
+                if not self.headers.get('Authorization', '').startswith('Bearer sk_'):
+                    return self._send(401, {'error': {'type': 'invalid_request_error',
+                                                      'message': 'Invalid API Key provided'}})
+                match = INTENT_PATH_RE.match(self.path.split('?')[0])
+                if not match:
+                    return self._send(404, {'error': {'type': 'invalid_request_error',
+                                                      'message': f'Unrecognized request URL (GET: {self.path})'}})
+                with standin._lock:
+                    standin.retrieve_calls += 1
+                    intent = standin.intents.get(match.group(1))
+                    intent = dict(intent) if intent else None
+                if standin.latency_ms:
+                    time.sleep(standin.latency_ms / 1000)
+                if intent is None:
+                    return self._send(404, {'error': {'type': 'invalid_request_error', 'code': 'resource_missing',
+                                                      'message': f"No such payment_intent: '{match.group(1)}'"}})
+                self._send(200, intent)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Stripe API and webhook stand-in")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help="Serve GET /v1/payment_intents/<id>")
+    serve.add_argument('--port', type=int, default=12111)
+    serve.add_argument('--latency-ms', type=float, default=0.0)
+    serve.add_argument('--user', default='standin-user', help="Owner of the sample intent created on start")
+    send = commands.add_parser('send', help="POST one signed payment_intent event to a webhook URL")
+    send.add_argument('url')
+    send.add_argument('--secret', required=True, help="STRIPE_WEBHOOK_SECRET of the receiving app")
+    send.add_argument('--intent', required=True)
+    send.add_argument('--user', required=True)
+    send.add_argument('--amount', type=int, default=4500)
+    send.add_argument('--type', default='payment_intent.succeeded')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        standin = StripeStandin(latency_ms=args.latency_ms)
+        base_url = standin.start(args.port)
+        intent = standin.create_intent(args.user, status='succeeded')
+        print(f"💳 Stripe stand-in on {base_url} (STRIPE_API_BASE={base_url}, any sk_ key)")
+        print(f"    sample intent {intent['id']} (succeeded, user {args.user})")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            standin.stop()
+    else:
+        status = args.type.split('.', 1)[1]
+        intent = {'id': args.intent, 'object': 'payment_intent', 'amount': args.amount, 'currency': 'usd',
+                  'status': {'payment_failed': 'requires_payment_method'}.get(status, status),
+                  'metadata': {'user_uid': args.user, 'form_type': '2290'}}
+        code, body = post_event(args.url, payment_intent_event(args.type, intent), args.secret)
+        print(f"{code} {body}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Stripe webhook check against the local stand-in (stripe_standin.py)
+Runs the app in-process on a throwaway SQLite database with STRIPE_API_BASE pointed at
+the stand-in, then:
+
+  - sends forged, unsigned and stale events to /payment/webhook (all refused)
+  - walks an intent through processing -> succeeded with signed events, including a
+    duplicate delivery and a late 'processing' that must not undo 'succeeded'
+  - times the PDF routes' payment check: local row (after the webhook) vs. the
+    Stripe fallback, and the fallback against a stand-in slower than
+    STRIPE_VERIFY_TIMEOUT
+  - calls /build-pdf for intents the webhook hasn't confirmed, which must answer 402
+    after at most one short Stripe call
+
+Exits 1 if any check fails. Nothing leaves the machine.
+
+Usage: python benchmarks/stripe_webhook_test.py --latency-ms 150 --timeout 0.5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from stripe_standin import StripeStandin, payment_intent_event, sign_payload
+
+WEBHOOK_SECRET = 'whsec_standin_0123456789abcdef'
+USER = 'stripe-standin-user'
+
+class StaticVerifier:
+    """Accepts any bearer token as the test user (stands in for Firebase)"""
+
+    def verify(self, token):
+        return {'uid': USER, 'email': 'standin@example.com'}
+
+def timed_ms(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the Stripe webhook and payment check against a stand-in")
+    parser.add_argument('--latency-ms', type=float, default=150.0, help="Stand-in API latency")
+    parser.add_argument('--timeout', type=float, default=0.5, help="STRIPE_VERIFY_TIMEOUT for the run")
+    parser.add_argument('--runs', type=int, default=20, help="Timed payment checks per path")
+    args = parser.parse_args()
+
+    standin = StripeStandin(latency_ms=args.latency_ms)
+    directory = tempfile.mkdtemp(prefix='send2290-stripe-')
+    os.environ.update(NODE_ENV='production', DATABASE_URL=f'sqlite:///{directory}/stripe.db',
+                      STRIPE_SECRET_KEY='sk_test_standin', STRIPE_PUBLISHABLE_KEY='pk_test_standin',
+                      STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_API_BASE=standin.start(),
+                      STRIPE_VERIFY_TIMEOUT=str(args.timeout))
+    os.chdir(directory)
+
+    from app import app
+    from models import SessionLocal, PaymentIntent
+    from services.payment_tracking_service import PaymentTrackingService
+    from services.stripe_service import retrieve_payment_intent, PaymentLookupError
+    from utils.firebase_tokens import set_token_verifier
+
+    set_token_verifier(StaticVerifier())
+    client = app.test_client()
+    failures = []
+
+    def check(label, ok, detail=''):
+        print(f"  {'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+        if not ok:
+            failures.append(label)
+
+    def deliver(event, secret=WEBHOOK_SECRET, timestamp=None, signature=None):
+        payload = json.dumps(event).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if signature is not False:
+            headers['Stripe-Signature'] = signature or sign_payload(payload, secret, timestamp)
+        return client.post('/payment/webhook', data=payload, headers=headers)
+
+    def stored_status(intent_id):
+        db = SessionLocal()
+        try:
+            row = db.query(PaymentIntent).filter(PaymentIntent.payment_intent_id == intent_id).first()
+            return row.status if row else None
+        finally:
+            db.close()
+
+    print(f"💳 Stripe webhook check: stand-in latency {args.latency_ms:g} ms, "
+          f"STRIPE_VERIFY_TIMEOUT {args.timeout:g}s")
+    print("=" * 70)
+
+    # Signature verification
+    intent = standin.create_intent(USER)
+    event = standin.transition(intent['id'], 'succeeded')
+    check("unsigned event refused", deliver(event, signature=False).status_code == 400)
+    check("event signed with another secret refused", deliver(event, secret='whsec_wrong').status_code == 400)
+    check("replayed event older than the tolerance refused",
+          deliver(event, timestamp=time.time() - 3600).status_code == 400)
+    check("no row written by refused events", stored_status(intent['id']) is None)
+
+    # Event flow: processing -> succeeded, duplicate delivery, late processing
+    intent = standin.create_intent(USER)
+    PaymentTrackingService.record_payment_intent(intent['id'], USER, status='pending')  # as create-payment-intent does
+    response = deliver(standin.transition(intent['id'], 'processing'))
+    check("processing event applied", response.status_code == 200 and stored_status(intent['id']) == 'processing')
+    succeeded = standin.transition(intent['id'], 'succeeded')
+    check("succeeded event applied", deliver(succeeded).status_code == 200
+          and stored_status(intent['id']) == 'succeeded')
+    check("duplicate delivery is harmless", deliver(succeeded).status_code == 200
+          and stored_status(intent['id']) == 'succeeded')
+    late = payment_intent_event('payment_intent.processing', dict(intent, status='processing'))
+    check("late 'processing' doesn't undo 'succeeded'", deliver(late).status_code == 200
+          and stored_status(intent['id']) == 'succeeded')
+    unknown = standin.create_intent(USER)
+    deliver(standin.transition(unknown['id'], 'succeeded'))
+    check("event for an intent we hadn't recorded creates its row", stored_status(unknown['id']) == 'succeeded')
+    check("unrelated event types acknowledged",
+          deliver(dict(event, type='customer.created', data={'object': {'id': 'cus_1'}})).status_code == 200)
+
+    # The PDF routes' payment check: local state vs. asking Stripe
+    calls_before = standin.retrieve_calls
+    local_ms = timed_ms(lambda: PaymentTrackingService.can_reuse_payment(intent['id'], USER), args.runs)
+    check("webhook-confirmed payment verified from the local row", PaymentTrackingService.can_reuse_payment(
+        intent['id'], USER) and standin.retrieve_calls == calls_before, "no Stripe calls")
+    fallback_ms = timed_ms(lambda: retrieve_payment_intent(intent['id']), args.runs)
+    print(f"    payment check: local row {local_ms:.2f} ms vs. Stripe fallback {fallback_ms:.1f} ms (median)")
+
+    standin.latency_ms = args.timeout * 1000 * 4
+    start = time.perf_counter()
+    try:
+        retrieve_payment_intent(intent['id'])
+        timed_out = False
+    except PaymentLookupError:
+        timed_out = True
+    elapsed = time.perf_counter() - start
+    check("fallback gives up after STRIPE_VERIFY_TIMEOUT", timed_out and elapsed < args.timeout * 2,
+          f"{elapsed * 1000:.0f} ms against a {standin.latency_ms:.0f} ms Stripe")
+
+    # End to end: /build-pdf for payments the webhook hasn't confirmed
+    body = {'business_name': 'Standin Trucking LLC', 'ein': '123456789', 'vehicles': []}
+    headers = {'Authorization': 'Bearer standin'}
+    standin.latency_ms = args.latency_ms
+    pending = standin.create_intent(USER, status='processing')
+    calls_before = standin.retrieve_calls
+    response = client.post('/build-pdf', json=dict(body, payment_intent_id=pending['id']), headers=headers)
+    check("/build-pdf refuses an unconfirmed payment after one Stripe call",
+          response.status_code == 402 and standin.retrieve_calls == calls_before + 1)
+    standin.latency_ms = args.timeout * 1000 * 4
+    start = time.perf_counter()
+    response = client.post('/build-pdf', json=dict(body, payment_intent_id=pending['id']), headers=headers)
+    elapsed = time.perf_counter() - start
+    check("/build-pdf answers promptly when Stripe hangs", response.status_code == 402
+          and elapsed < args.timeout * 2, f"{elapsed * 1000:.0f} ms")
+
+    # Paid, but the webhook is late: the fallback verifies it once and records it locally.
+    # No vehicles, so generation stops right after the payment check.
+    standin.latency_ms = args.latency_ms
+    paid = standin.create_intent(USER, status='succeeded')
+    response = client.post('/build-pdf', json=dict(body, payment_intent_id=paid['id']), headers=headers)
+    calls_before = standin.retrieve_calls
+    client.post('/build-pdf', json=dict(body, payment_intent_id=paid['id']), headers=headers)
+    check("payment confirmed by the fallback is recorded, so the next request skips Stripe",
+          response.status_code != 402 and stored_status(paid['id']) == 'succeeded'
+          and standin.retrieve_calls == calls_before)
+
+    standin.stop()
+    shutil.rmtree(directory, ignore_errors=True)
+    print("=" * 70)
+    print(f"  {'All checks passed' if not failures else f'{len(failures)} check(s) failed'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
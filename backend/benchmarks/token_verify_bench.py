@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Firebase ID-token verification benchmark
+Mints tokens with a throwaway RSA key and self-signed certificate, then compares a
+full signature check per request against the verified-claims cache, and checks that
+tokens are refused from the second they expire. Fully offline; exits 1 if an expired
+token is accepted.
+
+Usage: python benchmarks/token_verify_bench.py [iterations]
+"""
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+import google.auth.crypt
+import google.auth.jwt
+from utils.firebase_tokens import (
+    FirebaseTokenVerifier, StaticCertificateSource, TokenCache, TokenVerificationError, ID_TOKEN_ISSUER_PREFIX
+)
+
+PROJECT_ID = 'send2290-benchmark'
+KEY_ID = 'bench-key'
+
+def make_signing_material():
+    """Create an RSA key and a self-signed certificate like Google publishes"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken.benchmark')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+    return google.auth.crypt.RSASigner.from_string(key_pem, key_id=KEY_ID), cert_pem
+
+def mint_token(signer, uid, expires_in=3600):
+    now = int(time.time())
+    payload = {
+        'iss': ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+        'aud': PROJECT_ID,
+        'auth_time': now - 3600,
+        'iat': min(now, now + expires_in - 3600),
+        'exp': now + expires_in,
+        'sub': uid,
+        'email': f'{uid}@example.com'
+    }
+    return google.auth.jwt.encode(signer, payload).decode()
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    signer, cert_pem = make_signing_material()
+    cert_source = StaticCertificateSource({KEY_ID: cert_pem})
+    token = mint_token(signer, 'bench-user')
+
+    print(f"🔑 ID-token verification benchmark ({iterations} requests, same token)")
+    print("=" * 60)
+
+    # max_entries=0 keeps nothing, so every call does the full RSA check
+    uncached = FirebaseTokenVerifier(PROJECT_ID, cert_source, cache=TokenCache(max_entries=0), check_revoked=False)
+    cached = FirebaseTokenVerifier(PROJECT_ID, cert_source, cache=TokenCache(), check_revoked=False)
+
+    assert uncached.verify(token)['uid'] == 'bench-user'
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        uncached.verify(token)
+    uncached_us = (time.perf_counter() - start) * 1e6 / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cached.verify(token)
+    cached_us = (time.perf_counter() - start) * 1e6 / iterations
+
+    print(f"  Full verification:  {uncached_us:9.1f} µs/request")
+    print(f"  Cached claims:      {cached_us:9.1f} µs/request "
+          f"(hits={cached.cache.hits}, misses={cached.cache.misses})")
+    print(f"  Speedup:            {uncached_us / cached_us:9.1f}x")
+
+    # The cache's clock skew only shortens how long claims are reused; it must not
+    # stretch a token's lifetime past exp
+    print("=" * 60)
+    verifier = FirebaseTokenVerifier(PROJECT_ID, cert_source, check_revoked=False)
+    failures = 0
+    for label, expires_in, accept in (("expired 1s ago", -1, False),
+                                      (f"expired {verifier.clock_skew - 1}s ago", 1 - verifier.clock_skew, False),
+                                      ("expires in 30s", 30, True)):
+        try:
+            verifier.verify(mint_token(signer, 'expiry-user', expires_in))
+            accepted = True
+        except TokenVerificationError:
+            accepted = False
+        ok = accepted == accept
+        failures += not ok
+        print(f"  {'✅' if ok else '❌'} Token {label}: {'accepted' if accepted else 'refused'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
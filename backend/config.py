@@ -1,4 +1,6 @@
 import os
+import secrets
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from both root and backend .env files
@@ -25,13 +27,78 @@ class Config:
     FILES_BUCKET = os.getenv('FILES_BUCKET')
     BUCKET = os.getenv('BUCKET')  # Keep both for compatibility
     
+    # S3 client tuning (shared client per process)
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '20'))
+    S3_CONNECT_TIMEOUT = float(os.getenv('S3_CONNECT_TIMEOUT', '5'))
+    S3_READ_TIMEOUT = float(os.getenv('S3_READ_TIMEOUT', '30'))
+    S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', '3'))
+    
+    # File storage backend: 's3', 'local' (sharded directory on disk) or 'memory'
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local' if NODE_ENV == 'development' else 's3')
+    LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', os.path.join(os.path.dirname(__file__), 'storage'))
+    STORAGE_UPLOAD_WORKERS = int(os.getenv('STORAGE_UPLOAD_WORKERS', '8'))
+    # Signs /storage/files links for the local and memory backends (S3 presigns its own).
+    # No default outside development: the app refuses to start those backends without it.
+    STORAGE_SIGNING_KEY = os.getenv('STORAGE_SIGNING_KEY') or (secrets.token_hex(32) if NODE_ENV == 'development' else None)
+    
+    # File downloads: 'stream' proxies bytes in chunks, 'redirect' sends a short-lived presigned URL
+    DOWNLOAD_MODE = os.getenv('DOWNLOAD_MODE', 'stream')
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv('DOWNLOAD_CHUNK_SIZE', str(64 * 1024)))
+    DOWNLOAD_URL_EXPIRATION = int(os.getenv('DOWNLOAD_URL_EXPIRATION', '60'))
+    PRESIGNED_URL_CACHE_TTL = int(os.getenv('PRESIGNED_URL_CACHE_TTL', '120'))
+    PRESIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv('PRESIGNED_URL_CACHE_MAX_ENTRIES', '2048'))
+    
     # Firebase Configuration
     FIREBASE_ADMIN_KEY_JSON = os.getenv('FIREBASE_ADMIN_KEY_JSON')
+    FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')  # Falls back to project_id in the key JSON
+    
+    # Verified ID-token cache (claims are reused until the token's exp minus the skew)
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '10000'))
+    TOKEN_CACHE_CLOCK_SKEW = int(os.getenv('TOKEN_CACHE_CLOCK_SKEW', '60'))
+    # Seconds a token is still accepted past exp (or before iat) on a full check; 0 as in firebase-admin
+    TOKEN_VERIFY_LEEWAY = int(os.getenv('TOKEN_VERIFY_LEEWAY', '0'))
+    FIREBASE_CHECK_REVOKED = os.getenv('FIREBASE_CHECK_REVOKED', 'false').lower() == 'true'
+    FIREBASE_REVOCATION_CHECK_INTERVAL = int(os.getenv('FIREBASE_REVOCATION_CHECK_INTERVAL', '300'))
     
     # Stripe Configuration
     STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
     STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
     STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+    STRIPE_WEBHOOK_TOLERANCE = int(os.getenv('STRIPE_WEBHOOK_TOLERANCE', '300'))  # Max age of a signed event (s)
+    STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')  # Overrides https://api.stripe.com, e.g. a local stand-in
+    # The PDF routes read payment state the webhook keeps up to date; asking Stripe
+    # directly is only a fallback, so it gets a short leash and no retries
+    STRIPE_VERIFY_TIMEOUT = float(os.getenv('STRIPE_VERIFY_TIMEOUT', '3'))
+    
+    # IRS A2A transmission (irs_soap_client) - one pooled mutual-TLS session per process
+    IRS_ETIN = os.getenv('IRS_ETIN')
+    IRS_EFIN = os.getenv('IRS_EFIN', '387205')
+    IRS_CERT_FILE = os.getenv('IRS_CERT_FILE')
+    IRS_KEY_FILE = os.getenv('IRS_KEY_FILE')
+    IRS_TEST_MODE = os.getenv('IRS_TEST_MODE', 'true').lower() == 'true'
+    IRS_BASE_URL = os.getenv('IRS_BASE_URL')  # Overrides the test/production endpoint, e.g. a local stand-in
+    IRS_CA_BUNDLE = os.getenv('IRS_CA_BUNDLE')  # CA file used to verify the endpoint (system store when unset)
+    IRS_POOL_SIZE = int(os.getenv('IRS_POOL_SIZE', '10'))
+    IRS_KEEPALIVE = os.getenv('IRS_KEEPALIVE', 'true').lower() == 'true'  # Reuse TLS connections between calls
+    IRS_CONNECT_TIMEOUT = float(os.getenv('IRS_CONNECT_TIMEOUT', '10'))
+    IRS_READ_TIMEOUT = float(os.getenv('IRS_READ_TIMEOUT', '120'))
+    
+    # IRS submission queue (irs_worker.py) - web requests only enqueue
+    IRS_QUEUE_CONCURRENCY = int(os.getenv('IRS_QUEUE_CONCURRENCY', '4'))  # Transmissions in flight per worker process
+    IRS_QUEUE_POLL_INTERVAL = float(os.getenv('IRS_QUEUE_POLL_INTERVAL', '2'))
+    IRS_EFIN_RATE_PER_MINUTE = float(os.getenv('IRS_EFIN_RATE_PER_MINUTE', '30'))  # Per worker process
+    IRS_EFIN_BURST = int(os.getenv('IRS_EFIN_BURST', '5'))
+    IRS_MAX_ATTEMPTS = int(os.getenv('IRS_MAX_ATTEMPTS', '8'))
+    IRS_RETRY_BASE_DELAY = float(os.getenv('IRS_RETRY_BASE_DELAY', '30'))  # Doubles per attempt (with jitter)
+    IRS_RETRY_MAX_DELAY = float(os.getenv('IRS_RETRY_MAX_DELAY', '3600'))
+    # Batch transmissions - returns per SendSubmissions call from the worker (1 sends each return on its own)
+    IRS_BATCH_SIZE = int(os.getenv('IRS_BATCH_SIZE', '1'))
+    IRS_BATCH_MAX_RETURNS = int(os.getenv('IRS_BATCH_MAX_RETURNS', '100'))  # IRS per-message limits
+    IRS_BATCH_MAX_BYTES = int(os.getenv('IRS_BATCH_MAX_BYTES', str(50 * 1024 * 1024)))
+    # Acknowledgement polling - seconds before each GetAcks poll of a submitted return; the last value repeats
+    IRS_ACK_POLL_SCHEDULE = [float(delay) for delay in os.getenv('IRS_ACK_POLL_SCHEDULE', '60,120,300,900,1800,3600').split(',') if delay.strip()]
+    IRS_ACK_BATCH_SIZE = int(os.getenv('IRS_ACK_BATCH_SIZE', '100'))  # Submission IDs per GetAcks call
+    IRS_ACK_POLL_INTERVAL = float(os.getenv('IRS_ACK_POLL_INTERVAL', '10'))  # How often the worker looks for due polls
     
     # Admin Configuration
     ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'admin@send2290.com')
@@ -45,7 +112,8 @@ class Config:
             "https://www.send2290.com"
         ]}},
         "methods": ["GET", "POST", "OPTIONS", "DELETE"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "Range", "If-None-Match", "X-Profile"],
+        "expose_headers": ["Content-Disposition", "Content-Range", "Accept-Ranges", "ETag", "Server-Timing", "X-Profile-Id", "X-DB-Queries"]
     }
     
     # File paths
@@ -53,7 +121,60 @@ class Config:
     TEMPLATE_PDF_FILE = "f2290_template.pdf"
     AUDIT_LOG_FILE = "audit.log"
     
+    # Audit pipeline - records are queued and written in batches by a background thread
+    AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'true').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '0.5'))
+    AUDIT_OVERFLOW_POLICY = os.getenv('AUDIT_OVERFLOW_POLICY', 'drop_newest')  # drop_newest, drop_oldest, block
+    
+    # Audit line format ('text' or 'json' lines) and segment rotation into gzipped archives
+    AUDIT_LOG_FORMAT = os.getenv('AUDIT_LOG_FORMAT', 'text')
+    AUDIT_ROTATE_DAILY = os.getenv('AUDIT_ROTATE_DAILY', 'true').lower() == 'true'
+    AUDIT_ROTATE_MAX_BYTES = int(os.getenv('AUDIT_ROTATE_MAX_BYTES', str(50 * 1024 * 1024)))
+    AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR')  # Defaults to 'archive' next to each log
+    AUDIT_ARCHIVE_COMPRESS = os.getenv('AUDIT_ARCHIVE_COMPRESS', 'true').lower() == 'true'
+    AUDIT_TAIL_MAX_LINES = int(os.getenv('AUDIT_TAIL_MAX_LINES', '5000'))  # Cap for /admin/audit-logs/<env>?lines=
+    AUDIT_INDEX_ENABLED = os.getenv('AUDIT_INDEX_ENABLED', 'true').lower() == 'true'  # Sidecar offset index for /admin/audit-logs/query
+    AUDIT_INDEX_INTERVAL = float(os.getenv('AUDIT_INDEX_INTERVAL', '1.0'))
+    AUDIT_QUERY_MAX_RESULTS = int(os.getenv('AUDIT_QUERY_MAX_RESULTS', '5000'))
+    
+    # Request metrics (/metrics) - each worker writes its counters to METRICS_DIR for aggregation
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'send2290-metrics'))
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '2.0'))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # Scrapers send 'Authorization: Bearer <token>'; required in production
+    METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', '2000'))  # Also written to the audit log
+    
+    # Stage spans (utils.tracing) - exported as send2290_stage_duration_seconds and in slow-request audit lines
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+    TRACE_SERVER_TIMING = os.getenv('TRACE_SERVER_TIMING', 'true').lower() == 'true'  # Server-Timing header, admins only
+    
+    # SQL instrumentation (engine hooks in models) - per-route counters on /metrics, slow/N+1 reports in the audit log
+    DB_QUERY_STATS_ENABLED = os.getenv('DB_QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    DB_SLOW_QUERY_MS = int(os.getenv('DB_SLOW_QUERY_MS', '200'))
+    DB_N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', '10'))  # Same statement shape more than N times per request
+    DB_DEBUG_HEADER = os.getenv('DB_DEBUG_HEADER', 'admin').lower()  # X-DB-Queries header: 'admin', 'all' or 'off'
+    
+    # Request profiling - admins send 'X-Profile: sample|cprofile'; results at /admin/profiles/<id>
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() == 'true'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'send2290-profiles'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))  # Also sample 1 in N requests to the routes below (0 = off)
+    PROFILE_SAMPLE_ROUTES = [route.strip() for route in os.getenv('PROFILE_SAMPLE_ROUTES', '/build-pdf').split(',') if route.strip()]
+    
     @classmethod
     def get_bucket_name(cls):
         """Get the appropriate bucket name (handles both BUCKET and FILES_BUCKET)"""
         return cls.BUCKET or cls.FILES_BUCKET
+    
+    @classmethod
+    def get_audit_queue_options(cls):
+        """Keyword arguments for the queued audit handlers"""
+        return {
+            'max_queue_size': cls.AUDIT_QUEUE_SIZE,
+            'batch_size': cls.AUDIT_BATCH_SIZE,
+            'flush_interval': cls.AUDIT_FLUSH_INTERVAL,
+            'overflow_policy': cls.AUDIT_OVERFLOW_POLICY
+        }
@@ -0,0 +1,74 @@
+"""
+Gunicorn configuration for the web process (Procfile: gunicorn -c gunicorn.conf.py app:app)
+
+Requests mix CPU work (multi-month PDF renders, XML builds) with slow I/O (Stripe,
+S3, Firebase), so each worker process runs a small thread pool (gthread): a thread
+waiting on Stripe doesn't hold up the others, and CPU-heavy renders spread across
+processes. The app is loaded once in the master (preload_app) and forked, so the
+PDF template, form positions and tax tables are shared copy-on-write instead of
+being loaded per worker. Every setting can be overridden from the environment.
+"""
+import gc
+import os
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))  # respects container CPU limits
+    except AttributeError:
+        return os.cpu_count() or 1
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Two processes per core (plus one) keeps every core busy while some requests wait on
+# I/O; the cap keeps memory predictable on big hosts. WEB_CONCURRENCY is what Heroku sets.
+workers = int(os.getenv('WEB_CONCURRENCY', min(_cpu_count() * 2 + 1, int(os.getenv('GUNICORN_MAX_WORKERS', '8')))))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle workers now and then so slow leaks (PDF libraries, caches) can't accumulate;
+# jitter stops them all restarting at once. Recycled workers are re-forked from the
+# master, so they start with the shared state already loaded.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# A twelve-month PDF build can take a while; beyond this the worker is stuck, not busy
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# On deploy/restart, in-flight requests (uploads, Stripe calls) get this long to finish
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Heartbeat files on tmpfs, so a slow disk can't make healthy workers look hung
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def when_ready(server):
+    """Runs in the master before the first fork: load shared read-only state, then freeze it"""
+    if not preload_app:
+        return
+    from services.pdf_service import load_template_bytes
+    from utils.form_positions import get_form_positions
+
+    try:
+        load_template_bytes()
+    except OSError as e:
+        server.log.warning(f"PDF template not preloaded: {e}")
+    get_form_positions()
+    # Move everything loaded so far out of the collector's reach: a GC pass in a worker
+    # would otherwise write to these objects' headers and un-share their pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded shared state ({gc.get_freeze_count()} objects frozen)")
+
+def post_fork(server, worker):
+    """Drop connections/clients the master opened; sockets must not be shared across processes"""
+    from models import engine
+    from services.s3_service import reset_s3_client
+
+    engine.dispose(close=False)
+    reset_s3_client()
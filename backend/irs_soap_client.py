@@ -3,20 +3,153 @@ IRS e-file SOAP Client for Form 2290 submissions
 Handles SOAP communication with IRS A2A system
 """
 import os
-import ssl
+import socket
+import threading
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape as xml_escape
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 from zeep import Client
 from zeep.transports import Transport
 from zeep.wsse import Signature
 import logging
+from config import Config
+from services.message_id_service import generate_message_id
+from xml_builder import is_valid_ein
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class IRSTransmissionError(Exception):
+    """A submission or status call that did not get a 200 back (retryable for timeouts, 408/429 and 5xx)"""
+
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_ENVELOPE_FOOTER = b"""
+    </soap:Body>
+</soap:Envelope>"""
+
+def _strip_xml_declaration(document: bytes) -> bytes:
+    """The return's own '<?xml ...?>' line can't appear inside the envelope body"""
+    document = document.lstrip()
+    if document.startswith(b'<?xml'):
+        end = document.find(b'?>')
+        if end != -1:
+            return document[end + 2:].lstrip()
+    return document
+
+def _as_bytes(document: Union[str, bytes]) -> bytes:
+    return document.encode('utf-8') if isinstance(document, str) else document
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+def iter_acknowledgements(source) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    Stream (submission_id, status, errors) out of a GetAcks response.
+    status is the lower-cased AcceptanceStatusTxt ('accepted', 'rejected'); errors are
+    'RuleNum: ErrorMessageTxt' strings. Each Acknowledgement is cleared once read, so
+    a response with hundreds of acks never exists as a whole tree.
+    """
+    submission_id = status = rule = message = None
+    errors = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        tag = _local_name(elem.tag)
+        if event == 'start':
+            if tag == 'Acknowledgement':
+                submission_id = status = None
+                errors = []
+            continue
+        if tag == 'SubmissionId':
+            submission_id = (elem.text or '').strip()
+        elif tag == 'AcceptanceStatusTxt':
+            status = (elem.text or '').strip().lower()
+        elif tag == 'RuleNum':
+            rule = (elem.text or '').strip()
+        elif tag == 'ErrorMessageTxt':
+            message = (elem.text or '').strip()
+        elif tag == 'Error':
+            errors.append(f"{rule}: {message}" if rule else (message or ''))
+            rule = message = None
+        elif tag == 'Acknowledgement':
+            if submission_id and status:
+                yield submission_id, status, errors
+            elem.clear()
+
+def iter_submission_receipts(source) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Stream (submission_id, error) out of a SendSubmissions response: error is None for
+    a SubmissionReceiptGrp (received) and the ErrorMessageTxt for a SubmissionError
+    (refused on receipt, e.g. schema or manifest errors in that one return)
+    """
+    submission_id = message = None
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        tag = _local_name(elem.tag)
+        if event == 'start':
+            if tag in ('SubmissionReceiptGrp', 'SubmissionError'):
+                submission_id = message = None
+            continue
+        if tag == 'SubmissionId':
+            submission_id = (elem.text or '').strip()
+        elif tag == 'ErrorMessageTxt':
+            message = (elem.text or '').strip()
+        elif tag == 'SubmissionReceiptGrp':
+            if submission_id:
+                yield submission_id, None
+            elem.clear()
+        elif tag == 'SubmissionError':
+            if submission_id:
+                yield submission_id, message or 'Refused on receipt'
+            elem.clear()
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets use TCP keep-alive, so idle mTLS connections survive NAT/LB timeouts"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_irs_session(cert_file: str, key_file: str, verify=True) -> requests.Session:
+    """
+    Process-wide pooled session for one client certificate.
+    Reusing it skips the TCP + mutual-TLS handshake on every call after the first.
+    """
+    key = (os.getpid(), cert_file, key_file, verify)  # pid: never share sockets across a fork
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                session.cert = (cert_file, key_file)
+                session.verify = verify
+                adapter = _KeepAliveAdapter(pool_connections=1, pool_maxsize=Config.IRS_POOL_SIZE,
+                                            pool_block=True, max_retries=0)
+                session.mount('https://', adapter)
+                if not Config.IRS_KEEPALIVE:
+                    session.headers['Connection'] = 'close'
+                _sessions[key] = session
+    return session
+
+def close_irs_sessions():
+    """Drop pooled connections (tests, or after rotating the client certificate)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
 class IRSSOAPClient:
     """SOAP client for IRS e-file submissions"""
     
@@ -29,7 +162,9 @@ class IRSSOAPClient:
                  efin: str, 
                  cert_file: str,
                  key_file: str,
-                 test_mode: bool = True):
+                 test_mode: bool = True,
+                 base_url: Optional[str] = None,
+                 ca_bundle: Optional[str] = None):
         """
         Initialize IRS SOAP client
         
@@ -39,13 +174,18 @@ class IRSSOAPClient:
             cert_file: Path to SSL certificate file (.pem or .crt)
             key_file: Path to SSL private key file (.key)
             test_mode: Use test environment if True, production if False
+            base_url: Endpoint override (defaults to Config.IRS_BASE_URL, then the test/production URL)
+            ca_bundle: CA file for verifying the endpoint (defaults to Config.IRS_CA_BUNDLE)
         """
         self.etin = etin
         self.efin = efin
         self.cert_file = cert_file
         self.key_file = key_file
         self.test_mode = test_mode
-        self.base_url = self.IRS_TEST_URL if test_mode else self.IRS_PROD_URL
+        self.base_url = (base_url or Config.IRS_BASE_URL
+                         or (self.IRS_TEST_URL if test_mode else self.IRS_PROD_URL)).rstrip('/')
+        self.verify = ca_bundle or Config.IRS_CA_BUNDLE or True
+        self.timeout = (Config.IRS_CONNECT_TIMEOUT, Config.IRS_READ_TIMEOUT)
         
         # Validate certificate files exist
         if not os.path.exists(cert_file):
@@ -55,61 +195,75 @@ class IRSSOAPClient:
             
         logger.info(f"Initialized IRS SOAP client in {'TEST' if test_mode else 'PRODUCTION'} mode")
     
+    @classmethod
+    def from_config(cls) -> 'IRSSOAPClient':
+        """Client for the transmitter configured in the IRS_* settings"""
+        return cls(Config.IRS_ETIN, Config.IRS_EFIN, Config.IRS_CERT_FILE, Config.IRS_KEY_FILE,
+                   test_mode=Config.IRS_TEST_MODE)
+    
+    @property
+    def session(self) -> requests.Session:
+        """Shared pooled session carrying our client certificate"""
+        return get_irs_session(self.cert_file, self.key_file, self.verify)
+    
     def _create_transport(self) -> Transport:
-        """Create secure transport with SSL certificates"""
-        session = requests.Session()
-        session.cert = (self.cert_file, self.key_file)
-        session.verify = True  # Verify SSL certificates
-        
-        # Create SSL context
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = True
-        ssl_context.verify_mode = ssl.CERT_REQUIRED
-        
-        return Transport(session=session)
+        """zeep transport over the shared pooled session"""
+        return Transport(session=self.session, timeout=Config.IRS_READ_TIMEOUT)
     
     def _generate_message_id(self) -> str:
+        """Unique message ID for this transmitter (see generate_message_id)"""
+        return generate_message_id(self.etin)
+    
+    def _create_soap_envelope(self, submission_xml: Union[str, bytes], message_id: str,
+                              manifest: Optional[Dict[str, Any]] = None) -> bytes:
         """
-        Generate unique message ID
-        Format: ETIN (12 digits) + ccyyddd (7 digits) + 8-character alphanumeric
-        """
-        now = datetime.now()
-        # Format: century + year + day of year (e.g., 2025001 for Jan 1, 2025)
-        ccyyddd = f"{now.year}{now.timetuple().tm_yday:03d}"
+        Create SOAP envelope for IRS submission
         
-        # Generate 8-character suffix (timestamp-based for uniqueness)
-        suffix = f"{now.strftime('%H%M%S')}{now.microsecond//10000:02d}"
-        
-        return f"{self.etin}{ccyyddd}{suffix.lower()}"
-    
-    def _create_soap_envelope(self, submission_xml: str, message_id: str) -> str:
-        """Create SOAP envelope for IRS submission"""
+        The return's serialized bytes are placed between a prebuilt header and footer
+        as they are - never parsed again. manifest is xml_builder.build_return_manifest()
+        output; without it the EIN is searched for in the XML (slow, kept for old rows).
+        """
+        submission_xml = _as_bytes(submission_xml)
         
         # Create SOAP envelope with proper namespaces
-        envelope = f"""<?xml version="1.0" encoding="UTF-8"?>
+        header = f"""<?xml version="1.0" encoding="UTF-8"?>
 <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
                xmlns:irs="http://www.irs.gov/efile">
     <soap:Header>
-        <irs:IRSSubmissionManifest>
-            <irs:SubmissionId>{message_id}</irs:SubmissionId>
-            <irs:EFIN>{self.efin}</irs:EFIN>
-            <irs:TaxYr>2025</irs:TaxYr>
-            <irs:GovernmentCd>US</irs:GovernmentCd>
-            <irs:FederalSubmissionTypeCd>2290</irs:FederalSubmissionTypeCd>
-            <irs:TaxPeriodBeginDt>2025-07-01</irs:TaxPeriodBeginDt>
-            <irs:TaxPeriodEndDt>2026-06-30</irs:TaxPeriodEndDt>
-            <irs:TIN>{self._extract_ein_from_xml(submission_xml)}</irs:TIN>
-        </irs:IRSSubmissionManifest>
+        {self._submission_manifest(message_id, manifest, submission_xml)}
     </soap:Header>
     <soap:Body>
-        {submission_xml}
-    </soap:Body>
-</soap:Envelope>"""
+        """.encode('utf-8')
         
-        return envelope
+        return b''.join((header, _strip_xml_declaration(submission_xml), _ENVELOPE_FOOTER))
     
-    def _extract_ein_from_xml(self, xml_content: str) -> str:
-        """Extract EIN from Form 2290 XML for manifest"""
+    def _submission_manifest(self, message_id: str, manifest: Optional[Dict[str, Any]],
+                             submission_xml: bytes) -> str:
+        """IRSSubmissionManifest element for one return"""
+        manifest = self._checked_manifest(manifest, submission_xml)
+        tax_year = int(manifest.get('tax_year') or 2025)
+        return f"""<irs:IRSSubmissionManifest>
+            <irs:SubmissionId>{xml_escape(message_id)}</irs:SubmissionId>
+            <irs:EFIN>{xml_escape(self.efin)}</irs:EFIN>
+            <irs:TaxYr>{tax_year}</irs:TaxYr>
+            <irs:GovernmentCd>US</irs:GovernmentCd>
+            <irs:FederalSubmissionTypeCd>2290</irs:FederalSubmissionTypeCd>
+            <irs:TaxPeriodBeginDt>{manifest.get('tax_period_begin') or f'{tax_year}-07-01'}</irs:TaxPeriodBeginDt>
+            <irs:TaxPeriodEndDt>{manifest.get('tax_period_end') or f'{tax_year + 1}-06-30'}</irs:TaxPeriodEndDt>
+            <irs:TIN>{xml_escape(manifest['ein'])}</irs:TIN>
+        </irs:IRSSubmissionManifest>"""
+    
+    def _checked_manifest(self, manifest: Optional[Dict[str, Any]], submission_xml: Union[str, bytes]) -> Dict[str, Any]:
+        """The manifest to send, raising (not retryable) rather than transmitting a placeholder TIN"""
+        if manifest is None:
+            logger.warning("No return manifest passed; reading the EIN back out of the return XML")
+            manifest = {'ein': self._extract_ein_from_xml(submission_xml)}
+        if not is_valid_ein(manifest.get('ein')):
+            raise IRSTransmissionError(f"Return has no valid EIN for the manifest TIN (got {manifest.get('ein')!r})")
+        return manifest
+    
+    def _extract_ein_from_xml(self, xml_content: Union[str, bytes]) -> Optional[str]:
+        """Extract EIN from Form 2290 XML for manifest; None if the return has none"""
         try:
             root = ET.fromstring(xml_content)
             # Look for EIN in the XML structure
@@ -123,37 +277,38 @@ class IRSSOAPClient:
                     if elem.text and len(elem.text.replace('-', '')) == 9:
                         return elem.text.replace('-', '')
             
-            # Fallback
-            logger.warning("Could not extract EIN from XML, using placeholder")
-            return "000000000"
+            logger.warning("Could not extract EIN from XML")
+            return None
             
         except Exception as e:
             logger.error(f"Error extracting EIN from XML: {e}")
-            return "000000000"
+            return None
     
-    def submit_form_2290(self, form_xml: str) -> Dict[str, Any]:
+    def submit_form_2290(self, form_xml: Union[str, bytes], message_id: Optional[str] = None,
+                         manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Submit Form 2290 XML to IRS
         
         Args:
-            form_xml: Complete Form 2290 XML content
+            form_xml: Complete Form 2290 XML content, as built - it is not parsed again
+            message_id: ID assigned when the return was queued; retries must reuse it
+                        so the IRS can reject a duplicate instead of filing twice
+            manifest: EIN and tax period from xml_builder.build_return_manifest()
             
         Returns:
-            Dict containing submission results
+            Dict containing submission results ('retryable' tells a failed call
+            worth repeating apart from one the IRS refused)
         """
         try:
-            # Generate unique message ID
-            message_id = self._generate_message_id()
-            logger.info(f"Generated message ID: {message_id}")
+            if not message_id:
+                message_id = self._generate_message_id()
+                logger.info(f"Generated message ID: {message_id}")
             
             # Create SOAP envelope
-            soap_envelope = self._create_soap_envelope(form_xml, message_id)
-            
-            # Create transport with certificates
-            transport = self._create_transport()
+            soap_envelope = self._create_soap_envelope(form_xml, message_id, manifest)
             
-            # Submit to IRS
-            response = self._send_soap_request(soap_envelope, transport)
+            # Submit to IRS over the pooled session
+            response = self._send_soap_request(soap_envelope)
             
             return {
                 'success': True,
@@ -167,12 +322,21 @@ class IRSSOAPClient:
             logger.error(f"Error submitting Form 2290: {e}")
             return {
                 'success': False,
+                'message_id': message_id,
                 'error': str(e),
+                'retryable': getattr(e, 'retryable', False),
                 'timestamp': datetime.now().isoformat()
             }
     
-    def _send_soap_request(self, soap_envelope: str, transport: Transport) -> str:
+    def _send_soap_request(self, soap_envelope: Union[str, bytes]) -> str:
         """Send SOAP request to IRS endpoint"""
+        response = self._post_soap(soap_envelope)
+        logger.info("Successfully submitted to IRS")
+        return response.text
+    
+    def _post_soap(self, soap_envelope: Union[str, bytes], path: str = '/submit',
+                   stream: bool = False) -> requests.Response:
+        """POST an envelope over the pooled session; raises IRSTransmissionError unless the IRS answers 200"""
         
         headers = {
             'Content-Type': 'text/xml; charset=utf-8',
@@ -180,19 +344,23 @@ class IRSSOAPClient:
             'User-Agent': 'Form2290Client/1.0'
         }
         
-        # Use requests session from transport
-        response = transport.session.post(
-            f"{self.base_url}/submit",
-            data=soap_envelope.encode('utf-8'),
-            headers=headers,
-            timeout=120  # 2 minute timeout
-        )
+        try:
+            response = self.session.post(
+                f"{self.base_url}{path}",
+                data=soap_envelope.encode('utf-8') if isinstance(soap_envelope, str) else soap_envelope,
+                headers=headers,
+                timeout=self.timeout,
+                stream=stream,
+                verify=self.verify  # per call: REQUESTS_CA_BUNDLE in the environment would override session.verify
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise IRSTransmissionError(f"Transport error: {e}", retryable=True) from e
         
         if response.status_code != 200:
-            raise Exception(f"HTTP {response.status_code}: {response.text}")
-        
-        logger.info("Successfully submitted to IRS")
-        return response.text
+            raise IRSTransmissionError(f"HTTP {response.status_code}: {response.text[:1000]}",
+                                       status_code=response.status_code,
+                                       retryable=response.status_code in RETRYABLE_STATUS_CODES)
+        return response
     
     def _extract_submission_id(self, response_xml: str) -> Optional[str]:
         """Extract submission ID from IRS response"""
@@ -235,8 +403,7 @@ class IRSSOAPClient:
     </soap:Body>
 </soap:Envelope>"""
             
-            transport = self._create_transport()
-            response = self._send_soap_request(status_envelope, transport)
+            response = self._send_soap_request(status_envelope)
             
             return {
                 'success': True,
@@ -254,6 +421,140 @@ class IRSSOAPClient:
                 'timestamp': datetime.now().isoformat()
             }
 
+    def submit_batch(self, returns: Iterable[Tuple[str, Union[str, bytes], Optional[Dict[str, Any]]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Submit many Form 2290 returns in as few transmissions as the IRS limits allow
+        
+        Args:
+            returns: (message_id, form_xml, manifest) per return - as for submit_form_2290
+            
+        Returns:
+            {message_id: result} with the same result dicts as submit_form_2290. Each return
+            succeeds or fails on its own: one refused on receipt doesn't affect the rest, and
+            only a failed transmission (or a return missing from the receipt) is retryable.
+        """
+        results = {}
+        sendable = []
+        for message_id, form_xml, manifest in returns:
+            # A return without a valid EIN fails on its own instead of sinking its transmission
+            try:
+                sendable.append((message_id, form_xml, self._checked_manifest(manifest, form_xml)))
+            except IRSTransmissionError as e:
+                results[message_id] = {'success': False, 'message_id': message_id, 'error': str(e),
+                                       'retryable': False, 'timestamp': datetime.now().isoformat()}
+        for transmission in self._split_batch(sendable):
+            results.update(self._send_batch(transmission))
+        return results
+    
+    def _split_batch(self, returns: List[Tuple[str, bytes, Optional[Dict[str, Any]]]]) -> Iterator[list]:
+        """Transmissions within IRS_BATCH_MAX_RETURNS returns and IRS_BATCH_MAX_BYTES of return XML"""
+        transmission, size = [], 0
+        for message_id, form_xml, manifest in returns:
+            form_xml = _as_bytes(form_xml)
+            if transmission and (len(transmission) >= Config.IRS_BATCH_MAX_RETURNS
+                                 or size + len(form_xml) > Config.IRS_BATCH_MAX_BYTES):
+                yield transmission
+                transmission, size = [], 0
+            transmission.append((message_id, form_xml, manifest))
+            size += len(form_xml)
+        if transmission:
+            yield transmission
+    
+    def _create_batch_envelope(self, transmission: list) -> bytes:
+        """One SendSubmissions envelope: each return's manifest and bytes, built in a single pass"""
+        parts = [f"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
+               xmlns:irs="http://www.irs.gov/efile">
+    <soap:Header>
+        <irs:TransmissionManifest>
+            <irs:EFIN>{xml_escape(self.efin)}</irs:EFIN>
+            <irs:SubmissionCnt>{len(transmission)}</irs:SubmissionCnt>
+        </irs:TransmissionManifest>
+    </soap:Header>
+    <soap:Body>
+        <irs:SendSubmissions>""".encode('utf-8')]
+        for message_id, form_xml, manifest in transmission:
+            parts.append(f"""
+            <irs:Submission>
+        {self._submission_manifest(message_id, manifest, form_xml)}
+            <irs:SubmissionData>""".encode('utf-8'))
+            parts.append(_strip_xml_declaration(form_xml))
+            parts.append(b"""</irs:SubmissionData>
+            </irs:Submission>""")
+        parts.append(b"""
+        </irs:SendSubmissions>""" + _ENVELOPE_FOOTER)
+        return b''.join(parts)
+    
+    def _send_batch(self, transmission: list) -> Dict[str, Dict[str, Any]]:
+        timestamp = datetime.now().isoformat()
+        try:
+            response = self._post_soap(self._create_batch_envelope(transmission), path='/sendsubmissions', stream=True)
+            try:
+                response.raw.decode_content = True
+                receipts = dict(iter_submission_receipts(response.raw))
+            except ET.ParseError as e:
+                raise IRSTransmissionError(f"Unreadable SendSubmissions response: {e}", retryable=True) from e
+            finally:
+                response.close()
+        except Exception as e:
+            logger.error(f"Error submitting batch of {len(transmission)} returns: {e}")
+            return {message_id: {'success': False, 'message_id': message_id, 'error': str(e),
+                                 'retryable': getattr(e, 'retryable', False), 'timestamp': timestamp}
+                    for message_id, _, _ in transmission}
+        
+        logger.info(f"Submitted batch of {len(transmission)} returns to IRS")
+        results = {}
+        for message_id, _, _ in transmission:
+            if message_id not in receipts:
+                results[message_id] = {'success': False, 'message_id': message_id, 'retryable': True,
+                                       'error': 'No receipt for this return in the transmission response',
+                                       'timestamp': timestamp}
+            elif receipts[message_id] is None:
+                results[message_id] = {'success': True, 'message_id': message_id, 'submission_id': message_id,
+                                       'timestamp': timestamp}
+            else:
+                results[message_id] = {'success': False, 'message_id': message_id, 'retryable': False,
+                                       'error': receipts[message_id], 'timestamp': timestamp}
+        return results
+    
+    def get_acknowledgements(self, submission_ids: Iterable[str]) -> Dict[str, Tuple[str, List[str]]]:
+        """
+        Acknowledgements for a batch of submissions in one GetAcks call
+        
+        Args:
+            submission_ids: Up to Config.IRS_ACK_BATCH_SIZE submission IDs
+            
+        Returns:
+            {submission_id: (status, errors)} for the submissions the IRS has acknowledged;
+            IDs missing from the result are still being processed. Raises IRSTransmissionError
+            if the call itself fails.
+        """
+        id_list = ''.join(f"<irs:SubmissionId>{submission_id}</irs:SubmissionId>" for submission_id in submission_ids)
+        envelope = f"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
+               xmlns:irs="http://www.irs.gov/efile">
+    <soap:Header>
+        <irs:GetAcksRequest>
+            <irs:EFIN>{self.efin}</irs:EFIN>
+        </irs:GetAcksRequest>
+    </soap:Header>
+    <soap:Body>
+        <irs:GetAcks>
+            <irs:SubmissionIdList>{id_list}</irs:SubmissionIdList>
+        </irs:GetAcks>
+    </soap:Body>
+</soap:Envelope>"""
+        
+        response = self._post_soap(envelope, path='/getacks', stream=True)
+        try:
+            response.raw.decode_content = True  # undo gzip/deflate while streaming
+            return {submission_id: (status, errors)
+                    for submission_id, status, errors in iter_acknowledgements(response.raw)}
+        except ET.ParseError as e:
+            raise IRSTransmissionError(f"Unreadable GetAcks response: {e}", retryable=True) from e
+        finally:
+            response.close()
+
 def test_irs_connection(etin: str, efin: str, cert_file: str, key_file: str) -> bool:
     """
     Test connection to IRS A2A system
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+IRS submission worker
+Transmits returns queued by the web app (services/irs_queue_service.py) so that no
+web worker ever waits on the IRS, and polls acknowledgements for the ones already
+submitted (services/irs_ack_service.py). Run one or more next to the web processes:
+
+    python irs_worker.py                  # until SIGTERM/SIGINT
+    python irs_worker.py --once           # one claim pass and one ack pass, then wait for them to finish
+    python irs_worker.py --concurrency 8
+"""
+import argparse
+import signal
+import threading
+from models import init_database
+from irs_soap_client import IRSSOAPClient
+from services.irs_queue_service import SubmissionWorker
+from services.irs_ack_service import AckPoller
+
+def main():
+    parser = argparse.ArgumentParser(description="Transmit queued Form 2290 returns to the IRS")
+    parser.add_argument('--concurrency', type=int, help="Transmissions in flight (default IRS_QUEUE_CONCURRENCY)")
+    parser.add_argument('--once', action='store_true', help="Run a single claim pass and exit")
+    parser.add_argument('--no-acks', action='store_true', help="Don't poll acknowledgements in this process")
+    args = parser.parse_args()
+
+    init_database()
+    client = IRSSOAPClient.from_config()
+    worker = SubmissionWorker(client, concurrency=args.concurrency)
+    poller = None if args.no_acks else AckPoller(client)
+
+    if args.once:
+        started = worker.run_once()
+        worker.stop(wait=True)
+        polled = poller.run_once() if poller else 0
+        print(f"📤 Started {started} return(s), polled {polled} acknowledgement(s)")
+        return
+
+    def shutdown(signum, frame):
+        print("🛑 Stopping IRS worker after in-flight transmissions finish")
+        worker.request_stop()
+        if poller:
+            poller.request_stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    poller_thread = None
+    if poller:
+        poller_thread = threading.Thread(target=poller.run_forever, name='irs-acks', daemon=True)
+        poller_thread.start()
+    print(f"📤 IRS worker {worker.name} running (concurrency {worker.concurrency}, "
+          f"acks {'on' if poller else 'off'})")
+    worker.run_forever()
+    worker.stop(wait=True)
+    if poller_thread:
+        poller_thread.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Database migrations - the Procfile's release step
+Creates an empty database from the models (stamped at head); otherwise runs
+`alembic upgrade head`, first stamping a database that create_all made before
+migrations were tracked at the baseline revision, so its existing tables aren't
+created twice (models.adopt_untracked_database).
+
+    python migrate.py
+"""
+from models import migrations_head, upgrade_database
+
+def main():
+    revision = upgrade_database()
+    print(f"✅ Database at revision {revision} (migrations head {migrations_head()})")
+
+if __name__ == "__main__":
+    main()
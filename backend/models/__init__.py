@@ -1,6 +1,12 @@
 """Database models and setup"""
+import contextvars
 import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, text
+import os
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, DateTime, Text, Index, UniqueConstraint, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import Config
 
@@ -9,6 +15,63 @@ engine = create_engine(Config.DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# Per-request query statistics - the metrics middleware starts a QueryStats for each
+# request; with none active the engine hooks below return immediately
+_active_query_stats = contextvars.ContextVar('send2290_query_stats', default=None)
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement):
+    """Statement with literals and IN-lists collapsed, so per-row queries compare equal"""
+    shape = _LITERAL_RE.sub('?', statement)
+    shape = _IN_LIST_RE.sub('(?)', shape)
+    return _SPACE_RE.sub(' ', shape).strip()
+
+class QueryStats:
+    """Queries issued while handling one request"""
+
+    __slots__ = ('count', 'seconds', 'shapes', 'slow')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.slow = []  # (statement, seconds)
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+        if seconds * 1000 >= Config.DB_SLOW_QUERY_MS:
+            self.slow.append((statement, seconds))
+
+    def repeated(self, threshold):
+        """[(shape, count)] for statement shapes run more than threshold times (N+1 suspects)"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+def start_query_stats():
+    stats = QueryStats()
+    _active_query_stats.set(stats)
+    return stats
+
+def clear_query_stats():
+    _active_query_stats.set(None)
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _active_query_stats.get() is not None:
+        context._query_started = time.perf_counter()
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _active_query_stats.get()
+    started = getattr(context, '_query_started', None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
 class Submission(Base):
     """Model for form submissions"""
     __tablename__ = 'submissions'
@@ -47,9 +110,152 @@ class PaymentIntent(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
-def init_database():
-    """Initialize database tables"""
+# A filing has at most one row in these statuses (enforced by the partial unique index below)
+IRS_ACTIVE_STATUSES = ('queued', 'sending', 'retry', 'submitted', 'accepted')
+_IRS_ACTIVE_WHERE = text("status IN (%s)" % ', '.join(f"'{status}'" for status in IRS_ACTIVE_STATUSES))
+
+class IRSSubmission(Base):
+    """A return queued for IRS e-file transmission; worked by irs_worker.py"""
+    __tablename__ = 'irs_submissions'
+    __table_args__ = (Index('ix_irs_submissions_status_next_attempt', 'status', 'next_attempt_at'),
+                      Index('ix_irs_submissions_status_next_poll', 'status', 'next_poll_at'),
+                      Index('uq_irs_submissions_active_filing', 'filing_id', unique=True,
+                            sqlite_where=_IRS_ACTIVE_WHERE, postgresql_where=_IRS_ACTIVE_WHERE))
+    
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(String, unique=True, index=True)  # Idempotency key - reused on every retry
+    filing_id = Column(Integer, index=True)  # submissions.id
+    user_uid = Column(String, index=True)
+    efin = Column(String, index=True)
+    xml_s3_key = Column(String)
+    ein = Column(String, nullable=True)  # Manifest values from xml_builder.build_return_manifest()
+    tax_year = Column(Integer, nullable=True)
+    status = Column(String, default='queued')  # 'queued', 'sending', 'retry', 'submitted', 'failed', 'accepted', 'rejected'
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow)
+    claimed_by = Column(String, nullable=True)  # Worker currently transmitting it (or polling its ack)
+    claimed_at = Column(DateTime, nullable=True)
+    irs_submission_id = Column(String, nullable=True, index=True)
+    last_error = Column(Text, nullable=True)
+    submitted_at = Column(DateTime, nullable=True)
+    next_poll_at = Column(DateTime, nullable=True)  # Next GetAcks poll while 'submitted'
+    poll_count = Column(Integer, default=0)
+    ack_status = Column(String, nullable=True)  # AcceptanceStatusTxt from the IRS acknowledgement
+    ack_errors = Column(Text, nullable=True)  # Rejection rule numbers and messages, one per line
+    acknowledged_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class IRSMessageIdSlot(Base):
+    """A message ID slot claimed by one process for one day (services/message_id_service.py)"""
+    __tablename__ = 'irs_message_id_slots'
+    __table_args__ = (UniqueConstraint('day', 'slot', name='uq_irs_message_id_slots_day_slot'),)
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(String, nullable=False)  # ccyyddd, as in the message ID
+    slot = Column(Integer, nullable=False)
+    owner = Column(String)  # host:pid that claimed it
+    claimed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+# The schema create_all produced before migrations were tracked (submissions with
+# form_data, filings_documents, payment_intents)
+BASELINE_REVISION = '18430a06fe4b'
+_REVISION_RE = re.compile(r"^(revision|down_revision)\b[^=\n]*=\s*['\"](\w+)['\"]", re.M)
+
+def migrations_head():
+    """Head revision of alembic/versions, read from the files rather than by importing Alembic"""
+    revisions, parents = set(), set()
+    versions_dir = os.path.join(BACKEND_DIR, 'alembic', 'versions')
+    for name in os.listdir(versions_dir):
+        if name.endswith('.py'):
+            with open(os.path.join(versions_dir, name)) as f:
+                found = dict(_REVISION_RE.findall(f.read()))
+            if 'revision' in found:
+                revisions.add(found['revision'])
+            if 'down_revision' in found:
+                parents.add(found['down_revision'])
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+def database_revision():
+    """Revision recorded in alembic_version, or None for a database Alembic never touched"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception:
+        return None
+
+def _alembic_config():
+    from alembic.config import Config as AlembicConfig
+    alembic_cfg = AlembicConfig(os.path.join(BACKEND_DIR, 'alembic.ini'))
+    alembic_cfg.attributes['configure_logger'] = False  # keep the app's logging setup
+    return alembic_cfg
+
+def adopt_untracked_database():
+    """
+    Databases made by create_all before migrations were tracked have the tables but no
+    alembic_version, so `alembic upgrade head` would replay every revision against them.
+    Stamp such a database at the revision its schema already matches. Returns the
+    stamped revision, or None if there was nothing to adopt.
+    """
+    if database_revision() is not None:
+        return None
+    inspector = inspect(engine)
+    if not inspector.has_table('submissions'):
+        return None
+    columns = {column['name'] for column in inspector.get_columns('submissions')}
+    if 'form_data' not in columns:
+        return None  # older than the first revision, which adds the column
+    from alembic import command
+    command.stamp(_alembic_config(), BASELINE_REVISION)
+    print(f"Adopted untracked database at baseline revision {BASELINE_REVISION}")
+    return BASELINE_REVISION
+
+def _create_empty_database():
+    """Create the tables from the models and stamp head; False if the database isn't empty"""
+    if inspect(engine).get_table_names():
+        return False
+    from alembic import command
     Base.metadata.create_all(bind=engine)
+    command.stamp(_alembic_config(), 'head')
+    return True
+
+def upgrade_database():
+    """Bring the schema to the migrations head (migrate.py, the Procfile's release step)"""
+    if database_revision() is None and _create_empty_database():
+        return database_revision()
+    adopt_untracked_database()
+    from alembic import command
+    command.upgrade(_alembic_config(), 'head')
+    return database_revision()
+
+def init_database():
+    """
+    Check the schema against the Alembic migrations on startup (one query) instead of
+    running create_all. Migrations are applied by migrate.py - the Procfile's release
+    step - except that an empty database is created from the models and stamped at
+    head, and in development an outdated one is upgraded in place. A database created
+    before migrations were tracked is stamped at the baseline first.
+    Returns (database revision, migrations head).
+    """
+    head = migrations_head()
+    current = database_revision()
+    if current == head:
+        return current, head
+
+    if current is None:
+        if _create_empty_database():
+            return head, head
+        current = adopt_untracked_database()
+    if Config.FLASK_ENV == 'development' and current is not None:
+        from alembic import command
+        command.upgrade(_alembic_config(), 'head')
+        return head, head
+
+    print(f"Warning: database schema is at revision {current}, migrations are at {head} - "
+          f"run `python migrate.py`")
+    return current, head
 
 def get_db():
     """Get database session"""
@@ -4,18 +4,180 @@ Production Log Analysis and Monitoring Tools
 Utilities for analyzing and monitoring production audit logs
 """
 
+import argparse
 import os
 import re
-from datetime import datetime, timedelta
-from collections import defaultdict, Counter
+import gzip
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict, Counter, deque
 import json
+from Audit.audit_format import parse_line
+from Audit.audit_rotation import load_manifest, archive_dir_for, file_identity
+from Audit.audit_reader import tail_lines
+
+SLOW_REQUEST_MS = 2000
+RECENT_EVENTS_KEPT = 50       # failed logins / slow requests carried in the checkpoint
+BUCKET_RETENTION_HOURS = 24 * 35
+
+# One alternation instead of a re.search per pattern per line
+SECURITY_EVENT_RE = re.compile(
+    r'SECURITY_EVENT: (?P<BRUTE_FORCE>BRUTE_FORCE)'
+    r'|SECURITY_EVENT: (?P<UNAUTHORIZED_ACCESS>UNAUTHORIZED)'
+    r'|SECURITY_EVENT: (?P<DDOS>DDOS)'
+    r'|SECURITY_EVENT: (?P<SUSPICIOUS_ACTIVITY>SUSPICIOUS)'
+    r'|(?P<MULTIPLE_FAILED_LOGINS>LOGIN_ATTEMPT: FAILED)'
+    r'|"event":"SECURITY_EVENT","action":"(?P<json_security>[A-Z_]+)"'
+    r'|"event":"LOGIN_ATTEMPT","action":null,"status":"(?P<json_login>FAILED)"'
+)
+JSON_SECURITY_TYPES = {
+    'BRUTE_FORCE': 'BRUTE_FORCE', 'UNAUTHORIZED': 'UNAUTHORIZED_ACCESS',
+    'DDOS': 'DDOS', 'SUSPICIOUS': 'SUSPICIOUS_ACTIVITY'
+}
+
+def _empty_bucket():
+    return {
+        'login_success': 0, 'login_failed': 0, 'form_submissions': 0,
+        'document_downloads': 0, 'admin_actions': 0, 'security_events': 0,
+        'slow_requests': 0, 'api_calls': {}, 'error_events': {}, 'users': []
+    }
 
 class ProductionLogAnalyzer:
-    def __init__(self, log_file_path='Audit/productionaudit.log'):
+    def __init__(self, log_file_path='Audit/productionaudit.log', checkpoint_path=None):
         self.log_file_path = log_file_path
+        # Byte offset + hourly aggregates, so each run only parses newly appended lines
+        self.checkpoint_path = checkpoint_path or f'{log_file_path}.checkpoint.json'
+        
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'identity': None, 'offset': 0, 'buckets': {}, 'failed_logins': [], 'slow_requests': []}
+    
+    def _save_checkpoint(self, state):
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    def _consume(self, raw, buckets, users, failed_logins, slow_requests):
+        """Fold one line into the hourly buckets"""
+        line = raw.decode('utf-8', errors='replace') if isinstance(raw, bytes) else raw
+        entry = parse_line(line)
+        if not entry or entry['ts'] is None:
+            return
+        hour = entry['ts'].strftime('%Y-%m-%dT%H')
+        bucket = buckets.get(hour)
+        if bucket is None:
+            bucket = buckets[hour] = _empty_bucket()
+        
+        if entry.get('user'):
+            users[hour].add(str(entry['user']))
+        
+        event = entry.get('event')
+        if event == 'LOGIN_ATTEMPT':
+            if entry.get('status') == 'SUCCESS':
+                bucket['login_success'] += 1
+            else:
+                bucket['login_failed'] += 1
+                failed_logins.append([entry['ts'].isoformat(), line.strip()])
+        elif event == 'FORM_SUBMISSION':
+            bucket['form_submissions'] += 1
+        elif event == 'DOCUMENT_ACCESS' and entry.get('action') == 'DOWNLOAD':
+            bucket['document_downloads'] += 1
+        elif event == 'ADMIN_ACTION':
+            bucket['admin_actions'] += 1
+        elif event == 'SECURITY_EVENT':
+            bucket['security_events'] += 1
+        elif event == 'API_USAGE':
+            if entry.get('method') and entry.get('endpoint'):
+                key = f"{entry['method']} {entry['endpoint']}"
+                bucket['api_calls'][key] = bucket['api_calls'].get(key, 0) + 1
+            if entry.get('latency_ms') and float(entry['latency_ms']) > SLOW_REQUEST_MS:
+                bucket['slow_requests'] += 1
+                slow_requests.append([entry['ts'].isoformat(), line.strip()])
+        elif event == 'ERROR_EVENT' and entry.get('action'):
+            bucket['error_events'][entry['action']] = bucket['error_events'].get(entry['action'], 0) + 1
+    
+    def _read_from(self, f, offset, consume):
+        """Consume complete lines after offset from a binary stream; returns the new offset"""
+        if offset:
+            if isinstance(f, gzip.GzipFile):
+                f.read(offset)  # gzip can't seek cheaply; decompress and discard
+            else:
+                f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break  # partial line still being written
+            consume(raw)
+            offset += len(raw)
+        return offset
+    
+    def update(self):
+        """Parse only what was appended since the last run and save the checkpoint; returns lines read"""
+        state = self._load_checkpoint()
+        buckets = state['buckets']
+        users = defaultdict(set)
+        for hour, bucket in buckets.items():
+            users[hour].update(bucket['users'])
+        failed_logins = deque(state['failed_logins'], maxlen=RECENT_EVENTS_KEPT)
+        slow_requests = deque(state['slow_requests'], maxlen=RECENT_EVENTS_KEPT)
+        lines_read = [0]
+        
+        def consume(raw):
+            lines_read[0] += 1
+            self._consume(raw, buckets, users, failed_logins, slow_requests)
+        
+        if not os.path.exists(self.log_file_path):
+            return 0
+        stat = os.stat(self.log_file_path)
+        identity = file_identity(self.log_file_path, stat)
+        offset = state['offset']
+        
+        if state['identity'] != identity:
+            # First run, or the log rotated since the last one: read the archived segments
+            # we haven't seen (resuming inside the one we were reading), then the new live file
+            segments = load_manifest(self.log_file_path).get('segments', [])
+            sources = [segment.get('source') for segment in segments]
+            if state['identity'] in sources:
+                first = len(sources) - 1 - sources[::-1].index(state['identity'])
+            else:
+                first, offset = 0, 0
+                retention_start = (datetime.now(timezone.utc) - timedelta(hours=BUCKET_RETENTION_HOURS)).isoformat()
+                while first < len(segments) and (segments[first].get('end') or '') < retention_start[:19]:
+                    first += 1
+            archive_dir = archive_dir_for(self.log_file_path)
+            for segment in segments[first:]:
+                path = os.path.join(archive_dir, segment['file'])
+                if os.path.exists(path):
+                    opener = gzip.open if path.endswith('.gz') else open
+                    with opener(path, 'rb') as f:
+                        self._read_from(f, offset, consume)
+                offset = 0
+        elif stat.st_size < offset:
+            offset = 0  # truncated in place
+        
+        with open(self.log_file_path, 'rb') as f:
+            offset = self._read_from(f, offset, consume)
+        
+        # Drop buckets past retention and persist
+        oldest = (datetime.now(timezone.utc) - timedelta(hours=BUCKET_RETENTION_HOURS)).strftime('%Y-%m-%dT%H')
+        for hour in [hour for hour in buckets if hour < oldest]:
+            del buckets[hour]
+        for hour, bucket in buckets.items():
+            bucket['users'] = sorted(users[hour])
+        self._save_checkpoint({
+            'identity': identity,
+            'offset': offset,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+            'buckets': buckets,
+            'failed_logins': list(failed_logins),
+            'slow_requests': list(slow_requests)
+        })
+        return lines_read[0]
         
     def analyze_logs(self, hours_back=24):
-        """Analyze production logs for the specified time period"""
+        """Analyze production logs for the specified time period (hour granularity)"""
         
         if not os.path.exists(self.log_file_path):
             print(f"❌ Production log file not found: {self.log_file_path}")
@@ -24,69 +186,39 @@ class ProductionLogAnalyzer:
         print(f"🔍 Analyzing Production Logs (Last {hours_back} hours)")
         print("=" * 60)
         
-        cutoff_time = datetime.now() - timedelta(hours=hours_back)
+        new_lines = self.update()
+        state = self._load_checkpoint()
+        print(f"(parsed {new_lines} new line(s) since the last run)")
+        
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+        cutoff_hour = cutoff_time.strftime('%Y-%m-%dT%H')
+        cutoff_iso = cutoff_time.isoformat()
         
-        # Counters for different types of events
+        # Sum the hourly buckets inside the window
         login_attempts = {'success': 0, 'failed': 0}
         form_submissions = 0
         document_downloads = 0
         admin_actions = 0
         security_events = 0
+        slow_request_count = 0
         api_calls = Counter()
         error_events = Counter()
         users = set()
-        slow_requests = []
-        failed_logins = []
-        
-        with open(self.log_file_path, 'r') as f:
-            for line in f:
-                try:
-                    # Parse timestamp
-                    timestamp_match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', line)
-                    if not timestamp_match:
-                        continue
-                        
-                    log_time = datetime.strptime(timestamp_match.group(1), '%Y-%m-%d %H:%M:%S')
-                    if log_time < cutoff_time:
-                        continue
-                    
-                    # Extract user email
-                    user_match = re.search(r'USER: ([^\s|]+)', line)
-                    if user_match:
-                        users.add(user_match.group(1))
-                    
-                    # Analyze different log types
-                    if 'LOGIN_ATTEMPT: SUCCESS' in line:
-                        login_attempts['success'] += 1
-                    elif 'LOGIN_ATTEMPT: FAILED' in line:
-                        login_attempts['failed'] += 1
-                        failed_logins.append(line.strip())
-                    elif 'FORM_SUBMISSION:' in line:
-                        form_submissions += 1
-                    elif 'DOCUMENT_ACCESS: DOWNLOAD' in line:
-                        document_downloads += 1
-                    elif 'ADMIN_ACTION:' in line:
-                        admin_actions += 1
-                    elif 'SECURITY_EVENT:' in line:
-                        security_events += 1
-                    elif 'API_USAGE:' in line:
-                        # Extract endpoint
-                        endpoint_match = re.search(r'(GET|POST|PUT|DELETE) ([^\s|]+)', line)
-                        if endpoint_match:
-                            method_endpoint = f"{endpoint_match.group(1)} {endpoint_match.group(2)}"
-                            api_calls[method_endpoint] += 1
-                        
-                        # Check for slow requests (>2000ms)
-                        time_match = re.search(r'TIME: (\d+)ms', line)
-                        if time_match and int(time_match.group(1)) > 2000:
-                            slow_requests.append(line.strip())
-                    elif 'ERROR_EVENT:' in line:
-                        error_match = re.search(r'ERROR_EVENT: ([^\s|]+)', line)
-                        if error_match:
-                            error_events[error_match.group(1)] += 1
-                            
-                except Exception as e:
-                    continue
+        for hour, bucket in state['buckets'].items():
+            if hour < cutoff_hour:
+                continue
+            login_attempts['success'] += bucket['login_success']
+            login_attempts['failed'] += bucket['login_failed']
+            form_submissions += bucket['form_submissions']
+            document_downloads += bucket['document_downloads']
+            admin_actions += bucket['admin_actions']
+            security_events += bucket['security_events']
+            slow_request_count += bucket['slow_requests']
+            api_calls.update(bucket['api_calls'])
+            error_events.update(bucket['error_events'])
+            users.update(bucket['users'])
+        failed_logins = [line for ts, line in state['failed_logins'] if ts >= cutoff_iso]
+        slow_requests = [line for ts, line in state['slow_requests'] if ts >= cutoff_iso]
         
         # Display analysis results
         print(f"\n📊 SUMMARY STATISTICS (Last {hours_back} hours)")
@@ -98,7 +230,7 @@ class ProductionLogAnalyzer:
         print(f"📥 Document Downloads: {document_downloads}")
         print(f"👑 Admin Actions: {admin_actions}")
         print(f"🔒 Security Events: {security_events}")
-        print(f"🐌 Slow Requests (>2s): {len(slow_requests)}")
+        print(f"🐌 Slow Requests (>2s): {slow_request_count}")
         
         # Top API endpoints
         if api_calls:
@@ -144,34 +276,34 @@ class ProductionLogAnalyzer:
             print(f"❌ Log file not found: {self.log_file_path}")
             return
         
-        security_patterns = {
-            'BRUTE_FORCE': r'SECURITY_EVENT: BRUTE_FORCE',
-            'UNAUTHORIZED_ACCESS': r'SECURITY_EVENT: UNAUTHORIZED',
-            'DDOS': r'SECURITY_EVENT: DDOS',
-            'SUSPICIOUS_ACTIVITY': r'SECURITY_EVENT: SUSPICIOUS',
-            'MULTIPLE_FAILED_LOGINS': r'LOGIN_ATTEMPT: FAILED'
-        }
-        
-        recent_events = defaultdict(list)
+        recent_events = defaultdict(lambda: deque(maxlen=3))  # Show last 3 of each type
+        event_counts = Counter()
         
-        # Check last 1000 lines for recent events
-        with open(self.log_file_path, 'r') as f:
-            lines = f.readlines()
-            
-        for line in lines[-1000:]:  # Last 1000 entries
-            for event_type, pattern in security_patterns.items():
-                if re.search(pattern, line):
-                    recent_events[event_type].append(line.strip())
+        # Check last 1000 lines for recent events (read backwards from the end of the file)
+        for line in tail_lines(self.log_file_path, 1000):
+            match = SECURITY_EVENT_RE.search(line)
+            if not match:
+                continue
+            event_type = match.lastgroup
+            if event_type == 'json_security':
+                action = match.group('json_security')
+                event_type = next((name for prefix, name in JSON_SECURITY_TYPES.items()
+                                   if action.startswith(prefix)), None)
+                if event_type is None:
+                    continue
+            elif event_type == 'json_login':
+                event_type = 'MULTIPLE_FAILED_LOGINS'
+            event_counts[event_type] += 1
+            recent_events[event_type].append(line.strip())
         
         if not recent_events:
             print("✅ No critical security events detected")
             return
         
         for event_type, events in recent_events.items():
-            if events:
-                print(f"\n⚠️  {event_type}: {len(events)} event(s)")
-                for event in events[-3:]:  # Show last 3 of each type
-                    print(f"    {event}")
+            print(f"\n⚠️  {event_type}: {event_counts[event_type]} event(s)")
+            for event in events:
+                print(f"    {event}")
     
     def generate_daily_report(self):
         """Generate a daily production report"""
@@ -189,7 +321,21 @@ class ProductionLogAnalyzer:
 def main():
     """Main function to run log analysis"""
     
-    analyzer = ProductionLogAnalyzer()
+    parser = argparse.ArgumentParser(description='Analyze production audit logs')
+    parser.add_argument('--log', default='Audit/productionaudit.log', help='Audit log to analyze')
+    parser.add_argument('--update', action='store_true',
+                        help='Only fold newly appended lines into the checkpoint (for cron)')
+    parser.add_argument('--hours', type=int, help='Print the analysis for the last N hours')
+    args = parser.parse_args()
+    
+    analyzer = ProductionLogAnalyzer(args.log)
+    
+    if args.update:
+        print(f"Parsed {analyzer.update()} new line(s)")
+        return
+    if args.hours:
+        analyzer.analyze_logs(hours_back=args.hours)
+        return
     
     print("🚀 Production Log Analysis Tool")
     print("Choose an option:")
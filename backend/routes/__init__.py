@@ -1,4 +1,5 @@
 """Route registration and blueprint management"""
+from config import Config
 
 def register_routes(app):
     """Register all application blueprints"""
@@ -8,6 +9,8 @@ def register_routes(app):
     from .user import user_bp
     from .misc import misc_bp
     from .payment import payment_bp
+    from .metrics import metrics_bp
+    from .irs import irs_bp
     
     # Register blueprints
     app.register_blueprint(position_bp, url_prefix='/api/positions')
@@ -16,3 +19,17 @@ def register_routes(app):
     app.register_blueprint(user_bp, url_prefix='/user')
     app.register_blueprint(misc_bp)  # No prefix for misc routes
     app.register_blueprint(payment_bp, url_prefix='/payment')
+    register_storage_routes(app)
+    app.register_blueprint(metrics_bp)  # /metrics for Prometheus
+    app.register_blueprint(irs_bp, url_prefix='/irs')
+
+def register_storage_routes(app):
+    """Signed /storage/files downloads, only for backends that can't presign (S3 links go to S3)"""
+    from services.storage_service import SELF_SIGNED_BACKENDS
+    if Config.STORAGE_BACKEND not in SELF_SIGNED_BACKENDS:
+        return
+    if not Config.STORAGE_SIGNING_KEY:
+        raise RuntimeError(f"STORAGE_SIGNING_KEY must be set to serve downloads from the "
+                           f"'{Config.STORAGE_BACKEND}' storage backend")
+    from .storage import storage_bp
+    app.register_blueprint(storage_bp, url_prefix='/storage')
@@ -1,12 +1,18 @@
 """Admin routes"""
 import json
+import os
 from datetime import datetime, timezone, timedelta
 from flask import Blueprint, request, jsonify, make_response, Response
 from sqlalchemy import text, or_
 from models import SessionLocal, Submission, FilingsDocument, PaymentIntent
 from utils.auth_decorators import verify_admin_token
-from services.audit_service import log_admin_action
-from services.s3_service import get_s3_client, delete_from_s3
+from services.audit_service import log_admin_action, get_audit_pipeline_stats
+from services.profiling_service import get_profile_store, pstats_text
+from services.storage_service import get_storage
+from utils.file_streaming import storage_download_response
+from Audit.audit_reader import tail_lines, iter_file_chunks, count_log_lines
+from Audit.audit_index import query_audit_log
+from Audit.enhanced_audit import audit_log_path
 from config import Config
 
 def format_est_timestamp(dt):
@@ -135,12 +141,11 @@ def admin_delete_submission(submission_id):
     db = SessionLocal()
     try:
         # Delete related documents first
+        keys_to_delete = []
         docs = db.query(FilingsDocument).filter(FilingsDocument.filing_id == submission_id).all()
         for doc in docs:
             if doc.s3_key:
-                success, message = delete_from_s3(doc.s3_key)
-                if not success:
-                    log_admin_action("DELETE_S3_ERROR", f"Failed to delete document S3 file {doc.s3_key}: {message}")
+                keys_to_delete.append(doc.s3_key)
             db.delete(doc)
         
         # Delete submission
@@ -148,16 +153,13 @@ def admin_delete_submission(submission_id):
         if not submission:
             return jsonify({"error": "Submission not found"}), 404
         
-        # Delete S3 files
-        if submission.xml_s3_key:
-            success, message = delete_from_s3(submission.xml_s3_key)
-            if not success:
-                log_admin_action("DELETE_S3_ERROR", f"Failed to delete XML file {submission.xml_s3_key}: {message}")
+        # Delete stored files in one batch
+        for key in (submission.xml_s3_key, submission.pdf_s3_key):
+            if key and key not in keys_to_delete:
+                keys_to_delete.append(key)
         
-        if submission.pdf_s3_key:
-            success, message = delete_from_s3(submission.pdf_s3_key)
-            if not success:
-                log_admin_action("DELETE_S3_ERROR", f"Failed to delete PDF file {submission.pdf_s3_key}: {message}")
+        for key, message in get_storage().delete_many(keys_to_delete).items():
+            log_admin_action("DELETE_S3_ERROR", f"Failed to delete stored file {key}: {message}")
         
         db.delete(submission)
         db.commit()
@@ -188,25 +190,30 @@ def admin_bulk_delete():
     db = SessionLocal()
     try:
         deleted_count = 0
+        keys_to_delete = set()
         for submission_id in submission_ids:
             submission = db.query(Submission).get(submission_id)
             if submission:
-                # Delete S3 files
+                # Collect stored files
                 if submission.xml_s3_key:
-                    delete_from_s3(submission.xml_s3_key)
+                    keys_to_delete.add(submission.xml_s3_key)
                 if submission.pdf_s3_key:
-                    delete_from_s3(submission.pdf_s3_key)
+                    keys_to_delete.add(submission.pdf_s3_key)
                 
                 # Delete related documents
                 docs = db.query(FilingsDocument).filter(FilingsDocument.filing_id == submission_id).all()
                 for doc in docs:
                     if doc.s3_key:
-                        delete_from_s3(doc.s3_key)
+                        keys_to_delete.add(doc.s3_key)
                     db.delete(doc)
                 
                 db.delete(submission)
                 deleted_count += 1
         
+        # Delete all stored files in batched calls rather than one request per file
+        for key, message in get_storage().delete_many(sorted(keys_to_delete)).items():
+            log_admin_action("DELETE_S3_ERROR", f"Failed to delete stored file {key}: {message}")
+        
         db.commit()
         log_admin_action("BULK_DELETE_SUCCESS", f"Successfully deleted {deleted_count} submissions")
         return jsonify({"message": f"Successfully deleted {deleted_count} submissions"}), 200
@@ -245,19 +252,10 @@ def admin_download_file(submission_id, file_type):
         if not s3_key:
             return jsonify({"error": f"{file_type.upper()} file not found"}), 404
         
-        # Download from S3
+        # Stream from storage (or redirect to a presigned URL, depending on DOWNLOAD_MODE)
         try:
-            s3 = get_s3_client()
-            response = s3.get_object(Bucket=Config.get_bucket_name(), Key=s3_key)
-            file_content = response['Body'].read()
-            
-            # Create response with proper headers
             filename = s3_key.split('/')[-1]
-            response = make_response(file_content)
-            response.headers['Content-Type'] = content_type
-            response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
-            
-            return response
+            return storage_download_response(s3_key, content_type, filename, disposition='inline')
             
         except Exception as e:
             return jsonify({"error": f"Failed to download file: {str(e)}"}), 500
@@ -265,18 +263,42 @@ def admin_download_file(submission_id, file_type):
     finally:
         db.close()
 
+def _stream_log_file(path, download_name):
+    """Stream a log file in chunks (up to its size when the request started)"""
+    length = os.path.getsize(path)
+    return Response(
+        iter_file_chunks(path, Config.DOWNLOAD_CHUNK_SIZE, length),
+        headers={
+            'Content-Type': 'text/plain',
+            'Content-Disposition': f'attachment; filename={download_name}',
+            'Content-Length': str(length)
+        },
+        direct_passthrough=True
+    )
+
+def _tail_audit_log(path, not_found_response):
+    """Last `lines` entries of a log via a reverse block read, plus cached line counts"""
+    lines = int(request.args.get('lines', 50))
+    if lines <= 0 or lines > Config.AUDIT_TAIL_MAX_LINES:
+        lines = Config.AUDIT_TAIL_MAX_LINES
+    
+    if not os.path.exists(path):
+        return jsonify(not_found_response), 404
+    
+    live_lines, archived_lines = count_log_lines(path)
+    return jsonify({
+        "logs": tail_lines(path, lines),
+        "total_lines": live_lines,
+        "archived_lines": archived_lines,
+        "requested_lines": lines
+    })
+
 @admin_bp.route('/audit-logs', methods=['GET'])
 @verify_admin_token
 def download_audit_logs():
     """Download audit logs for compliance reporting"""
     try:
-        with open(Config.AUDIT_LOG_FILE, 'r') as f:
-            logs = f.read()
-        
-        response = make_response(logs)
-        response.headers['Content-Type'] = 'text/plain'
-        response.headers['Content-Disposition'] = 'attachment; filename=audit.log'
-        return response
+        return _stream_log_file(Config.AUDIT_LOG_FILE, 'audit.log')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -285,26 +307,9 @@ def download_audit_logs():
 def get_production_audit_logs():
     """Get production audit logs for monitoring"""
     try:
-        import os
-        lines = int(request.args.get('lines', 50))
-        
-        # Production audit log path
-        prod_log_path = os.path.join('Audit', 'productionaudit.log')
-        
-        if not os.path.exists(prod_log_path):
-            return jsonify({
-                "error": "Production audit log not found",
-                "message": "No production activities have been logged yet"
-            }), 404
-        
-        with open(prod_log_path, 'r') as f:
-            all_lines = f.readlines()
-            recent_lines = all_lines[-lines:] if lines > 0 else all_lines
-        
-        return jsonify({
-            "logs": [line.rstrip() for line in recent_lines],
-            "total_lines": len(all_lines),
-            "requested_lines": lines
+        return _tail_audit_log(audit_log_path('production'), {
+            "error": "Production audit log not found",
+            "message": "No production activities have been logged yet"
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -314,23 +319,14 @@ def get_production_audit_logs():
 def download_production_audit_logs():
     """Download complete production audit logs"""
     try:
-        import os
-        
-        # Production audit log path
-        prod_log_path = os.path.join('Audit', 'productionaudit.log')
+        prod_log_path = audit_log_path('production')
         
         if not os.path.exists(prod_log_path):
             return jsonify({
                 "error": "Production audit log not found"
             }), 404
         
-        with open(prod_log_path, 'r') as f:
-            logs = f.read()
-        
-        response = make_response(logs)
-        response.headers['Content-Type'] = 'text/plain'
-        response.headers['Content-Disposition'] = 'attachment; filename=productionaudit.log'
-        return response
+        return _stream_log_file(prod_log_path, 'productionaudit.log')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -339,29 +335,101 @@ def download_production_audit_logs():
 def get_local_audit_logs():
     """Get local audit logs for development monitoring"""
     try:
-        import os
-        lines = int(request.args.get('lines', 50))
-        
-        # Local audit log path
-        local_log_path = os.path.join('Audit', 'localaudit.log')
-        
-        if not os.path.exists(local_log_path):
-            return jsonify({
-                "error": "Local audit log not found"
-            }), 404
-        
-        with open(local_log_path, 'r') as f:
-            all_lines = f.readlines()
-            recent_lines = all_lines[-lines:] if lines > 0 else all_lines
-        
+        return _tail_audit_log(audit_log_path('local'), {
+            "error": "Local audit log not found"
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _parse_query_time(value):
+    """ISO-8601 query parameter as an aware datetime (naive values are taken as UTC)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _limit_arg(default):
+    """?limit= as a positive integer (default when absent), or None if it isn't one"""
+    try:
+        limit = int(request.args.get('limit') or default)
+    except ValueError:
+        return None
+    return limit if limit >= 1 else None
+
+@admin_bp.route('/audit-logs/query', methods=['GET'])
+@verify_admin_token
+def query_audit_logs():
+    """Audit entries by time range, user and event (?from=&to=&user=&event=&env=&limit=)"""
+    try:
+        start = _parse_query_time(request.args.get('from'))
+        end = _parse_query_time(request.args.get('to'))
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO-8601 timestamps"}), 400
+    
+    env = request.args.get('env', 'production')
+    if env not in ('production', 'local'):
+        return jsonify({"error": "env must be 'production' or 'local'"}), 400
+    limit = _limit_arg(500)
+    if limit is None:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    limit = min(limit, Config.AUDIT_QUERY_MAX_RESULTS)
+    
+    try:
+        entries, segments, truncated = query_audit_log(
+            audit_log_path(env),
+            start=start,
+            end=end,
+            user=request.args.get('user') or None,
+            event=request.args.get('event') or None,
+            limit=limit
+        )
+        for entry in entries:
+            entry['ts'] = entry['ts'].isoformat()
         return jsonify({
-            "logs": [line.rstrip() for line in recent_lines],
-            "total_lines": len(all_lines),
-            "requested_lines": lines
+            "entries": entries,
+            "count": len(entries),
+            "truncated": truncated,
+            "segments": segments
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@admin_bp.route('/audit-logs/pipeline', methods=['GET'])
+@verify_admin_token
+def get_audit_pipeline():
+    """Queue depth and write/drop counters for the background audit writers"""
+    return jsonify({
+        "async": Config.AUDIT_ASYNC,
+        "loggers": get_audit_pipeline_stats()
+    })
+
+@admin_bp.route('/profiles', methods=['GET'])
+@verify_admin_token
+def list_profiles():
+    """Most recent request profiles (newest first)"""
+    limit = _limit_arg(50)
+    if limit is None:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    limit = min(limit, Config.PROFILE_MAX_FILES)
+    return jsonify({"profiles": get_profile_store().list(limit)})
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@verify_admin_token
+def get_profile(profile_id):
+    """
+    A saved profile: collapsed stacks for 'sample' profiles, a cumulative-time report
+    for 'cprofile' ones (?format=raw downloads the .prof file for snakeviz/pstats)
+    """
+    store = get_profile_store()
+    meta = store.get_meta(profile_id)
+    if meta is None:
+        return jsonify({"error": "Profile not found"}), 404
+    
+    path = store.data_path(meta)
+    if meta['mode'] == 'cprofile' and request.args.get('format') != 'raw':
+        return Response(pstats_text(path), content_type='text/plain; charset=utf-8')
+    return _stream_log_file(path, meta['data_file'])
+
 @admin_bp.route('/payment-history', methods=['GET'])
 @verify_admin_token
 def admin_view_payment_history():
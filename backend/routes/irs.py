@@ -0,0 +1,52 @@
+"""IRS e-file routes - transmissions are queued here and sent by irs_worker.py"""
+from flask import Blueprint, request, jsonify
+from models import SessionLocal, Submission, IRSSubmission
+from utils.auth_decorators import verify_firebase_token
+from services.audit_service import log_admin_action
+from services.irs_queue_service import enqueue_irs_submission, serialize_irs_submission
+
+irs_bp = Blueprint('irs', __name__)
+
+@irs_bp.route('/submissions/<int:filing_id>', methods=['POST'])
+@verify_firebase_token
+def queue_irs_submission(filing_id):
+    """Queue one of the user's filings for e-file; returns at once with the queue entry"""
+    user_uid = request.user['uid']
+    db = SessionLocal()
+    try:
+        filing = db.query(Submission).filter(
+            Submission.id == filing_id,
+            Submission.user_uid == user_uid
+        ).first()
+        if not filing:
+            return jsonify({"error": "Submission not found"}), 404
+        if not filing.xml_s3_key:
+            return jsonify({"error": "Submission has no XML to transmit"}), 400
+    finally:
+        db.close()
+    
+    try:
+        entry, created = enqueue_irs_submission(filing)
+    except RuntimeError as e:
+        return jsonify({"error": "IRS e-file is not available", "details": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": "Submission cannot be transmitted", "details": str(e)}), 400
+    
+    if created:
+        log_admin_action("IRS_SUBMISSION_QUEUED",
+                         f"message_id={entry['message_id']} filing_id={filing_id} user={user_uid}")
+    return jsonify({"queued": created, "submission": entry}), 202 if created else 200
+
+@irs_bp.route('/submissions/<int:filing_id>', methods=['GET'])
+@verify_firebase_token
+def get_irs_submissions(filing_id):
+    """Transmission attempts for one of the user's filings, newest first"""
+    db = SessionLocal()
+    try:
+        rows = db.query(IRSSubmission).filter(
+            IRSSubmission.filing_id == filing_id,
+            IRSSubmission.user_uid == request.user['uid']
+        ).order_by(IRSSubmission.created_at.desc()).all()
+        return jsonify({"submissions": [serialize_irs_submission(row) for row in rows]})
+    finally:
+        db.close()
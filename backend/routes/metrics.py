@@ -0,0 +1,25 @@
+"""Prometheus scrape endpoint"""
+import hmac
+from flask import Blueprint, request, jsonify, Response
+from config import Config
+from services.metrics_service import get_request_metrics, render_prometheus
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-route latency histograms, error and byte counters summed across workers"""
+    if not Config.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    
+    if not Config.METRICS_TOKEN and Config.FLASK_ENV == 'production':
+        # Route names, volumes and error rates aren't for the open internet
+        return jsonify({"error": "Metrics need METRICS_TOKEN in production"}), 503
+    if Config.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').replace('Bearer ', '', 1)
+        if not hmac.compare_digest(supplied, Config.METRICS_TOKEN):
+            return jsonify({"error": "Unauthorized"}), 401
+    
+    body = render_prometheus(get_request_metrics().collect())
+    return Response(body, headers={'Cache-Control': 'no-store'},
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
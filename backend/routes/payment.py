@@ -7,16 +7,13 @@ from utils.auth_decorators import verify_firebase_token
 from models import SessionLocal, Submission
 from services.audit_service import log_admin_action
 from services.payment_tracking_service import PaymentTrackingService
+from services.stripe_service import (
+    STRIPE_AVAILABLE, WebhookSignatureError, construct_webhook_event, apply_webhook_event
+)
 
-# Try to import Stripe, but don't fail if it's not available
-try:
-    import stripe
-    STRIPE_AVAILABLE = True
-    print("✅ Stripe module loaded successfully")
-except ImportError as e:
-    STRIPE_AVAILABLE = False
-    stripe = None  # Set to None so we can check it later
-    print(f"⚠️ WARNING: Stripe module not available: {e}")
+# Stripe is imported where it's used - it's slow to import and most requests never touch it
+if not STRIPE_AVAILABLE:
+    print("⚠️ WARNING: Stripe module not available")
 
 payment_bp = Blueprint('payment', __name__)
 
@@ -53,6 +50,7 @@ def create_payment_intent():
         
         # Check if Stripe is properly configured
         if Config.STRIPE_SECRET_KEY and Config.STRIPE_PUBLISHABLE_KEY and STRIPE_AVAILABLE:
+            import stripe
             stripe.api_key = Config.STRIPE_SECRET_KEY
             
             intent = stripe.PaymentIntent.create(
@@ -136,12 +134,28 @@ def confirm_payment():
         'amount_received': FORM_SUBMISSION_PRICE,
         'dev_mode': True
     })
+"""
 
 @payment_bp.route('/webhook', methods=['POST'])
 def stripe_webhook():
-    # Webhook placeholder
-    return jsonify({'status': 'success'})
-"""
+    """Signed Stripe events - keeps PaymentIntent rows current so the PDF routes don't have to ask Stripe"""
+    if not Config.STRIPE_WEBHOOK_SECRET or not STRIPE_AVAILABLE:
+        return jsonify({'error': 'Stripe webhook not configured'}), 503
+    
+    try:
+        event = construct_webhook_event(request.get_data(), request.headers.get('Stripe-Signature'))
+    except WebhookSignatureError as e:
+        print(f"Warning: rejected Stripe webhook: {e}")
+        return jsonify({'error': 'Invalid signature'}), 400
+    
+    try:
+        status = apply_webhook_event(event)
+    except Exception as e:
+        # A non-2xx answer makes Stripe redeliver the event later
+        print(f"Warning: Stripe webhook {event['id']} not applied: {e}")
+        return jsonify({'error': 'Event not processed'}), 500
+    
+    return jsonify({'received': True, 'status': status})
 
 @payment_bp.route('/test', methods=['GET'])
 def test_payment_route():
@@ -4,9 +4,6 @@ import os
 import datetime
 import io
 from flask import Blueprint, request, jsonify, make_response
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
 from config import Config
 from utils.form_positions import load_form_positions, save_form_positions, get_fields_for_page
 from utils.calculations import calculate_vehicle_statistics, add_dynamic_vin_fields
@@ -14,7 +11,7 @@ from services.audit_service import audit_logger
 
 position_bp = Blueprint('positions', __name__)
 
-# Global variable for form positions (will be loaded on startup)
+# Global variable for form positions (loaded once by create_app)
 FORM_POSITIONS = {}
 
 def init_form_positions():
@@ -23,9 +20,6 @@ def init_form_positions():
     FORM_POSITIONS = load_form_positions()
     print(f"✅ Blueprint FORM_POSITIONS loaded: {len(FORM_POSITIONS)} fields")
 
-# Initialize positions when module is imported
-init_form_positions()
-
 @position_bp.route('', methods=['GET'])
 def get_positions():
     """Get current form field positions"""
@@ -160,6 +154,7 @@ def reset_field_offset(field_name):
 @position_bp.route('/test-pdf', methods=['POST'])
 def test_pdf_with_offsets():
     """Generate a test PDF with sample data using current offset settings for all pages"""
+    from PyPDF2 import PdfReader, PdfWriter  # PDF libraries load on first use, not at start-up
     print("=== TEST PDF GENERATION STARTED ===")
     try:
         # Sample test data with comprehensive field coverage (from original backup)
@@ -485,6 +480,9 @@ def test_pdf_with_offsets():
 
 def _create_test_page_overlay(page_num, test_data, month_vehicles, fields_on_page):
     """Create overlay with comprehensive field rendering (matches original logic)"""
+    from PyPDF2 import PdfReader
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
     packet = io.BytesIO()
     can = canvas.Canvas(packet, pagesize=letter)
     
@@ -0,0 +1,21 @@
+"""Signed download route for storage backends that cannot presign URLs themselves (local, memory)"""
+import mimetypes
+from flask import Blueprint, request, jsonify
+from services.storage_service import verify_storage_signature, ObjectNotFound
+from utils.file_streaming import storage_download_response
+
+storage_bp = Blueprint('storage', __name__)
+
+@storage_bp.route('/files/<path:key>', methods=['GET'])
+def signed_file_download(key):
+    """Serve a stored file to the holder of a valid, unexpired signed URL"""
+    if not verify_storage_signature(key, request.args.get('expires'), request.args.get('signature')):
+        return jsonify({"error": "Invalid or expired download link"}), 403
+    
+    try:
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        return storage_download_response(key, content_type, key.split('/')[-1], mode='stream')
+    except ObjectNotFound:
+        return jsonify({"error": "File not found"}), 404
+    except Exception as e:
+        return jsonify({"error": "Download failed"}), 500
@@ -5,7 +5,8 @@ from flask import Blueprint, request, jsonify, Response
 from sqlalchemy import text
 from models import SessionLocal, Submission, FilingsDocument
 from utils.auth_decorators import verify_firebase_token
-from services.s3_service import get_s3_client, generate_presigned_url
+from services.storage_service import get_storage
+from utils.file_streaming import storage_download_response
 from config import Config
 
 def format_est_timestamp(dt):
@@ -87,14 +88,14 @@ def user_submissions():
 @user_bp.route('/documents', methods=['GET'])
 @verify_firebase_token
 def user_documents():
-    """Get all documents for the current user"""
+    """Get all documents for the current user (download URLs are issued on demand)"""
     user_uid = request.user['uid']
     db = SessionLocal()
     try:
         # Query to fetch user's submissions and associated documents
         rows = db.execute(
             text("""
-                SELECT s.id, s.month, s.created_at, d.document_type, d.s3_key
+                SELECT s.id, s.month, s.created_at, d.id, d.document_type
                   FROM submissions s
                   JOIN filings_documents d ON s.id = d.filing_id
                  WHERE s.user_uid = :uid
@@ -105,8 +106,7 @@ def user_documents():
 
         submissions = {}
         for row in rows:
-            submission_id, month, created_at, doc_type, s3_key = row
-            success, url = generate_presigned_url(s3_key, expiration=900)
+            submission_id, month, created_at, document_id, doc_type = row
             
             if submission_id not in submissions:
                 submissions[submission_id] = {
@@ -116,11 +116,10 @@ def user_documents():
                     "documents": []
                 }
             
-            if success:
-                submissions[submission_id]["documents"].append({
-                    "type": doc_type,
-                    "url": url
-                })
+            submissions[submission_id]["documents"].append({
+                "id": document_id,
+                "type": doc_type
+            })
 
         return jsonify({
             "count": len(submissions),
@@ -131,6 +130,28 @@ def user_documents():
     finally:
         db.close()
 
+@user_bp.route('/documents/<int:document_id>/url', methods=['GET'])
+@verify_firebase_token
+def user_document_url(document_id):
+    """Issue a short-lived download URL for one of the current user's documents"""
+    user_uid = request.user['uid']
+    db = SessionLocal()
+    try:
+        document = db.query(FilingsDocument).filter(
+            FilingsDocument.id == document_id,
+            FilingsDocument.user_uid == user_uid
+        ).first()
+        
+        if not document or not document.s3_key:
+            return jsonify({"error": "Document not found"}), 404
+        
+        url = get_storage().presign(document.s3_key, expiration=900)
+        return jsonify({"id": document.id, "type": document.document_type, "url": url}), 200
+    except Exception as e:
+        return jsonify({"error": "Failed to generate download link"}), 500
+    finally:
+        db.close()
+
 @user_bp.route('/submissions/<submission_id>/download/<file_type>', methods=['GET'])
 @verify_firebase_token
 def download_submission_file(submission_id, file_type):
@@ -156,24 +177,12 @@ def download_submission_file(submission_id, file_type):
         if not s3_key:
             return jsonify({"error": f"{file_type.upper()} file not found"}), 404
         
-        # Fetch the file from S3 and return it as a download
+        # Stream the file from storage (or redirect to a presigned URL, depending on DOWNLOAD_MODE)
         try:
-            s3 = get_s3_client()
-            response = s3.get_object(Bucket=Config.get_bucket_name(), Key=s3_key)
-            file_content = response['Body'].read()
-            
-            # Set appropriate content type and headers
             content_type = 'application/pdf' if file_type == 'pdf' else 'application/xml'
             filename = f"form2290-{submission_id}.{file_type}"
             
-            return Response(
-                file_content,
-                mimetype=content_type,
-                headers={
-                    'Content-Disposition': f'attachment; filename={filename}',
-                    'Content-Type': content_type
-                }
-            )
+            return storage_download_response(s3_key, content_type, filename)
             
         except Exception as e:
             return jsonify({"error": "Download failed"}), 500
@@ -200,10 +209,10 @@ def download_pdf_by_month(month):
             return jsonify({"error": f"PDF not found for month {month}"}), 404
         
         # Generate presigned URL for download
-        success, url = generate_presigned_url(submission.pdf_s3_key, expiration=300)
-        if success:
+        try:
+            url = get_storage().presign(submission.pdf_s3_key, expiration=300)
             return jsonify({"download_url": url}), 200
-        else:
+        except Exception as e:
             return jsonify({"error": "Failed to generate download link"}), 500
     
     finally:
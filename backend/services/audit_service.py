@@ -3,6 +3,9 @@ import logging
 import datetime
 import os
 from config import Config
+from Audit.audit_queue import attach_queued_handler, get_pipeline_stats
+from Audit.audit_format import TEXT_FORMATS, audit_fields
+from Audit.audit_rotation import create_audit_file_handler
 
 # Setup audit logger
 audit_logger = logging.getLogger('audit')
@@ -10,18 +13,30 @@ audit_logger.setLevel(logging.INFO)
 
 # Create audit log handler if not exists
 if not audit_logger.handlers:
-    audit_handler = logging.FileHandler(Config.AUDIT_LOG_FILE)
-    audit_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    audit_handler.setFormatter(audit_formatter)
-    audit_logger.addHandler(audit_handler)
+    audit_handler = create_audit_file_handler(Config.AUDIT_LOG_FILE, TEXT_FORMATS['audit'])
+    if Config.AUDIT_ASYNC:
+        attach_queued_handler(audit_logger, audit_handler, **Config.get_audit_queue_options())
+    else:
+        audit_logger.addHandler(audit_handler)
 
+# Messages use lazy %-style args so formatting happens on the writer thread
 def log_admin_action(action, details):
     """Log admin actions for audit trail"""
-    audit_logger.info(f"ADMIN_ACTION: {action} - {details}")
+    audit_logger.info("ADMIN_ACTION: %s - %s", action, details,
+                      extra=audit_fields('ADMIN_ACTION', action=action, data={'details': details}))
 
 def log_error_event(user_email, error_type, error_message, endpoint):
     """Log error events for debugging and audit"""
-    audit_logger.error(f"ERROR: {error_type} - User: {user_email} - Endpoint: {endpoint} - Message: {error_message}")
+    audit_logger.error("ERROR: %s - User: %s - Endpoint: %s - Message: %s", error_type, user_email, endpoint, error_message,
+                       extra=audit_fields('ERROR_EVENT', action=error_type, user=user_email, endpoint=endpoint,
+                                          data={'error': str(error_message)}))
+
+def get_audit_pipeline_stats():
+    """Queue/writer counters for the audit loggers"""
+    return {
+        'audit': get_pipeline_stats(audit_logger),
+        'enhanced_audit': get_pipeline_stats(logging.getLogger('PRODUCTION_AUDIT')) + get_pipeline_stats(logging.getLogger('LOCAL_AUDIT'))
+    }
 
 def init_audit_logging():
     """Initialize audit logging system"""
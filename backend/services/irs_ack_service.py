@@ -0,0 +1,159 @@
+"""
+IRS acknowledgement polling.
+Once SubmissionWorker records a return as 'submitted' it sets next_poll_at. AckPoller
+(run by irs_worker.py) claims due rows in batches, asks the IRS for all of their
+acknowledgements in one GetAcks call, and writes the outcome back with one UPDATE per
+outcome. Polls follow IRS_ACK_POLL_SCHEDULE - often right after submission, rarely
+once a return has been waiting a while - so the IRS sees one call per batch of
+outstanding returns however often users refresh their status page (which only reads
+the table).
+"""
+import datetime
+import os
+import socket
+import threading
+from collections import defaultdict
+from sqlalchemy import update, bindparam
+from config import Config
+from models import SessionLocal, IRSSubmission
+from services.audit_service import log_admin_action
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+def ack_poll_delay(poll_count):
+    """Seconds until the next poll of a return already polled `poll_count` times"""
+    schedule = Config.IRS_ACK_POLL_SCHEDULE
+    return schedule[min(poll_count, len(schedule) - 1)]
+
+class AckPoller:
+    """Polls acknowledgements for every 'submitted' row that is due, a batch per GetAcks call"""
+
+    def __init__(self, client, name=None, batch_size=None):
+        self.client = client
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:acks'
+        self.batch_size = batch_size or Config.IRS_ACK_BATCH_SIZE
+        # A claimed batch is handed to another poller if this one hasn't answered by then
+        self.lease_seconds = Config.IRS_CONNECT_TIMEOUT + Config.IRS_READ_TIMEOUT + 60
+        self._stop = threading.Event()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Warning: IRS acknowledgement poll failed: {e}")
+            self._stop.wait(Config.IRS_ACK_POLL_INTERVAL)
+
+    def request_stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Poll everything that is due, batch by batch; returns how many returns were polled"""
+        polled = 0
+        while not self._stop.is_set():
+            rows = self._claim_batch()
+            if rows:
+                self._poll(rows)
+                polled += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        return polled
+
+    def _claim_batch(self):
+        """[(id, irs_submission_id, poll_count, message_id, filing_id)] claimed for this poller"""
+        now = _utcnow()
+        db = SessionLocal()
+        try:
+            due = [row_id for (row_id,) in db.query(IRSSubmission.id).filter(
+                IRSSubmission.status == 'submitted',
+                IRSSubmission.next_poll_at <= now
+            ).order_by(IRSSubmission.next_poll_at).limit(self.batch_size)]
+            if not due:
+                return []
+            # Pushing next_poll_at past the lease is the claim: a concurrent poller's
+            # UPDATE no longer matches these rows
+            db.execute(
+                update(IRSSubmission)
+                .where(IRSSubmission.id.in_(due), IRSSubmission.status == 'submitted',
+                       IRSSubmission.next_poll_at <= now)
+                .values(claimed_by=self.name, claimed_at=now,
+                        next_poll_at=now + datetime.timedelta(seconds=self.lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return db.query(IRSSubmission.id, IRSSubmission.irs_submission_id, IRSSubmission.poll_count,
+                            IRSSubmission.message_id, IRSSubmission.filing_id).filter(
+                IRSSubmission.id.in_(due),
+                IRSSubmission.claimed_by == self.name,
+                IRSSubmission.claimed_at == now
+            ).all()
+        finally:
+            db.close()
+
+    def _poll(self, rows):
+        try:
+            acks = self.client.get_acknowledgements(row.irs_submission_id or row.message_id for row in rows)
+        except Exception as e:
+            print(f"Warning: GetAcks for {len(rows)} submission(s) failed: {e}")
+            acks = {}
+        self._apply(rows, acks)
+
+    def _apply(self, rows, acks):
+        """Write the batch back: one UPDATE for accepted rows, one executemany for rejected, one per pending delay"""
+        now = _utcnow()
+        accepted = []
+        rejected = []
+        pending = defaultdict(list)  # next delay -> row ids
+        for row in rows:
+            status, errors = acks.get(row.irs_submission_id or row.message_id, (None, None))
+            if status and status.startswith('accept'):
+                accepted.append(row)
+            elif status and status.startswith('reject'):
+                rejected.append((row, errors))
+            else:
+                pending[ack_poll_delay(row.poll_count or 0)].append(row.id)
+
+        released = {'claimed_by': None, 'claimed_at': None, 'updated_at': now}
+        mine = (IRSSubmission.claimed_by == self.name, IRSSubmission.status == 'submitted')
+        db = SessionLocal()
+        try:
+            if accepted:
+                db.execute(
+                    update(IRSSubmission)
+                    .where(IRSSubmission.id.in_([row.id for row in accepted]), *mine)
+                    .values(status='accepted', ack_status='accepted', acknowledged_at=now,
+                            next_poll_at=None, **released)
+                    .execution_options(synchronize_session=False)
+                )
+            if rejected:
+                # Error text differs per row, so this one is a single executemany
+                table = IRSSubmission.__table__
+                db.execute(
+                    table.update()
+                    .where(table.c.id == bindparam('row_id'), table.c.claimed_by == self.name,
+                           table.c.status == 'submitted')
+                    .values(status='rejected', ack_status='rejected', acknowledged_at=now,
+                            next_poll_at=None, ack_errors=bindparam('errors'), **released),
+                    [{'row_id': row.id, 'errors': '\n'.join(errors) or None} for row, errors in rejected]
+                )
+            for delay, ids in pending.items():
+                db.execute(
+                    update(IRSSubmission)
+                    .where(IRSSubmission.id.in_(ids), *mine)
+                    .values(poll_count=IRSSubmission.poll_count + 1,
+                            next_poll_at=now + datetime.timedelta(seconds=delay), **released)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for row in accepted:
+            log_admin_action("IRS_SUBMISSION_ACCEPTED", f"message_id={row.message_id} filing_id={row.filing_id}")
+        for row, errors in rejected:
+            log_admin_action("IRS_SUBMISSION_REJECTED",
+                             f"message_id={row.message_id} filing_id={row.filing_id} errors={'; '.join(errors)}")
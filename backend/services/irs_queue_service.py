@@ -0,0 +1,329 @@
+"""
+Durable IRS submission queue.
+Web requests call enqueue_irs_submission(), which only inserts an irs_submissions row.
+irs_worker.py runs SubmissionWorker, which claims due rows and transmits them through
+IRSSOAPClient with bounded concurrency, a per-EFIN rate limit and exponential backoff -
+one return per call, or IRS_BATCH_SIZE returns per SendSubmissions call.
+Every retry reuses the row's message ID, so a transmission that reached the IRS before
+a timeout is rejected there as a duplicate instead of being filed twice. Submitted rows
+are then followed up by services/irs_ack_service.AckPoller.
+"""
+import datetime
+import json
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from models import SessionLocal, IRSSubmission, IRS_ACTIVE_STATUSES
+from services.storage_service import get_storage
+from services.audit_service import log_admin_action
+from services.irs_ack_service import ack_poll_delay
+from services.message_id_service import generate_message_id
+from xml_builder import build_return_manifest, is_valid_ein
+
+ACTIVE_STATUSES = IRS_ACTIVE_STATUSES  # Block queueing the filing again
+DUE_STATUSES = ('queued', 'retry')
+STALE_CHECK_INTERVAL = 60.0
+ENQUEUE_ID_ATTEMPTS = 5
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+def serialize_irs_submission(row):
+    return {
+        'message_id': row.message_id,
+        'filing_id': row.filing_id,
+        'status': row.status,
+        'attempts': row.attempts,
+        'next_attempt_at': row.next_attempt_at.isoformat() if row.next_attempt_at else None,
+        'irs_submission_id': row.irs_submission_id,
+        'last_error': row.last_error,
+        'submitted_at': row.submitted_at.isoformat() if row.submitted_at else None,
+        'ack_status': row.ack_status,
+        'ack_errors': row.ack_errors.split('\n') if row.ack_errors else [],
+        'acknowledged_at': row.acknowledged_at.isoformat() if row.acknowledged_at else None,
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    }
+
+def _active_row(db, filing_id):
+    return db.query(IRSSubmission).filter(
+        IRSSubmission.filing_id == filing_id,
+        IRSSubmission.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+def enqueue_irs_submission(filing, efin=None):
+    """
+    Queue a filing (models.Submission) for transmission; returns (row dict, created).
+    A filing that is already queued, in flight or submitted is not queued again, and
+    one without a valid EIN is refused with ValueError.
+    """
+    if not Config.IRS_ETIN:
+        raise RuntimeError("IRS_ETIN is not configured")
+
+    db = SessionLocal()
+    try:
+        existing = _active_row(db, filing.id)
+        if existing is not None:
+            return serialize_irs_submission(existing), False
+
+        # The manifest comes from the filing's form data now, so the worker never has to
+        # dig the EIN back out of the return XML
+        manifest = build_return_manifest(json.loads(filing.form_data or '{}'))
+        if not is_valid_ein(manifest['ein']):
+            raise ValueError("Filing has no valid EIN (nine digits, not all zeros)")
+        for attempt in range(ENQUEUE_ID_ATTEMPTS):
+            row = IRSSubmission(
+                message_id=generate_message_id(Config.IRS_ETIN),
+                filing_id=filing.id,
+                user_uid=filing.user_uid,
+                efin=efin or Config.IRS_EFIN,
+                xml_s3_key=filing.xml_s3_key,
+                ein=manifest['ein'],
+                tax_year=manifest['tax_year'],
+                status='queued',
+                attempts=0,
+                next_attempt_at=_utcnow()
+            )
+            db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                # A concurrent request (a double-clicked submit) queued the filing first:
+                # the partial unique index allows one active row per filing
+                existing = _active_row(db, filing.id)
+                if existing is not None:
+                    return serialize_irs_submission(existing), False
+                # Otherwise only an ID left over in the old timestamp format can clash; take the next one
+                if attempt == ENQUEUE_ID_ATTEMPTS - 1:
+                    raise
+                continue
+            db.refresh(row)
+            return serialize_irs_submission(row), True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _row_manifest(row):
+    """Manifest stored at enqueue time; None for rows queued before it was (the client falls back)"""
+    if not row.ein:
+        return None
+    return build_return_manifest({'ein': row.ein, 'tax_year': row.tax_year or 2025})
+
+def backoff_delay(attempts):
+    """Seconds before retry number `attempts` (1-based): doubling from the base, capped, with jitter"""
+    delay = min(Config.IRS_RETRY_MAX_DELAY, Config.IRS_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+class EfinRateLimiter:
+    """Token bucket per EFIN: `rate_per_minute` sustained, up to `burst` at once"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, efin):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(efin, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            acquired = tokens >= 1
+            self._buckets[efin] = (tokens - 1 if acquired else tokens, now)
+            return acquired
+
+    def refund(self, efin):
+        with self._lock:
+            tokens, updated = self._buckets.get(efin, (self.burst, time.monotonic()))
+            self._buckets[efin] = (min(self.burst, tokens + 1), updated)
+
+class SubmissionWorker:
+    """Claims due irs_submissions rows and transmits them on a bounded thread pool"""
+
+    def __init__(self, client, concurrency=None, name=None, batch_size=None):
+        self.client = client
+        self.concurrency = concurrency or Config.IRS_QUEUE_CONCURRENCY
+        self.batch_size = max(1, batch_size or Config.IRS_BATCH_SIZE)
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.limiter = EfinRateLimiter(Config.IRS_EFIN_RATE_PER_MINUTE, Config.IRS_EFIN_BURST)
+        # A claim older than this belongs to a worker that died mid-transmission
+        self.lease_seconds = Config.IRS_CONNECT_TIMEOUT + Config.IRS_READ_TIMEOUT + 60
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='irs-submit')
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Event()
+        self._stop = threading.Event()
+        self._last_stale_check = 0.0
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                started = self.run_once()
+            except Exception as e:
+                print(f"Warning: IRS queue pass failed: {e}")
+                started = 0
+            if not started:
+                # Wake early when a transmission finishes and frees a slot
+                self._slot_freed.wait(Config.IRS_QUEUE_POLL_INTERVAL)
+                self._slot_freed.clear()
+
+    def request_stop(self):
+        """Make run_forever() return after its current pass (safe from a signal handler)"""
+        self._stop.set()
+        self._slot_freed.set()
+
+    def stop(self, wait=True):
+        """Stop claiming; with wait=True, let in-flight transmissions finish"""
+        self.request_stop()
+        self._executor.shutdown(wait=wait)
+
+    def run_once(self):
+        """Claim and start as many transmissions as there are free slots; returns how many returns started"""
+        if time.monotonic() - self._last_stale_check >= STALE_CHECK_INTERVAL:
+            self._last_stale_check = time.monotonic()
+            self.release_stale_claims()
+
+        with self._lock:
+            free = self.concurrency - self._in_flight
+        if free <= 0:
+            return 0
+
+        transmissions = self._claim_due(free)
+        for row_ids in transmissions:
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._transmit, row_ids)
+        return sum(len(row_ids) for row_ids in transmissions)
+
+    def release_stale_claims(self):
+        """Put rows whose worker died mid-transmission back in the queue (same message ID)"""
+        now = _utcnow()
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(IRSSubmission)
+                .where(IRSSubmission.status == 'sending',
+                       IRSSubmission.claimed_at < now - datetime.timedelta(seconds=self.lease_seconds))
+                .values(status='retry', claimed_by=None, claimed_at=None, next_attempt_at=now,
+                        last_error='Worker lease expired', updated_at=now)
+            )
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
+    def _claim_due(self, limit):
+        """
+        Claim rows for up to `limit` transmissions of up to batch_size returns each;
+        returns a list of row-id lists, one per transmission (all rows in one share an EFIN)
+        """
+        now = _utcnow()
+        db = SessionLocal()
+        try:
+            candidates = db.query(IRSSubmission.id, IRSSubmission.efin).filter(
+                IRSSubmission.status.in_(DUE_STATUSES),
+                IRSSubmission.next_attempt_at <= now
+            ).order_by(IRSSubmission.next_attempt_at).limit(limit * self.batch_size * 4).all()
+
+            transmissions = []
+            open_batches = {}  # efin -> row ids of its transmission still being filled
+            for row_id, efin in candidates:
+                batch = open_batches.get(efin)
+                if batch is None or len(batch) >= self.batch_size:
+                    if len(transmissions) >= limit:
+                        continue
+                    # The rate limit counts transmissions, not returns
+                    if not self.limiter.try_acquire(efin):
+                        continue  # this EFIN is at its rate; the row stays due
+                    batch = open_batches[efin] = []
+                    transmissions.append((efin, batch))
+                # Conditional update: only one worker process wins each row
+                result = db.execute(
+                    update(IRSSubmission)
+                    .where(IRSSubmission.id == row_id, IRSSubmission.status.in_(DUE_STATUSES))
+                    .values(status='sending', claimed_by=self.name, claimed_at=now,
+                            attempts=IRSSubmission.attempts + 1, updated_at=now)
+                )
+                db.commit()
+                if result.rowcount == 1:
+                    batch.append(row_id)
+
+            claimed = []
+            for efin, batch in transmissions:
+                if batch:
+                    claimed.append(batch)
+                else:
+                    self.limiter.refund(efin)
+            return claimed
+        finally:
+            db.close()
+
+    def _transmit(self, row_ids):
+        db = SessionLocal()
+        try:
+            rows = db.query(IRSSubmission).filter(IRSSubmission.id.in_(row_ids)).all()
+            db.expunge_all()  # keep the loaded values; each result commit would otherwise expire them
+            results = {}
+            returns = []
+            for row in rows:
+                try:
+                    returns.append((row.message_id, get_storage().get(row.xml_s3_key), _row_manifest(row)))
+                except Exception as e:
+                    # Only this return waits for a retry; the rest of the batch still goes
+                    results[row.message_id] = {'success': False, 'error': f'Could not load return XML: {e}',
+                                               'retryable': True}
+            if len(returns) == 1:
+                message_id, form_xml, manifest = returns[0]
+                results[message_id] = self.client.submit_form_2290(form_xml, message_id=message_id,
+                                                                    manifest=manifest)
+            elif returns:
+                results.update(self.client.submit_batch(returns))
+            for row in rows:
+                try:
+                    self._record_result(db, row, results[row.message_id])
+                except Exception as e:
+                    db.rollback()
+                    # The row stays 'sending' and is picked up again once its lease expires
+                    print(f"Warning: could not record IRS result for queue row {row.id}: {e}")
+        except Exception as e:
+            # The rows stay 'sending' and are picked up again once their lease expires
+            print(f"Warning: IRS transmission of queue rows {row_ids} failed: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._in_flight -= 1
+            self._slot_freed.set()
+
+    def _record_result(self, db, row, result):
+        now = _utcnow()
+        values = {'claimed_by': None, 'claimed_at': None, 'updated_at': now}
+        if result['success']:
+            values.update(status='submitted', submitted_at=now, last_error=None,
+                          irs_submission_id=result.get('submission_id') or row.message_id,
+                          poll_count=0, next_poll_at=now + datetime.timedelta(seconds=ack_poll_delay(0)))
+        elif result.get('retryable') and row.attempts < Config.IRS_MAX_ATTEMPTS:
+            values.update(status='retry', last_error=result.get('error'),
+                          next_attempt_at=now + datetime.timedelta(seconds=backoff_delay(row.attempts)))
+        else:
+            values.update(status='failed', last_error=result.get('error'))
+
+        # Only the current claim holder may record a result
+        outcome = db.execute(
+            update(IRSSubmission)
+            .where(IRSSubmission.id == row.id, IRSSubmission.status == 'sending',
+                   IRSSubmission.claimed_by == self.name)
+            .values(**values)
+        )
+        db.commit()
+        if outcome.rowcount and values['status'] in ('submitted', 'failed'):
+            log_admin_action(f"IRS_SUBMISSION_{values['status'].upper()}",
+                             f"message_id={row.message_id} filing_id={row.filing_id} attempts={row.attempts}"
+                             + (f" error={values['last_error']}" if values.get('last_error') else ''))
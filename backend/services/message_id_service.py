@@ -0,0 +1,106 @@
+"""
+IRS message IDs: ETIN (12) + ccyyddd (7) + an 8-character base-36 suffix.
+The suffix is a 3-character worker slot followed by a 5-character counter. Each
+process claims a slot for the day from the irs_message_id_slots table (unique per
+day), then counts up under a lock, so IDs never repeat across threads, processes or
+hosts: 46,656 slots a day, 60,466,176 IDs per slot, and a fresh slot when one runs out.
+Days are UTC, so every host agrees on them whatever its timezone.
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from models import SessionLocal, IRSMessageIdSlot
+
+BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+SLOT_CHARS = 3
+COUNTER_CHARS = 5
+MAX_SLOTS = 36 ** SLOT_CHARS
+MAX_COUNTER = 36 ** COUNTER_CHARS
+SLOT_CLAIM_ATTEMPTS = 20
+
+def to_base36(value, width):
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        chars.append(BASE36[digit])
+    if value:
+        raise ValueError(f"{width} base-36 characters cannot hold the value")
+    return ''.join(reversed(chars))
+
+def message_id_day(moment):
+    """ccyyddd for an aware datetime, in UTC"""
+    moment = moment.astimezone(timezone.utc)
+    return f"{moment.year}{moment.timetuple().tm_yday:03d}"
+
+def claim_message_id_slot(day):
+    """Next free slot for `day` (ccyyddd); the unique (day, slot) constraint settles races"""
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    db = SessionLocal()
+    try:
+        for _ in range(SLOT_CLAIM_ATTEMPTS):
+            highest = db.query(func.max(IRSMessageIdSlot.slot)).filter(IRSMessageIdSlot.day == day).scalar()
+            slot = 0 if highest is None else highest + 1
+            if slot >= MAX_SLOTS:
+                raise RuntimeError(f"All {MAX_SLOTS} message ID slots for {day} are taken")
+            db.add(IRSMessageIdSlot(day=day, slot=slot, owner=owner, claimed_at=datetime.utcnow()))
+            try:
+                db.commit()
+                return slot
+            except IntegrityError:
+                db.rollback()  # another process took it first
+        raise RuntimeError(f"Could not claim a message ID slot for {day}")
+    finally:
+        db.close()
+
+def release_old_message_id_slots(day):
+    """
+    Drop slot claims from before `day`; IDs carry the date, so old slots can never clash.
+    Callers pass the day before the current one: a host whose clock lags a little is
+    still handing out IDs for yesterday, and must not start over at slot 0.
+    """
+    db = SessionLocal()
+    try:
+        db.query(IRSMessageIdSlot).filter(IRSMessageIdSlot.day < day).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+class MessageIdGenerator:
+    """Thread-safe generator; claims a new slot on a new day, after a fork, or when the counter runs out"""
+
+    def __init__(self, claim_slot=claim_message_id_slot):
+        self.claim_slot = claim_slot
+        self._lock = threading.Lock()
+        self._day = None
+        self._pid = None
+        self._slot = None
+        self._counter = 0
+
+    def next_id(self, etin):
+        now = datetime.now(timezone.utc)
+        day = message_id_day(now)
+        with self._lock:
+            if day != self._day or self._pid != os.getpid() or self._counter >= MAX_COUNTER:
+                new_day = day != self._day
+                self._slot = self.claim_slot(day)
+                self._day = day
+                self._pid = os.getpid()
+                self._counter = 0
+                if new_day and self.claim_slot is claim_message_id_slot:
+                    release_old_message_id_slots(message_id_day(now - timedelta(days=1)))
+            counter = self._counter
+            self._counter += 1
+            slot = self._slot
+        return f"{etin}{day}{to_base36(slot, SLOT_CHARS)}{to_base36(counter, COUNTER_CHARS)}"
+
+_generator = MessageIdGenerator()
+
+def generate_message_id(etin: str) -> str:
+    """
+    Generate unique message ID
+    Format: ETIN (12 digits) + ccyyddd (7 digits) + 8-character alphanumeric
+    """
+    return _generator.next_id(etin)
@@ -0,0 +1,411 @@
+"""
+Per-route request metrics shared across gunicorn workers.
+Each worker keeps histograms in memory and periodically writes a snapshot to
+'<METRICS_DIR>/worker-<pid>.json'. /metrics sums every worker's file; files left by
+workers that have exited are folded into 'merged.json' so counters never go backwards.
+Stage spans (utils.tracing) are summed per request and kept as a second set of series;
+per-route query counters from the engine hooks in models are a third.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from flask import request, g
+from config import Config
+from models import start_query_stats, clear_query_stats
+from utils.tracing import start_trace, clear_trace, server_timing
+from utils.auth_decorators import is_admin_email
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Upper bounds in seconds; PDF builds can legitimately take tens of seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+DB_COUNTERS = ('queries', 'seconds', 'slow_queries', 'n_plus_one')
+
+def _empty_series():
+    return {
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),  # last slot is +Inf
+        'count': 0,
+        'sum': 0.0,
+        'errors': 0,         # 5xx
+        'client_errors': 0,  # 4xx
+        'bytes': 0
+    }
+
+def _merge_into(target, source):
+    """Add one {'requests': {key: series}, 'stages': {...}} snapshot into another"""
+    if source and 'requests' not in source:
+        source = {'requests': source}  # flat snapshot from before stages were tracked
+    for section in ('requests', 'stages'):
+        _merge_series(target.setdefault(section, {}), source.get(section, {}))
+    db = target.setdefault('db', {})
+    for route, counters in source.get('db', {}).items():
+        existing = db.setdefault(route, dict.fromkeys(DB_COUNTERS, 0))
+        for field in DB_COUNTERS:
+            existing[field] += counters.get(field, 0)
+    return target
+
+def _merge_series(target, source):
+    for key, series in source.items():
+        existing = target.get(key)
+        if existing is None:
+            target[key] = existing = _empty_series()
+        existing['buckets'] = [a + b for a, b in zip(existing['buckets'], series['buckets'])]
+        for field in ('count', 'sum', 'errors', 'client_errors', 'bytes'):
+            existing[field] += series.get(field, 0)
+
+class RequestMetrics:
+    """In-process store for one worker, flushed to the shared directory"""
+
+    def __init__(self, directory, flush_interval=2.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.pid = None
+        self._series = {}
+        self._stages = {}
+        self._db = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flusher = None
+
+    def _ensure_started(self):
+        # gunicorn forks after import (preload_app), so the pid and thread are per worker
+        if self.pid == os.getpid():
+            return
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self._series = {}
+            self._stages = {}
+            self._db = {}
+            os.makedirs(self.directory, exist_ok=True)
+            # A file with our pid belongs to an older process that had the same pid
+            self._absorb_files([self._worker_path(self.pid)])
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _worker_path(self, pid):
+        return os.path.join(self.directory, f'worker-{pid}.json')
+
+    def observe(self, method, route, status, duration, bytes_out):
+        self._ensure_started()
+        index = bisect.bisect_left(LATENCY_BUCKETS, duration)  # first bound >= duration
+        key = f'{method} {route}'
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _empty_series()
+            series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += duration
+            series['bytes'] += bytes_out or 0
+            if status >= 500:
+                series['errors'] += 1
+            elif status >= 400:
+                series['client_errors'] += 1
+            self._dirty = True
+
+    def observe_stages(self, route, summary):
+        """Per-request totals of each traced stage ({stage: (seconds, calls)})"""
+        self._ensure_started()
+        with self._lock:
+            for stage, (duration, _) in summary.items():
+                key = f'{route} {stage}'
+                series = self._stages.get(key)
+                if series is None:
+                    series = self._stages[key] = _empty_series()
+                series['buckets'][bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+                series['count'] += 1
+                series['sum'] += duration
+            self._dirty = True
+
+    def observe_queries(self, route, stats, n_plus_one):
+        """Query count/time of one request (a models.QueryStats)"""
+        self._ensure_started()
+        with self._lock:
+            counters = self._db.get(route)
+            if counters is None:
+                counters = self._db[route] = dict.fromkeys(DB_COUNTERS, 0)
+            counters['queries'] += stats.count
+            counters['seconds'] += stats.seconds
+            counters['slow_queries'] += len(stats.slow)
+            counters['n_plus_one'] += 1 if n_plus_one else 0
+            self._dirty = True
+
+    def add_bytes(self, method, route, bytes_out):
+        """Bytes of a streamed body, known only once it has been sent"""
+        key = f'{method} {route}'
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                series['bytes'] += bytes_out
+                self._dirty = True
+
+    def flush(self):
+        """Write this worker's snapshot if anything changed"""
+        with self._lock:
+            if not self._dirty or self.pid is None:
+                return
+            snapshot = json.dumps({'requests': self._series, 'stages': self._stages, 'db': self._db})
+            self._dirty = False
+        path = self._worker_path(self.pid)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, path)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: metrics flush failed: {e}")
+
+    def _absorb_files(self, paths):
+        """Fold worker files into merged.json and delete them"""
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            return
+        merged_path = os.path.join(self.directory, 'merged.json')
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            merged = _read_json(merged_path)
+            for path in paths:
+                _merge_into(merged, _read_json(path))
+            tmp_path = f'{merged_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, merged_path)
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def collect(self):
+        """Sum of every worker's series (flushing our own first)"""
+        self._ensure_started()
+        self.flush()
+        live, dead = [], []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('worker-') and name.endswith('.json')):
+                continue
+            path = os.path.join(self.directory, name)
+            pid = int(name[len('worker-'):-len('.json')])
+            (live if _pid_alive(pid) else dead).append(path)
+        if dead:
+            self._absorb_files(dead)
+        total = _merge_into({}, _read_json(os.path.join(self.directory, 'merged.json')))
+        for path in live:
+            _merge_into(total, _read_json(path))
+        return total
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def estimate_quantile(series, quantile):
+    """Quantile (seconds) interpolated within the histogram bucket that holds it"""
+    if not series['count']:
+        return None
+    rank = quantile * series['count']
+    seen = 0
+    lower = 0.0
+    for position, count in enumerate(series['buckets']):
+        upper = LATENCY_BUCKETS[position] if position < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+        if count and seen + count >= rank:
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+        lower = upper
+    return LATENCY_BUCKETS[-1]
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _histogram_lines(name, help_text, rows):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, series in rows:
+        cumulative = 0
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            cumulative += series['buckets'][position]
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+        lines.append(f'{name}_sum{{{labels}}} {series["sum"]:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {series["count"]}')
+    return lines
+
+def render_prometheus(snapshot, prefix='send2290'):
+    """Prometheus text exposition (format 0.0.4) for a collect() snapshot"""
+    requests_by_key = snapshot.get('requests', {})
+    rows = []
+    for key in sorted(requests_by_key):
+        method, _, route = key.partition(' ')
+        rows.append((f'method="{_escape(method)}",route="{_escape(route)}"', requests_by_key[key]))
+    lines = _histogram_lines(f'{prefix}_http_request_duration_seconds', 'Request latency by route', rows)
+
+    counters = (
+        ('http_request_errors_total', 'errors', 'Responses with a 5xx status'),
+        ('http_request_client_errors_total', 'client_errors', 'Responses with a 4xx status'),
+        ('http_response_bytes_total', 'bytes', 'Response body bytes sent')
+    )
+    for name, field, help_text in counters:
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        lines.append(f'# TYPE {prefix}_{name} counter')
+        for labels, series in rows:
+            lines.append(f'{prefix}_{name}{{{labels}}} {series[field]}')
+
+    # Convenience gauges for dashboards without histogram_quantile()
+    lines.append(f'# HELP {prefix}_http_request_duration_quantile_seconds Latency quantiles estimated from the histogram (since start)')
+    lines.append(f'# TYPE {prefix}_http_request_duration_quantile_seconds gauge')
+    for labels, series in rows:
+        for quantile in QUANTILES:
+            value = estimate_quantile(series, quantile)
+            if value is not None:
+                lines.append(f'{prefix}_http_request_duration_quantile_seconds{{{labels},quantile="{quantile}"}} {value:.6f}')
+    lines.append(f'# HELP {prefix}_http_request_error_ratio Share of responses with a 5xx status (since start)')
+    lines.append(f'# TYPE {prefix}_http_request_error_ratio gauge')
+    for labels, series in rows:
+        if series['count']:
+            lines.append(f'{prefix}_http_request_error_ratio{{{labels}}} {series["errors"] / series["count"]:.6f}')
+
+    stages_by_key = snapshot.get('stages', {})
+    stage_rows = []
+    for key in sorted(stages_by_key):
+        route, _, stage = key.partition(' ')
+        stage_rows.append((f'route="{_escape(route)}",stage="{_escape(stage)}"', stages_by_key[key]))
+    lines.extend(_histogram_lines(f'{prefix}_stage_duration_seconds',
+                                  'Time per request spent in each traced stage', stage_rows))
+
+    db_by_route = snapshot.get('db', {})
+    db_counters = (
+        ('db_queries_total', 'queries', 'SQL statements executed while handling requests'),
+        ('db_query_seconds_total', 'seconds', 'Time spent in SQL statements'),
+        ('db_slow_queries_total', 'slow_queries', 'Statements slower than DB_SLOW_QUERY_MS'),
+        ('db_n_plus_one_requests_total', 'n_plus_one', 'Requests that repeated one statement shape more than DB_N_PLUS_ONE_THRESHOLD times')
+    )
+    for name, field, help_text in db_counters:
+        lines.append(f'# HELP {prefix}_{name} {help_text}')
+        lines.append(f'# TYPE {prefix}_{name} counter')
+        for route in sorted(db_by_route):
+            value = db_by_route[route][field]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{prefix}_{name}{{route="{_escape(route)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_request_metrics():
+    """Process-wide RequestMetrics store"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = RequestMetrics(Config.METRICS_DIR, Config.METRICS_FLUSH_INTERVAL)
+    return _metrics
+
+def _counting_iterable(iterable, method, route, metrics):
+    sent = 0
+    try:
+        for chunk in iterable:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        metrics.add_bytes(method, route, sent)
+        close = getattr(iterable, 'close', None)
+        if close:
+            close()
+
+def _record_query_stats(metrics, stats, route, method, user, response, audit_logger):
+    """Export one request's query stats and report slow statements / N+1 patterns"""
+    repeated = stats.repeated(Config.DB_N_PLUS_ONE_THRESHOLD)
+    metrics.observe_queries(route, stats, bool(repeated))
+
+    if Config.DB_DEBUG_HEADER == 'all' or (Config.DB_DEBUG_HEADER == 'admin' and is_admin_email(user.get('email'))):
+        max_repeat = stats.shapes.most_common(1)[0][1]
+        response.headers['X-DB-Queries'] = (
+            f'count={stats.count}, time_ms={stats.seconds * 1000:.1f}, max_repeat={max_repeat}'
+        )
+
+    if audit_logger is None:
+        return
+    email = user.get('email', 'anonymous')
+    for statement, seconds in stats.slow:
+        audit_logger.log_performance_event('SLOW_QUERY', route, method, email, int(seconds * 1000), statement)
+    for shape, count in repeated:
+        audit_logger.log_performance_event('N_PLUS_ONE', route, method, email, int(stats.seconds * 1000),
+                                           f'{count}x {shape}')
+
+def init_request_metrics(app, audit_logger=None):
+    """Time every request and record it per route (url rule, not raw path, to bound cardinality)"""
+    if not Config.METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if Config.TRACING_ENABLED:
+            g.request_trace = start_trace()
+        if Config.DB_QUERY_STATS_ENABLED:
+            g.query_stats = start_query_stats()
+
+    @app.teardown_request
+    def end_request_trace(exc=None):
+        clear_trace()
+        clear_query_stats()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+        metrics = get_request_metrics()
+
+        if response.is_streamed:
+            metrics.observe(method, route, response.status_code, duration, 0)
+            response.response = _counting_iterable(response.response, method, route, metrics)
+        else:
+            metrics.observe(method, route, response.status_code, duration, response.content_length)
+
+        trace = g.pop('request_trace', None)
+        stages = trace.summary() if trace is not None and trace.spans else None
+        user = getattr(request, 'user', None) or {}
+        if stages:
+            metrics.observe_stages(route, stages)
+            if Config.TRACE_SERVER_TIMING and is_admin_email(user.get('email')):
+                response.headers['Server-Timing'] = server_timing(stages, duration)
+
+        query_stats = g.pop('query_stats', None)
+        if query_stats is not None and query_stats.count:
+            _record_query_stats(metrics, query_stats, route, method, user, response, audit_logger)
+
+        duration_ms = int(duration * 1000)
+        if audit_logger is not None and duration_ms >= Config.METRICS_SLOW_REQUEST_MS:
+            audit_logger.log_api_usage(
+                user.get('email', 'anonymous'), route, method, response.status_code, duration_ms,
+                stages=stages
+            )
+        return response
@@ -1,5 +1,6 @@
 """Payment tracking service for reusing payments between preview and submission"""
 import datetime
+from sqlalchemy.exc import IntegrityError
 from models import SessionLocal, PaymentIntent
 from services.audit_service import log_admin_action
 
@@ -40,6 +41,47 @@ class PaymentTrackingService:
         finally:
             db.close()
     
+    @staticmethod
+    def apply_stripe_status(payment_intent_id, user_uid, amount_cents, status):
+        """
+        Record the status a Stripe webhook reported. Events can arrive late, twice or out
+        of order, so a succeeded payment is never moved back; returns the stored status
+        """
+        db = SessionLocal()
+        try:
+            payment_record = db.query(PaymentIntent).filter(
+                PaymentIntent.payment_intent_id == payment_intent_id
+            ).first()
+            
+            if payment_record is None:
+                payment_record = PaymentIntent(
+                    payment_intent_id=payment_intent_id,
+                    user_uid=user_uid,
+                    amount_cents=amount_cents,
+                    status=status
+                )
+                db.add(payment_record)
+            elif payment_record.status != 'succeeded':
+                payment_record.status = status
+                payment_record.user_uid = payment_record.user_uid or user_uid
+                payment_record.amount_cents = amount_cents or payment_record.amount_cents
+                payment_record.updated_at = datetime.datetime.utcnow()
+            stored = payment_record.status
+            
+            try:
+                db.commit()
+            except IntegrityError:
+                # create-payment-intent recorded the same intent meanwhile - update that row
+                db.rollback()
+                return PaymentTrackingService.apply_stripe_status(payment_intent_id, user_uid, amount_cents, status)
+            return stored
+            
+        except Exception as e:
+            db.rollback()
+            raise e
+        finally:
+            db.close()
+    
     @staticmethod
     def mark_used_for_preview(payment_intent_id, user_uid):
         """Mark a payment as used for preview"""
@@ -2,20 +2,38 @@
 import os
 import io
 import datetime
+import threading
 from PyPDF2 import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from config import Config
-from utils.form_positions import load_form_positions, get_fields_for_page
+from utils.form_positions import get_form_positions, get_fields_for_page
 from utils.calculations import group_vehicles_by_month, calculate_vehicle_statistics, add_dynamic_vin_fields
-from services.s3_service import get_s3_client, upload_to_s3
+from services.storage_service import submit_upload
 from models import SessionLocal, Submission, FilingsDocument
+from utils.tracing import span, traced
 from xml_builder import build_2290_xml
 import json
 
+_template_bytes = {}
+_template_lock = threading.Lock()
+
+def load_template_bytes(path=None):
+    """
+    The blank 2290 template, read from disk once per process. With gunicorn's
+    preload_app this happens in the master, so every worker shares the same pages.
+    """
+    path = os.path.abspath(path or os.path.join(os.path.dirname(__file__), "..", Config.TEMPLATE_PDF_FILE))
+    if path not in _template_bytes:
+        with _template_lock:
+            if path not in _template_bytes:
+                with open(path, "rb") as f:
+                    _template_bytes[path] = f.read()
+    return _template_bytes[path]
+
 class PDFGenerationService:
     def __init__(self):
-        self.form_positions = load_form_positions()
+        self.form_positions = get_form_positions()
         self.template_path = os.path.join(os.path.dirname(__file__), "..", Config.TEMPLATE_PDF_FILE)
         
     def generate_pdf_for_submission(self, data, user_uid):
@@ -34,30 +52,29 @@ class PDFGenerationService:
             raise ValueError("No vehicles found")
         
         created_files = []
+        upload_futures = []
         db = SessionLocal()
-        s3 = get_s3_client()
         
         try:
-            # Process each month separately
+            # Process each month separately - uploads run on the I/O pool while
+            # the next PDF renders, and are all joined before we return
             for month, month_vehicles in vehicles_by_month.items():
                 print(f"📅 Processing month {month} with {len(month_vehicles)} vehicles")
                 
                 # Create month-specific data
-                month_data = self._prepare_month_data(data, month, month_vehicles)
+                with span('pdf.prepare_month'):
+                    month_data = self._prepare_month_data(data, month, month_vehicles)
                 
                 # Generate XML first
                 xml_content = build_2290_xml(month_data)
                 xml_key = f"{user_uid}/{month}/form2290.xml"
                 
-                # Upload XML to S3
-                upload_success, error_msg = upload_to_s3(
+                # Upload XML to storage in the background
+                upload_futures.append((month, 'xml', submit_upload(
                     xml_content.encode('utf-8') if isinstance(xml_content, str) else xml_content,
                     xml_key,
                     'application/xml'
-                )
-                
-                if not upload_success:
-                    print(f"Warning: XML upload failed for month {month}: {error_msg}")
+                )))
                 
                 # Create submission record
                 submission = Submission(
@@ -67,8 +84,9 @@ class PDFGenerationService:
                     form_data=json.dumps(data)
                 )
                 db.add(submission)
-                db.commit()
-                db.refresh(submission)
+                with span('db.commit'):
+                    db.commit()
+                    db.refresh(submission)
                 filing_id = submission.id
                 
                 # Add XML document record
@@ -79,26 +97,25 @@ class PDFGenerationService:
                     s3_key=xml_key,
                     uploaded_at=datetime.datetime.utcnow()
                 ))
-                db.commit()
+                with span('db.commit'):
+                    db.commit()
                 
                 # Generate PDF
                 pdf_path = self._generate_pdf_for_month(month_data, month)
                 
-                # Upload PDF to S3
+                # Upload PDF to storage in the background
                 pdf_key = f"{user_uid}/{month}/form2290.pdf"
                 with open(pdf_path, 'rb') as pdf_file:
-                    pdf_upload_success, pdf_error = upload_to_s3(
+                    upload_futures.append((month, 'pdf', submit_upload(
                         pdf_file.read(),
                         pdf_key,
                         'application/pdf'
-                    )
-                
-                if not pdf_upload_success:
-                    print(f"Warning: PDF upload failed for month {month}: {pdf_error}")
+                    )))
                 
                 # Update submission with PDF key
                 submission.pdf_s3_key = pdf_key
-                db.commit()
+                with span('db.commit'):
+                    db.commit()
                 
                 # Add PDF document record
                 db.add(FilingsDocument(
@@ -108,7 +125,8 @@ class PDFGenerationService:
                     s3_key=pdf_key,
                     uploaded_at=datetime.datetime.utcnow()
                 ))
-                db.commit()
+                with span('db.commit'):
+                    db.commit()
                 
                 created_files.append({
                     'month': month,
@@ -122,9 +140,27 @@ class PDFGenerationService:
             raise e
         finally:
             db.close()
+            # Never leave uploads running past the request, even on failure
+            with span('storage.upload_wait'):
+                uploads_by_month = self._join_uploads(upload_futures)
+        
+        for file_info in created_files:
+            file_info['uploads'] = uploads_by_month.get(file_info['month'], [])
         
         return created_files
     
+    def _join_uploads(self, upload_futures):
+        """Wait for queued uploads and group their results by month"""
+        uploads_by_month = {}
+        for month, document_type, future in upload_futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'key': None, 'success': False, 'error': str(e)}
+            result['document_type'] = document_type
+            uploads_by_month.setdefault(month, []).append(result)
+        return uploads_by_month
+    
     def _prepare_month_data(self, data, month, month_vehicles):
         """Prepare form data for a specific month"""
         month_data = data.copy()
@@ -217,9 +253,10 @@ class PDFGenerationService:
         
         return month_data
     
+    @traced('pdf.render')
     def _generate_pdf_for_month(self, month_data, month):
         """Generate PDF for a specific month"""
-        template = PdfReader(open(self.template_path, "rb"), strict=False)
+        template = PdfReader(io.BytesIO(load_template_bytes(self.template_path)), strict=False)
         writer = PdfWriter()
         
         # Process each page
@@ -228,7 +265,8 @@ class PDFGenerationService:
             template_page = template.pages[page_num - 1]
             
             if overlay:
-                template_page.merge_page(overlay)
+                with span('pdf.merge'):
+                    template_page.merge_page(overlay)
             
             writer.add_page(template_page)
         
@@ -237,11 +275,12 @@ class PDFGenerationService:
         os.makedirs(out_dir, exist_ok=True)
         out_path = os.path.join(out_dir, f"form2290_{month}.pdf")
         
-        with open(out_path, "wb") as f:
+        with open(out_path, "wb") as f, span('pdf.write'):
             writer.write(f)
         
         return out_path
     
+    @traced('pdf.overlay')
     def _create_page_overlay(self, page_num, month_data, month):
         """Create overlay for a specific page with form fields"""
         packet = io.BytesIO()
@@ -1013,9 +1052,10 @@ class PDFGenerationService:
         
         return created_previews
 
+    @traced('pdf.render')
     def _generate_preview_pdf_for_month(self, month_data, month):
         """Generate preview PDF for a specific month (separate from main generation)"""
-        template = PdfReader(open(self.template_path, "rb"), strict=False)
+        template = PdfReader(io.BytesIO(load_template_bytes(self.template_path)), strict=False)
         writer = PdfWriter()
         
         # Process each page
@@ -1024,7 +1064,8 @@ class PDFGenerationService:
             template_page = template.pages[page_num - 1]
             
             if overlay:
-                template_page.merge_page(overlay)
+                with span('pdf.merge'):
+                    template_page.merge_page(overlay)
             
             writer.add_page(template_page)
         
@@ -1033,7 +1074,7 @@ class PDFGenerationService:
         os.makedirs(out_dir, exist_ok=True)
         out_path = os.path.join(out_dir, f"preview_form2290_{month}.pdf")
         
-        with open(out_path, "wb") as f:
+        with open(out_path, "wb") as f, span('pdf.write'):
             writer.write(f)
         
         return out_path
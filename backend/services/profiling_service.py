@@ -0,0 +1,257 @@
+"""
+On-demand request profiling.
+An admin adds 'X-Profile: sample' (stack sampler) or 'X-Profile: cprofile' to any
+request; the profile is saved under PROFILE_DIR and its id returned in X-Profile-Id
+for /admin/profiles/<id>. Only one cProfile session runs per process at a time; a
+request asking for one meanwhile gets the stack sampler. PROFILE_SAMPLE_EVERY
+additionally samples 1 in N requests to PROFILE_SAMPLE_ROUTES. Sampler output is in
+collapsed-stack form ('frame;frame;frame count'), which flamegraph.pl and speedscope
+read directly.
+"""
+import cProfile
+import io
+import itertools
+import json
+import marshal
+import os
+import pstats
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from flask import request, g
+from config import Config
+from utils.auth_decorators import get_request_admin
+
+PROFILE_MODES = ('sample', 'cprofile')
+PROFILE_ID_RE = re.compile(r'^[0-9]{10}-[0-9a-f]{8}$')
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_qualname}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Collapsed-stack text, heaviest stacks first"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+class ProfileStore:
+    """Profiles as '<id>.json' metadata plus a data file, shared by all workers"""
+
+    def __init__(self, directory, max_profiles=200):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, f'{profile_id}{suffix}')
+
+    def save(self, meta, data, suffix):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f'{int(time.time()):010d}-{secrets.token_hex(4)}'
+        meta = dict(meta, id=profile_id, data_file=f'{profile_id}{suffix}')
+        with open(self._path(profile_id, suffix), 'wb') as f:
+            f.write(data)
+        # Metadata last: a profile is listed only once its data is complete
+        tmp_path = self._path(profile_id, '.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(profile_id, '.json'))
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        ids = self._ids()
+        for profile_id in ids[:-self.max_profiles] if len(ids) > self.max_profiles else []:
+            for name in os.listdir(self.directory):
+                if name.startswith(profile_id):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def _ids(self):
+        """Profile ids, oldest first (ids start with the creation time)"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len('.json')] for name in os.listdir(self.directory)
+                      if name.endswith('.json') and PROFILE_ID_RE.match(name[:-len('.json')]))
+
+    def get_meta(self, profile_id):
+        if not PROFILE_ID_RE.match(profile_id or ''):
+            return None
+        try:
+            with open(self._path(profile_id, '.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def data_path(self, meta):
+        return os.path.join(self.directory, meta['data_file'])
+
+    def list(self, limit=50):
+        """Newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            meta = self.get_meta(profile_id)
+            if meta:
+                profiles.append(meta)
+            if len(profiles) >= limit:
+                break
+        return profiles
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_profile_store():
+    """Process-wide ProfileStore"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProfileStore(Config.PROFILE_DIR, Config.PROFILE_MAX_FILES)
+    return _store
+
+def pstats_text(path, limit=80):
+    """Readable cProfile report sorted by cumulative time"""
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+# One cProfile session per process: from Python 3.12 a second Profile().enable() while
+# another is active (another gthread request) raises ValueError
+_cprofile_lock = threading.Lock()
+
+class _ActiveProfile:
+    __slots__ = ('mode', 'source', 'user', 'started', 'profiler', 'sampler', '_holds_cprofile')
+
+    def __init__(self, mode, source, user):
+        self.mode = mode
+        self.source = source
+        self.user = user
+        self.started = time.perf_counter()
+        self.profiler = None
+        self.sampler = None
+        self._holds_cprofile = False
+        if mode == 'cprofile':
+            self.profiler = self._start_cprofile()
+            self._holds_cprofile = self.profiler is not None
+            if self.profiler is None:
+                self.mode = 'sample'  # busy: the stack sampler only looks at this thread
+        if self.profiler is None:
+            self.sampler = StackSampler(threading.get_ident(), Config.PROFILE_SAMPLE_INTERVAL_MS / 1000.0)
+            self.sampler.start()
+
+    @staticmethod
+    def _start_cprofile():
+        """An enabled Profile, or None while another request in this process holds one"""
+        if not _cprofile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # some other tool (debugger, coverage) is profiling
+            _cprofile_lock.release()
+            return None
+        return profiler
+
+    def stop(self):
+        if self.profiler is not None:
+            if self._holds_cprofile:
+                self._holds_cprofile = False
+                self.profiler.disable()
+                _cprofile_lock.release()
+        else:
+            self.sampler.stop()
+
+    def finish(self, status):
+        duration = time.perf_counter() - self.started
+        meta = {
+            'mode': self.mode,
+            'source': self.source,
+            'user': self.user,
+            'method': request.method,
+            'path': request.path,
+            'route': request.url_rule.rule if request.url_rule else None,
+            'status': status,
+            'duration_ms': round(duration * 1000, 1),
+            'created': time.time(),
+            'pid': os.getpid()
+        }
+        self.stop()
+        if self.profiler is not None:
+            self.profiler.create_stats()
+            # Same bytes as Profile.dump_stats(), so snakeviz/pstats can open the file
+            return get_profile_store().save(meta, marshal.dumps(self.profiler.stats), '.prof')
+        meta['samples'] = self.sampler.samples
+        meta['interval_ms'] = Config.PROFILE_SAMPLE_INTERVAL_MS
+        return get_profile_store().save(meta, self.sampler.collapsed().encode('utf-8'), '.collapsed')
+
+def init_request_profiling(app):
+    """Profile admin-requested (X-Profile header) and 1-in-N sampled requests"""
+    if not Config.PROFILING_ENABLED:
+        return
+    sample_every = Config.PROFILE_SAMPLE_EVERY
+    sample_routes = set(Config.PROFILE_SAMPLE_ROUTES)
+    request_counter = itertools.count(1)
+
+    @app.before_request
+    def start_request_profile():
+        requested = request.headers.get('X-Profile')
+        if requested and request.method != 'OPTIONS':
+            admin = get_request_admin()
+            if admin is not None:
+                mode = requested.lower() if requested.lower() in PROFILE_MODES else 'sample'
+                g.request_profile = _ActiveProfile(mode, 'admin', admin.get('email'))
+                return
+        if sample_every and request.url_rule is not None and request.url_rule.rule in sample_routes \
+                and request.method != 'OPTIONS' and next(request_counter) % sample_every == 0:
+            g.request_profile = _ActiveProfile('sample', 'sampled', None)
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        try:
+            profile_id = profile.finish(response.status_code)
+            if profile.source == 'admin':
+                response.headers['X-Profile-Id'] = profile_id
+        except Exception as e:
+            print(f"Warning: failed to save request profile: {e}")
+        return response
+
+    @app.teardown_request
+    def stop_request_profile(exc=None):
+        # Only left over if after_request never ran
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.stop()
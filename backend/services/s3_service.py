@@ -1,17 +1,58 @@
 """S3 service for file operations"""
-import boto3
-from botocore.exceptions import ClientError
+import threading
+import time
 from config import Config
+from utils.tracing import traced
 
-def get_s3_client():
-    """Get configured S3 client"""
+# Shared client - boto3 clients are thread-safe once created, and building one
+# loads the botocore service model, so we only pay for it once per process.
+# boto3 itself is imported then too, keeping it out of app start-up.
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+# Short-lived cache of issued presigned URLs: (bucket, key, expiration) -> (url, cached_until)
+_presigned_url_cache = {}
+_presigned_url_lock = threading.Lock()
+
+def _build_s3_client():
+    """Build an S3 client with pooled keep-alive connections and retry/timeout config"""
+    import boto3
+    from botocore.config import Config as BotoConfig
+    
+    boto_config = BotoConfig(
+        max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS,
+        connect_timeout=Config.S3_CONNECT_TIMEOUT,
+        read_timeout=Config.S3_READ_TIMEOUT,
+        tcp_keepalive=True,
+        retries={
+            'max_attempts': Config.S3_MAX_ATTEMPTS,
+            'mode': 'standard'
+        }
+    )
     return boto3.client(
         's3',
         aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
-        region_name=Config.AWS_DEFAULT_REGION
+        region_name=Config.AWS_DEFAULT_REGION,
+        config=boto_config
     )
 
+def get_s3_client():
+    """Get the shared S3 client, creating it on first use"""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = _build_s3_client()
+    return _s3_client
+
+def reset_s3_client():
+    """Drop the shared S3 client so the next call builds a fresh one (e.g. after fork)"""
+    global _s3_client
+    with _s3_client_lock:
+        _s3_client = None
+
+@traced('s3.put')
 def upload_to_s3(file_content, key, content_type=None, bucket=None):
     """Upload file content to S3"""
     try:
@@ -35,6 +76,7 @@ def upload_to_s3(file_content, key, content_type=None, bucket=None):
     except Exception as e:
         return False, str(e)
 
+@traced('s3.get')
 def download_from_s3(key, bucket=None):
     """Download file from S3"""
     try:
@@ -46,6 +88,25 @@ def download_from_s3(key, bucket=None):
     except Exception as e:
         return False, str(e)
 
+@traced('s3.open')
+def open_s3_object(key, byte_range=None, if_none_match=None, bucket=None):
+    """
+    Open an S3 object without reading its body so callers can stream it.
+    Raises ClientError (e.g. 304 NotModified, 416 InvalidRange) for the caller to map.
+    """
+    s3 = get_s3_client()
+    params = {
+        'Bucket': bucket or Config.get_bucket_name(),
+        'Key': key
+    }
+    if byte_range:
+        params['Range'] = byte_range
+    if if_none_match:
+        params['IfNoneMatch'] = if_none_match
+    
+    return s3.get_object(**params)
+
+@traced('s3.delete')
 def delete_from_s3(key, bucket=None):
     """Delete file from S3"""
     try:
@@ -57,21 +118,53 @@ def delete_from_s3(key, bucket=None):
     except Exception as e:
         return False, str(e)
 
-def generate_presigned_url(key, expiration=3600, bucket=None):
+def generate_presigned_url(key, expiration=3600, bucket=None, content_type=None, content_disposition=None):
     """Generate presigned URL for S3 object"""
     try:
         s3 = get_s3_client()
         bucket_name = bucket or Config.get_bucket_name()
         
+        params = {'Bucket': bucket_name, 'Key': key}
+        if content_type:
+            params['ResponseContentType'] = content_type
+        if content_disposition:
+            params['ResponseContentDisposition'] = content_disposition
+        
         url = s3.generate_presigned_url(
             'get_object',
-            Params={'Bucket': bucket_name, 'Key': key},
+            Params=params,
             ExpiresIn=expiration
         )
         return True, url
     except Exception as e:
         return False, str(e)
 
+def get_cached_presigned_url(key, expiration=900, bucket=None):
+    """
+    Presign a GET URL, reusing a recently issued one for the same object.
+    Cached URLs are handed out for at most half their lifetime so clients never get a stale link.
+    """
+    cache_key = (bucket or Config.get_bucket_name(), key, expiration)
+    ttl = min(Config.PRESIGNED_URL_CACHE_TTL, expiration // 2)
+    now = time.monotonic()
+    
+    with _presigned_url_lock:
+        cached = _presigned_url_cache.get(cache_key)
+        if cached and cached[1] > now:
+            return True, cached[0]
+    
+    success, url = generate_presigned_url(key, expiration=expiration, bucket=bucket)
+    if success and ttl > 0:
+        with _presigned_url_lock:
+            if len(_presigned_url_cache) >= Config.PRESIGNED_URL_CACHE_MAX_ENTRIES:
+                # Drop expired entries first, then the oldest if still full
+                for k in [k for k, v in _presigned_url_cache.items() if v[1] <= now]:
+                    del _presigned_url_cache[k]
+                if len(_presigned_url_cache) >= Config.PRESIGNED_URL_CACHE_MAX_ENTRIES:
+                    del _presigned_url_cache[next(iter(_presigned_url_cache))]
+            _presigned_url_cache[cache_key] = (url, now + ttl)
+    return success, url
+
 def test_s3_connection(bucket=None):
     """Test S3 connectivity"""
     try:
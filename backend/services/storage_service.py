@@ -0,0 +1,497 @@
+"""
+Pluggable file storage backends.
+S3 in production; a local-filesystem backend for dev mode and offline benchmarks;
+an in-memory backend for load tests and CI. Selected by Config.STORAGE_BACKEND.
+"""
+import hashlib
+import hmac
+import io
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote, urlencode
+from config import Config
+from utils.tracing import span, bind_trace
+
+class StorageError(Exception):
+    """Base error for storage backend failures"""
+
+class ObjectNotFound(StorageError):
+    """The requested key does not exist"""
+
+class NotModified(StorageError):
+    """If-None-Match matched the stored ETag"""
+
+class InvalidRange(StorageError):
+    """The requested byte range cannot be satisfied"""
+
+class StoredObject:
+    """An opened object whose body can be streamed chunk by chunk"""
+
+    def __init__(self, body, content_length, content_type=None, etag=None,
+                 last_modified=None, content_range=None):
+        self.body = body
+        self.content_length = content_length
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_range = content_range
+
+    def iter_chunks(self, chunk_size=64 * 1024):
+        """Yield the body in chunks, closing it when done"""
+        try:
+            while True:
+                chunk = self.body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.body.close()
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def _resolve_range(byte_range, size):
+    """Turn a single 'bytes=a-b' header into inclusive (start, end) offsets"""
+    match = _RANGE_RE.match(byte_range or '')
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    start, end = match.group(1), match.group(2)
+    if not start:
+        # Suffix range - the last N bytes
+        length = int(end)
+        if length == 0:
+            raise InvalidRange(byte_range)
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise InvalidRange(byte_range)
+    return start, end
+
+class _LimitedReader:
+    """File wrapper that stops after a fixed number of bytes (for ranged reads)"""
+
+    def __init__(self, fileobj, remaining):
+        self.fileobj = fileobj
+        self.remaining = remaining
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fileobj.close()
+
+# Backends whose presign() hands out /storage/files links (routes/storage.py)
+SELF_SIGNED_BACKENDS = ('local', 'memory')
+
+def _storage_signature(key, expires):
+    if not Config.STORAGE_SIGNING_KEY:
+        raise StorageError("STORAGE_SIGNING_KEY is not configured")
+    return hmac.new(
+        Config.STORAGE_SIGNING_KEY.encode('utf-8'),
+        f"{key}:{expires}".encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+def sign_storage_url(key, expiration):
+    """Build an HMAC-signed /storage/files URL for backends that can't presign themselves"""
+    expires = int(time.time()) + int(expiration)
+    signature = _storage_signature(key, expires)
+    path = f"/storage/files/{quote(key, safe='')}?{urlencode({'expires': expires, 'signature': signature})}"
+
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return request.host_url.rstrip('/') + path
+    except ImportError:
+        pass
+    return path
+
+def verify_storage_signature(key, expires, signature):
+    """Check a signature produced by sign_storage_url"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time() or not Config.STORAGE_SIGNING_KEY:
+        return False
+    return hmac.compare_digest(_storage_signature(key, expires), signature or '')
+
+class StorageBackend:
+    """Interface every storage backend implements"""
+
+    name = 'base'
+
+    def put(self, key, data, content_type=None):
+        """Store bytes (or str) under key"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """Return the full contents of key as bytes"""
+        raise NotImplementedError
+
+    def open(self, key, byte_range=None, if_none_match=None):
+        """Open key for streaming; raises ObjectNotFound / NotModified / InvalidRange"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Delete key (missing keys are not an error)"""
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        """Delete several keys; returns {key: error} for the ones that failed"""
+        errors = {}
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception as e:
+                errors[key] = str(e)
+        return errors
+
+    def presign(self, key, expiration=900, content_type=None, content_disposition=None):
+        """Return a time-limited download URL for key"""
+        return sign_storage_url(key, expiration)
+
+    def list(self, prefix='', limit=1000):
+        """List up to limit objects as {'key', 'size', 'last_modified'} dicts"""
+        raise NotImplementedError
+
+class S3StorageBackend(StorageBackend):
+    """Amazon S3 via the shared boto3 client"""
+
+    name = 's3'
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket or Config.get_bucket_name()
+
+    def put(self, key, data, content_type=None):
+        from services.s3_service import upload_to_s3
+        success, result = upload_to_s3(data, key, content_type, self.bucket)
+        if not success:
+            raise StorageError(result)
+
+    def get(self, key):
+        stored = self.open(key)
+        try:
+            return stored.body.read()
+        finally:
+            stored.body.close()
+
+    def open(self, key, byte_range=None, if_none_match=None):
+        from botocore.exceptions import ClientError
+        from services.s3_service import open_s3_object
+        try:
+            response = open_s3_object(key, byte_range=byte_range, if_none_match=if_none_match, bucket=self.bucket)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status == 304 or code in ('304', 'NotModified'):
+                raise NotModified(key)
+            if status == 416 or code == 'InvalidRange':
+                raise InvalidRange(byte_range)
+            if status == 404 or code in ('404', 'NoSuchKey'):
+                raise ObjectNotFound(key)
+            raise StorageError(str(e))
+
+        return StoredObject(
+            response['Body'],
+            response.get('ContentLength'),
+            content_type=response.get('ContentType'),
+            etag=response.get('ETag'),
+            last_modified=response.get('LastModified'),
+            content_range=response.get('ContentRange')
+        )
+
+    def delete(self, key):
+        from services.s3_service import delete_from_s3
+        success, message = delete_from_s3(key, self.bucket)
+        if not success:
+            raise StorageError(message)
+
+    def delete_many(self, keys):
+        from services.s3_service import get_s3_client
+        s3 = get_s3_client()
+        keys = list(keys)
+        errors = {}
+        # DeleteObjects accepts at most 1000 keys per call
+        for i in range(0, len(keys), 1000):
+            batch = keys[i:i + 1000]
+            try:
+                response = s3.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                for error in response.get('Errors', []):
+                    errors[error.get('Key')] = error.get('Message', error.get('Code', 'Unknown error'))
+            except Exception as e:
+                for key in batch:
+                    errors[key] = str(e)
+        return errors
+
+    def presign(self, key, expiration=900, content_type=None, content_disposition=None):
+        from services.s3_service import generate_presigned_url, get_cached_presigned_url
+        if content_type or content_disposition:
+            success, url = generate_presigned_url(
+                key, expiration=expiration, bucket=self.bucket,
+                content_type=content_type, content_disposition=content_disposition
+            )
+        else:
+            success, url = get_cached_presigned_url(key, expiration=expiration, bucket=self.bucket)
+        if not success:
+            raise StorageError(url)
+        return url
+
+    def list(self, prefix='', limit=1000):
+        from services.s3_service import get_s3_client
+        paginator = get_s3_client().get_paginator('list_objects_v2')
+        objects = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                objects.append({
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'last_modified': obj['LastModified']
+                })
+                if len(objects) >= limit:
+                    return objects
+        return objects
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Files on local disk under root, sharded two levels deep by key hash
+    (root/ab/cd/<quoted key>). Writes go to a temp file and are renamed into place.
+    """
+
+    name = 'local'
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or Config.LOCAL_STORAGE_ROOT)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        if key in ('', '.', '..'):
+            raise StorageError(f"Invalid storage key: {key!r}")
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], quote(key, safe=''))
+
+    @staticmethod
+    def _etag(stat):
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def put(self, key, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise StorageError(str(e))
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def open(self, key, byte_range=None, if_none_match=None):
+        path = self._path(key)
+        try:
+            fileobj = open(path, 'rb')
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+        try:
+            stat = os.fstat(fileobj.fileno())
+            etag = self._etag(stat)
+            if if_none_match and if_none_match.strip() in (etag, '*'):
+                raise NotModified(key)
+
+            size = stat.st_size
+            content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+            last_modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+            resolved = _resolve_range(byte_range, size) if byte_range else None
+        except Exception:
+            fileobj.close()
+            raise
+
+        if resolved:
+            start, end = resolved
+            fileobj.seek(start)
+            return StoredObject(
+                _LimitedReader(fileobj, end - start + 1), end - start + 1,
+                content_type=content_type, etag=etag, last_modified=last_modified,
+                content_range=f"bytes {start}-{end}/{size}"
+            )
+        return StoredObject(fileobj, size, content_type=content_type, etag=etag, last_modified=last_modified)
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix='', limit=1000):
+        # Shards are hash-ordered, so collect matches and sort by key like S3 does
+        objects = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.tmp-'):
+                    continue
+                key = unquote(filename)
+                if not key.startswith(prefix):
+                    continue
+                stat = os.stat(os.path.join(dirpath, filename))
+                objects.append({
+                    'key': key,
+                    'size': stat.st_size,
+                    'last_modified': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+                })
+        objects.sort(key=lambda obj: obj['key'])
+        return objects[:limit]
+
+class MemoryStorageBackend(StorageBackend):
+    """Process-local dict storage for load tests and CI - contents vanish on restart"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, key, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        data = bytes(data)
+        entry = {
+            'data': data,
+            'content_type': content_type or mimetypes.guess_type(key)[0] or 'application/octet-stream',
+            'etag': f'"{hashlib.md5(data).hexdigest()}"',
+            'last_modified': datetime.now(timezone.utc)
+        }
+        with self._lock:
+            self._objects[key] = entry
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._objects.get(key)
+        if entry is None:
+            raise ObjectNotFound(key)
+        return entry
+
+    def get(self, key):
+        return self._entry(key)['data']
+
+    def open(self, key, byte_range=None, if_none_match=None):
+        entry = self._entry(key)
+        if if_none_match and if_none_match.strip() in (entry['etag'], '*'):
+            raise NotModified(key)
+
+        data = entry['data']
+        resolved = _resolve_range(byte_range, len(data)) if byte_range else None
+        content_range = None
+        if resolved:
+            start, end = resolved
+            content_range = f"bytes {start}-{end}/{len(data)}"
+            data = data[start:end + 1]
+        return StoredObject(
+            io.BytesIO(data), len(data),
+            content_type=entry['content_type'], etag=entry['etag'],
+            last_modified=entry['last_modified'], content_range=content_range
+        )
+
+    def delete(self, key):
+        with self._lock:
+            self._objects.pop(key, None)
+
+    def list(self, prefix='', limit=1000):
+        with self._lock:
+            keys = sorted(k for k in self._objects if k.startswith(prefix))[:limit]
+            return [{
+                'key': key,
+                'size': len(self._objects[key]['data']),
+                'last_modified': self._objects[key]['last_modified']
+            } for key in keys]
+
+STORAGE_BACKENDS = {
+    's3': S3StorageBackend,
+    'local': LocalStorageBackend,
+    'memory': MemoryStorageBackend
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    """Get the configured storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend_cls = STORAGE_BACKENDS.get(Config.STORAGE_BACKEND)
+                if backend_cls is None:
+                    raise ValueError(f"Unknown STORAGE_BACKEND: {Config.STORAGE_BACKEND}")
+                _storage = backend_cls()
+    return _storage
+
+def set_storage(backend):
+    """Swap the process-wide backend (benchmarks and tests); returns the previous one"""
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, backend
+    return previous
+
+# Bounded I/O pool for background uploads, created on first use
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+def _get_upload_executor():
+    """Get the shared upload thread pool, creating it on first use"""
+    global _upload_executor
+    if _upload_executor is None:
+        with _upload_executor_lock:
+            if _upload_executor is None:
+                _upload_executor = ThreadPoolExecutor(
+                    max_workers=Config.STORAGE_UPLOAD_WORKERS,
+                    thread_name_prefix='storage-upload'
+                )
+    return _upload_executor
+
+def submit_upload(file_content, key, content_type=None):
+    """
+    Queue an upload to the configured backend on the shared I/O pool.
+    Returns a Future resolving to {'key', 'success', 'error'} - it never raises.
+    """
+    storage = get_storage()
+
+    @bind_trace
+    def _upload():
+        try:
+            with span('storage.upload'):
+                storage.put(key, file_content, content_type)
+            return {'key': key, 'success': True, 'error': None}
+        except Exception as e:
+            return {'key': key, 'success': False, 'error': str(e)}
+
+    return _get_upload_executor().submit(_upload)
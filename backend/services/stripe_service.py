@@ -0,0 +1,88 @@
+"""
+Stripe access for the payment and PDF routes.
+Payment state arrives through the signed webhook (/payment/webhook), which keeps the
+PaymentIntent rows current, so /build-pdf and /preview-pdf normally only read the local
+row. retrieve_payment_intent is the fallback for an intent the webhook hasn't reported
+yet: one call with a short timeout and no retries. The stripe package loads on first use.
+"""
+import importlib.util
+import json
+import threading
+from config import Config
+from services.audit_service import log_admin_action
+from services.payment_tracking_service import PaymentTrackingService
+
+STRIPE_AVAILABLE = importlib.util.find_spec('stripe') is not None
+
+# payment_intent.* event type -> PaymentIntent.status
+EVENT_STATUSES = {
+    'payment_intent.succeeded': 'succeeded',
+    'payment_intent.processing': 'processing',
+    'payment_intent.requires_action': 'requires_action',
+    'payment_intent.payment_failed': 'failed',
+    'payment_intent.canceled': 'canceled',
+}
+
+class PaymentLookupError(Exception):
+    """Stripe could not be asked about a payment (timeout, network or API error)"""
+
+class WebhookSignatureError(Exception):
+    """Webhook payload not signed with STRIPE_WEBHOOK_SECRET, malformed, or too old"""
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_stripe_client():
+    """Shared StripeClient for payment lookups on the request path"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import stripe
+                options = {}
+                if Config.STRIPE_API_BASE:
+                    options['base_addresses'] = {'api': Config.STRIPE_API_BASE}
+                _client = stripe.StripeClient(
+                    Config.STRIPE_SECRET_KEY,
+                    http_client=stripe.RequestsClient(timeout=Config.STRIPE_VERIFY_TIMEOUT),
+                    max_network_retries=0,
+                    **options
+                )
+    return _client
+
+def reset_stripe_client():
+    """Drop the shared client so the next lookup builds a fresh one (config changes, tests)"""
+    global _client
+    with _client_lock:
+        _client = None
+
+def retrieve_payment_intent(payment_intent_id):
+    """Ask Stripe for a payment intent, giving up after STRIPE_VERIFY_TIMEOUT seconds"""
+    try:
+        return get_stripe_client().v1.payment_intents.retrieve(payment_intent_id)
+    except Exception as e:
+        raise PaymentLookupError(str(e)) from e
+
+def construct_webhook_event(payload, signature):
+    """Verify the Stripe-Signature header against the raw body; returns the event as plain dicts"""
+    import stripe
+    try:
+        payload = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+        stripe.WebhookSignature.verify_header(payload, signature, Config.STRIPE_WEBHOOK_SECRET,
+                                              Config.STRIPE_WEBHOOK_TOLERANCE)
+        return json.loads(payload)
+    except (ValueError, stripe.SignatureVerificationError) as e:
+        raise WebhookSignatureError(str(e)) from e
+
+def apply_webhook_event(event):
+    """Write a payment_intent.* event to its PaymentIntent row; returns the stored status (None if ignored)"""
+    status = EVENT_STATUSES.get(event['type'])
+    if status is None:
+        return None
+    intent = event['data']['object']
+    metadata = intent.get('metadata') or {}
+    stored = PaymentTrackingService.apply_stripe_status(
+        intent['id'], metadata.get('user_uid'), intent.get('amount'), status
+    )
+    log_admin_action("STRIPE_WEBHOOK_APPLIED", f"{event['type']} ({event['id']}) for {intent['id']}: {stored}")
+    return stored
@@ -1,9 +1,24 @@
 """Authentication decorators for Flask routes"""
 from functools import wraps
 from flask import request, jsonify, make_response
-import firebase_admin
-from firebase_admin import auth
 from config import Config
+from utils.firebase_tokens import verify_id_token
+from utils.tracing import span
+
+def is_admin_email(email):
+    """True for the accounts allowed into the admin dashboard"""
+    return bool(email) and email in (Config.ADMIN_EMAIL, 'admin@send2290.com')
+
+def get_request_admin():
+    """Decoded token if this request carries a valid admin token, else None (for opt-in admin features)"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        decoded = verify_id_token(auth_header.split('Bearer ')[1])
+    except Exception:
+        return None
+    return decoded if is_admin_email(decoded.get('email')) else None
 
 def verify_firebase_token(f):
     """Decorator to verify Firebase authentication token"""
@@ -21,7 +36,8 @@ def verify_firebase_token(f):
         
         token = auth_header.split('Bearer ')[1]
         try:
-            decoded = auth.verify_id_token(token)
+            with span('auth.verify_token'):
+                decoded = verify_id_token(token)
             request.user = decoded
         except Exception as e:
             return jsonify({"error": "Invalid token", "details": str(e)}), 403
@@ -48,10 +64,8 @@ def verify_admin_token(f):
         
         token = auth_header.split('Bearer ')[1]
         try:
-            decoded_token = auth.verify_id_token(token)
-            admin_emails = [Config.ADMIN_EMAIL, 'admin@send2290.com']
-            
-            if decoded_token.get('email') not in admin_emails:
+            decoded_token = verify_id_token(token)
+            if not is_admin_email(decoded_token.get('email')):
                 log_admin_action("UNAUTHORIZED_ACCESS_ATTEMPT", 
                                f"Non-admin user {decoded_token.get('email')}")
                 return jsonify({'error': 'Admin access required'}), 403
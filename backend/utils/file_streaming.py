@@ -0,0 +1,70 @@
+"""Helpers for serving stored files to the browser without buffering them in memory"""
+from flask import request, Response, redirect
+from config import Config
+from services.storage_service import get_storage, NotModified, InvalidRange
+
+def _requested_range():
+    """Return the client's Range header if it is a single byte range (all backends honour one range)"""
+    range_header = request.headers.get('Range', '').strip()
+    if not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    return range_header
+
+def storage_download_response(key, content_type, filename, disposition='attachment', mode=None):
+    """
+    Build a download response for a stored object.
+    In 'stream' mode bytes are proxied chunk-by-chunk with Range and ETag pass-through;
+    in 'redirect' mode the client is sent to a short-lived presigned URL instead.
+    Raises for storage errors other than 304/416 so routes keep their own error responses.
+    """
+    mode = mode or Config.DOWNLOAD_MODE
+    storage = get_storage()
+    content_disposition = f'{disposition}; filename="{filename}"'
+
+    if mode == 'redirect':
+        url = storage.presign(
+            key,
+            expiration=Config.DOWNLOAD_URL_EXPIRATION,
+            content_type=content_type,
+            content_disposition=content_disposition
+        )
+        response = redirect(url, code=302)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    if_none_match = request.headers.get('If-None-Match')
+
+    try:
+        stored = storage.open(key, byte_range=_requested_range(), if_none_match=if_none_match)
+    except NotModified:
+        response = Response(status=304)
+        if if_none_match:
+            response.headers['ETag'] = if_none_match
+        return response
+    except InvalidRange:
+        return Response(status=416, headers={'Accept-Ranges': 'bytes'})
+
+    headers = {
+        'Content-Type': content_type,
+        'Content-Disposition': content_disposition,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, no-cache'
+    }
+    if stored.content_length is not None:
+        headers['Content-Length'] = str(stored.content_length)
+    if stored.etag:
+        headers['ETag'] = stored.etag
+    if stored.last_modified:
+        headers['Last-Modified'] = stored.last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+    status = 200
+    if stored.content_range:
+        headers['Content-Range'] = stored.content_range
+        status = 206
+
+    return Response(
+        stored.iter_chunks(Config.DOWNLOAD_CHUNK_SIZE),
+        status=status,
+        headers=headers,
+        direct_passthrough=True
+    )
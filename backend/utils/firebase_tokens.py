@@ -0,0 +1,297 @@
+"""
+Firebase ID-token verification with a verified-claims cache.
+Tokens are checked locally against Google's signing certificates (refreshed in the
+background), and decoded claims are cached until the token expires, so repeat calls
+with the same token skip the RSA check entirely.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+ID_TOKEN_CERT_URI = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+class TokenVerificationError(Exception):
+    """Raised when an ID token is malformed, expired, forged or revoked"""
+
+class TokenCache:
+    """Bounded LRU of verified claims, keyed on a SHA-256 of the raw token"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, claims, valid_until):
+        if valid_until <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, valid_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class CertificateSource:
+    """Supplies the kid -> PEM certificate mapping used to check token signatures"""
+
+    def get_certs(self):
+        raise NotImplementedError
+
+    def refresh_now(self):
+        """Called when a token names a kid we don't know; sources may ignore it"""
+        return False
+
+class StaticCertificateSource(CertificateSource):
+    """Fixed certificates - for offline tests with locally minted tokens"""
+
+    def __init__(self, certs):
+        self.certs = dict(certs)
+
+    def get_certs(self):
+        return self.certs
+
+class GoogleCertificateSource(CertificateSource):
+    """
+    Google's published securetoken certificates. The first fetch is synchronous;
+    afterwards a daemon thread refreshes them ahead of their Cache-Control expiry,
+    so requests never wait on Google.
+    """
+
+    REFRESH_MARGIN = 300      # refresh this many seconds before max-age runs out
+    RETRY_INTERVAL = 60       # after a failed refresh
+    MIN_FORCED_INTERVAL = 30  # rate limit for unknown-kid refreshes
+
+    def __init__(self, url=ID_TOKEN_CERT_URI):
+        self.url = url
+        self._certs = None
+        self._lock = threading.Lock()
+        self._last_fetch = 0
+        self._thread = None
+
+    def _fetch(self):
+        import requests
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        max_age = 3600
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        if match:
+            max_age = int(match.group(1))
+        self._certs = response.json()
+        self._last_fetch = time.time()
+        return max_age
+
+    def _refresh_loop(self, max_age):
+        while True:
+            time.sleep(max(self.RETRY_INTERVAL, max_age - self.REFRESH_MARGIN))
+            try:
+                max_age = self._fetch()
+            except Exception as e:
+                print(f"Warning: Firebase certificate refresh failed: {e}")
+                max_age = self.RETRY_INTERVAL + self.REFRESH_MARGIN
+
+    def get_certs(self):
+        if self._certs is None:
+            with self._lock:
+                if self._certs is None:
+                    max_age = self._fetch()
+                    self._thread = threading.Thread(
+                        target=self._refresh_loop, args=(max_age,),
+                        name='firebase-cert-refresh', daemon=True
+                    )
+                    self._thread.start()
+        return self._certs
+
+    def refresh_now(self):
+        with self._lock:
+            if time.time() - self._last_fetch < self.MIN_FORCED_INTERVAL:
+                return False
+            try:
+                self._fetch()
+                return True
+            except Exception:
+                return False
+
+class FirebaseTokenVerifier:
+    """Verifies Firebase ID tokens locally and caches the decoded claims until expiry"""
+
+    def __init__(self, project_id, cert_source=None, cache=None, clock_skew=None, leeway=None,
+                 check_revoked=None, revocation_check_interval=None):
+        self.project_id = project_id
+        self.cert_source = cert_source if cert_source is not None else GoogleCertificateSource()
+        self.cache = cache if cache is not None else TokenCache(Config.TOKEN_CACHE_MAX_ENTRIES)
+        self.clock_skew = Config.TOKEN_CACHE_CLOCK_SKEW if clock_skew is None else clock_skew
+        self.leeway = Config.TOKEN_VERIFY_LEEWAY if leeway is None else leeway
+        self.check_revoked = Config.FIREBASE_CHECK_REVOKED if check_revoked is None else check_revoked
+        self.revocation_check_interval = (Config.FIREBASE_REVOCATION_CHECK_INTERVAL
+                                          if revocation_check_interval is None else revocation_check_interval)
+
+    def verify(self, token):
+        """Return the token's claims (with 'uid' set), raising TokenVerificationError if invalid"""
+        if not token or not isinstance(token, str):
+            raise TokenVerificationError("ID token must be a non-empty string")
+
+        claims = self.cache.get(token)
+        if claims is not None:
+            return claims
+
+        claims = self._decode(token)
+        if self.check_revoked:
+            self._ensure_not_revoked(claims)
+
+        # Stop trusting the cached copy a little before the token itself expires
+        valid_until = claims['exp'] - self.clock_skew
+        if self.check_revoked:
+            valid_until = min(valid_until, time.time() + self.revocation_check_interval)
+        self.cache.put(token, claims, valid_until)
+        return claims
+
+    def _decode(self, token):
+        import google.auth.jwt  # only cache misses need it, so it stays out of start-up
+        try:
+            header = google.auth.jwt.decode_header(token)
+        except Exception as e:
+            raise TokenVerificationError(f"Malformed ID token: {e}")
+        if header.get('alg') != 'RS256':
+            raise TokenVerificationError("ID token has incorrect algorithm")
+        kid = header.get('kid')
+        if not kid:
+            raise TokenVerificationError("ID token has no 'kid' claim")
+
+        certs = self.cert_source.get_certs()
+        if kid not in certs and self.cert_source.refresh_now():
+            certs = self.cert_source.get_certs()
+        if kid not in certs:
+            raise TokenVerificationError("ID token signed with an unknown key")
+
+        try:
+            claims = google.auth.jwt.decode(
+                token,
+                certs={kid: certs[kid]},
+                audience=self.project_id,
+                clock_skew_in_seconds=self.leeway  # not clock_skew: that only shortens the cache
+            )
+        except Exception as e:
+            raise TokenVerificationError(f"Invalid ID token: {e}")
+
+        if claims.get('iss') != ID_TOKEN_ISSUER_PREFIX + self.project_id:
+            raise TokenVerificationError("ID token has incorrect issuer")
+        subject = claims.get('sub')
+        if not subject or not isinstance(subject, str) or len(subject) > 128:
+            raise TokenVerificationError("ID token has invalid subject")
+        if 'exp' not in claims:
+            raise TokenVerificationError("ID token has no expiry")
+
+        claims['uid'] = subject
+        return claims
+
+    def _ensure_not_revoked(self, claims):
+        from firebase_admin import auth
+        user = auth.get_user(claims['uid'], app=get_firebase_app())
+        if user.disabled:
+            raise TokenVerificationError("User account is disabled")
+        valid_after = (user.tokens_valid_after_timestamp or 0) / 1000
+        if claims.get('auth_time', claims.get('iat', 0)) < valid_after:
+            raise TokenVerificationError("ID token has been revoked")
+
+def _resolve_project_id():
+    """Project ID from config, the service account JSON, or the initialized Firebase app"""
+    if Config.FIREBASE_PROJECT_ID:
+        return Config.FIREBASE_PROJECT_ID
+    if Config.FIREBASE_ADMIN_KEY_JSON:
+        try:
+            project_id = json.loads(Config.FIREBASE_ADMIN_KEY_JSON).get('project_id')
+            if project_id:
+                return project_id
+        except ValueError:
+            pass
+    try:
+        return get_firebase_app().project_id
+    except Exception:
+        return None
+
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+def get_firebase_app():
+    """
+    The firebase_admin app, imported and initialized on first use instead of at
+    startup (firebase_admin and Google's HTTP transport are slow to import).
+    None if no service account is configured.
+    """
+    global _firebase_app
+    if _firebase_app is None:
+        with _firebase_app_lock:
+            if _firebase_app is None:
+                import firebase_admin
+                from firebase_admin import credentials
+                if firebase_admin._apps:
+                    _firebase_app = firebase_admin.get_app()
+                elif Config.FIREBASE_ADMIN_KEY_JSON:
+                    cred = credentials.Certificate(json.loads(Config.FIREBASE_ADMIN_KEY_JSON))
+                    _firebase_app = firebase_admin.initialize_app(cred)
+                else:
+                    print("Warning: Firebase credentials not found")
+                    _firebase_app = False
+    return _firebase_app or None
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+def get_token_verifier():
+    """Get the process-wide verifier (None if the Firebase project is unknown)"""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                project_id = _resolve_project_id()
+                if project_id:
+                    _verifier = FirebaseTokenVerifier(project_id)
+    return _verifier
+
+def set_token_verifier(verifier):
+    """Swap the process-wide verifier (offline tests); returns the previous one"""
+    global _verifier
+    with _verifier_lock:
+        previous, _verifier = _verifier, verifier
+    return previous
+
+def verify_id_token(token):
+    """Verify a Firebase ID token, using the cached local verifier when possible"""
+    verifier = get_token_verifier()
+    if verifier is None:
+        # No project configured - let firebase_admin do the full check
+        from firebase_admin import auth
+        return auth.verify_id_token(token, app=get_firebase_app(), check_revoked=Config.FIREBASE_CHECK_REVOKED)
+    return verifier.verify(token)
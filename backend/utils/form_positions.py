@@ -1,8 +1,12 @@
 """Utility functions for form positions and PDF generation"""
 import json
 import os
+import threading
 from config import Config
 
+_positions_cache = {'mtime': None, 'positions': None}
+_positions_lock = threading.Lock()
+
 def load_form_positions():
     """Load form field positions from JSON file"""
     try:
@@ -17,6 +21,24 @@ def load_form_positions():
         print(f"Error loading form positions: {e}")
         return {}
 
+def get_form_positions():
+    """
+    Shared, read-only copy of the form positions, re-read only when the file changes.
+    Loaded once in the gunicorn master (preload_app) and shared copy-on-write by the
+    workers; callers must not modify the returned dict.
+    """
+    positions_file = os.path.join(os.path.dirname(__file__), "..", Config.FORM_POSITIONS_FILE)
+    try:
+        mtime = os.stat(positions_file).st_mtime_ns
+    except OSError:
+        mtime = None
+    if _positions_cache['positions'] is None or _positions_cache['mtime'] != mtime:
+        with _positions_lock:
+            if _positions_cache['positions'] is None or _positions_cache['mtime'] != mtime:
+                _positions_cache['positions'] = load_form_positions()
+                _positions_cache['mtime'] = mtime
+    return _positions_cache['positions']
+
 def save_form_positions(positions):
     """Save form field positions to JSON file"""
     try:
@@ -0,0 +1,123 @@
+"""
+Stage spans for the request being handled.
+The metrics middleware starts a Trace per request; span() / traced() record how long
+each named stage took into it. With no active trace (tracing disabled, CLI scripts,
+background jobs) they cost a single ContextVar lookup, so they stay in hot code.
+"""
+import contextvars
+import time
+from functools import wraps
+
+_active_trace = contextvars.ContextVar('send2290_trace', default=None)
+
+class Trace:
+    """Spans recorded during one request as (name, offset_seconds, duration_seconds)"""
+
+    __slots__ = ('started', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []  # list.append is atomic, so upload threads can record here too
+
+    def record(self, name, started, duration):
+        self.spans.append((name, started - self.started, duration))
+
+    def summary(self):
+        """{name: (total_seconds, count)} in first-seen order"""
+        totals = {}
+        for name, _, duration in self.spans:
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        return totals
+
+class _Span:
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.record(self.name, self.started, time.perf_counter() - self.started)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name):
+    """Context manager timing a stage of the current request"""
+    trace = _active_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+def traced(name):
+    """Decorator form of span() for functions that are a stage on their own"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _active_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                trace.record(name, started, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def bind_trace(func):
+    """
+    Run func under the caller's trace on another thread - executor pools don't copy
+    context variables, so spans inside submitted work would otherwise be dropped
+    """
+    trace = _active_trace.get()
+    if trace is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _active_trace.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active_trace.reset(token)
+    return wrapper
+
+def start_trace():
+    """Begin collecting spans in the current context"""
+    trace = Trace()
+    _active_trace.set(trace)
+    return trace
+
+def clear_trace():
+    """Stop collecting (request threads are reused, so this must always run)"""
+    _active_trace.set(None)
+
+def current_trace():
+    return _active_trace.get()
+
+def server_timing(summary, total=None):
+    """Server-Timing header value for a Trace.summary(), e.g. 'xml.build;dur=12.3, ...'"""
+    parts = []
+    for name, (duration, count) in summary.items():
+        entry = f'{name};dur={duration * 1000:.1f}'
+        if count > 1:
+            entry += f';desc="x{count}"'
+        parts.append(entry)
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
@@ -8,10 +8,10 @@ from datetime import datetime
 import os
 from collections import defaultdict
 import re
+from utils.tracing import traced
 
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+# IRS_* / DEVELOPER_* settings are read from the environment at build time; the .env
+# files are loaded once by config.py, which every entry point imports first
 
 def parse_month_to_yyyymm(month_str: str) -> str:
     """
@@ -377,6 +377,27 @@ def calculate_total_tax(vehicles: list) -> float:
         total += calculate_vehicle_tax(vehicle)
     return round(total, 2)
 
+_EIN_RE = re.compile(r'^\d{9}$')
+
+def is_valid_ein(ein) -> bool:
+    """Nine digits and not the all-zeros placeholder a missing EIN pads out to"""
+    return bool(ein) and bool(_EIN_RE.match(ein)) and ein != "000000000"
+
+@traced('xml.build')
+def build_return_manifest(data: dict) -> dict:
+    """
+    Values the IRS submission manifest needs, taken from the same data as the return,
+    so transmitting never has to read them back out of the XML
+    """
+    tax_year = int(str(data.get("tax_year", "2025"))[:4])
+    return {
+        "ein": data.get("ein", "").replace("-", "").zfill(9),
+        "tax_year": tax_year,
+        # Form 2290 tax period runs July 1 through June 30
+        "tax_period_begin": f"{tax_year}-07-01",
+        "tax_period_end": f"{tax_year + 1}-06-30"
+    }
+
 def build_2290_xml(data: dict) -> str:
     """Build IRS-compliant Form 2290 XML according to 2025v1.0 schema"""
     
@@ -423,7 +444,7 @@ def build_2290_xml(data: dict) -> str:
     
     # Filer information
     filer = ET.SubElement(return_header, "Filer")
-    taxpayer_ein = data.get("ein", "").replace("-", "").zfill(9)
+    taxpayer_ein = build_return_manifest(data)["ein"]
     ET.SubElement(filer, "EIN").text = taxpayer_ein
     ET.SubElement(filer, "BusinessNameLine1Txt").text = data.get("business_name", "")[:60]  # Max 60 chars
     
@@ -5,10 +5,10 @@ import { auth } from "../../lib/firebase";
 import { onAuthStateChanged, User } from "firebase/auth";
 
 type Document = {
+  id: number;
   filing_id: string;
   type: string;
   uploaded_at: string;
-  url: string;
 };
 
 export default function FilingsPage() {
@@ -45,10 +45,10 @@ export default function FilingsPage() {
               data.submissions.forEach((submission: any) => {
                 submission.documents.forEach((doc: any) => {
                   allDocs.push({
+                    id: doc.id,
                     filing_id: submission.id.toString(),
                     type: doc.type,
-                    uploaded_at: submission.created_at,
-                    url: doc.url
+                    uploaded_at: submission.created_at
                   });
                 });
               });
@@ -64,6 +64,31 @@ export default function FilingsPage() {
     }
   }, [user, API_BASE]);
 
+  // 3) Download URLs are presigned on click rather than for every listed document
+  const handleDownload = async (doc: Document) => {
+    if (!user) return;
+    // Open the tab synchronously so popup blockers don't swallow it after the fetch
+    const downloadWindow = window.open("", "_blank");
+    try {
+      const token = await user.getIdToken();
+      const res = await fetch(`${API_BASE}/user/documents/${doc.id}/url`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      const data = await res.json();
+      if (!res.ok || !data.url) {
+        throw new Error(data.error || "Failed to get download link");
+      }
+      if (downloadWindow) {
+        downloadWindow.location.href = data.url;
+      } else {
+        window.location.href = data.url;
+      }
+    } catch (error) {
+      console.error("Error downloading document:", error);
+      downloadWindow?.close();
+    }
+  };
+
   if (!user) {
     return (
       <div className="p-6">
@@ -122,14 +147,13 @@ export default function FilingsPage() {
                     {doc.type}
                   </td>
                   <td className="px-6 py-4 whitespace-nowrap text-sm">
-                    <a
-                      href={doc.url}
-                      target="_blank"
-                      rel="noopener noreferrer"
+                    <button
+                      type="button"
+                      onClick={() => handleDownload(doc)}
                       className="text-blue-600 hover:text-blue-800 hover:underline font-medium"
                     >
                       Download
-                    </a>
+                    </button>
                   </td>
                 </tr>
               ))}